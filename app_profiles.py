@@ -0,0 +1,201 @@
+import fnmatch
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+
+from layers import LayerSource
+
+DEFAULT_PROFILE = "default"  # Profile used when no profile matches the foreground application
+DEFAULT_PROFILE_SAMPLE_INTERVAL = 0.5  # Seconds between two looks at the foreground window
+PROFILE_PRIORITY = 1000  # Profile sheets override the base sheet and all layer_sheets
+
+# The application owning the focused window: `process` is the executable name on Windows and
+# the window class on X11, `title` the window title
+ForegroundApp = namedtuple("ForegroundApp", "process title")
+
+
+def parse_profile_sheets(value):
+    """
+    Parse the profile_sheets setting: one sheet per line, "<app pattern> <url>" or "<app pattern> <url> <tab name>".
+
+    The pattern is matched (fnmatch, case-insensitive) against the process name, e.g. "winword.exe"
+    or "*chrome*", or against the window title when written "title:<pattern>". Lines with the
+    same pattern form one profile. Returns {pattern: [LayerSource, ...]} in the order of the lines.
+    """
+    profiles = {}
+    count = 0
+    for line in (value or "").splitlines():
+        parts = line.strip().split(None, 2)
+        if len(parts) < 2:
+            continue
+        count += 1
+        source = LayerSource(f"app{count}", PROFILE_PRIORITY + count, parts[1], parts[2] if len(parts) > 2 else None)
+        profiles.setdefault(parts[0], []).append(source)
+    return profiles
+
+
+class ProfileSelector:
+    """
+    Pick the profile of a foreground application: the first pattern that matches it, else DEFAULT_PROFILE.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [(pattern, pattern[len("title:"):].lower() if pattern.startswith("title:") else None,
+                          pattern.lower()) for pattern in patterns]
+
+    def profile_for(self, app):
+        if app is None:
+            return DEFAULT_PROFILE
+        process = (app.process or "").lower()
+        title = (app.title or "").lower()
+        for pattern, title_pattern, process_pattern in self.patterns:
+            if title_pattern is not None:
+                if fnmatch.fnmatchcase(title, title_pattern):
+                    return pattern
+            elif fnmatch.fnmatchcase(process, process_pattern):
+                return pattern
+        return DEFAULT_PROFILE
+
+
+class WindowsForegroundDetector:
+    """
+    Foreground window detector for Windows, through user32/kernel32 with ctypes.
+    Process names are cached by process id, so a sample costs a few system calls.
+    """
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._process_names = {}
+
+    def _process_name(self, process_id):
+        name = self._process_names.get(process_id)
+        if name is not None:
+            return name
+        ctypes, wintypes = self.ctypes, self.wintypes
+        handle = self.kernel32.OpenProcess(0x1000, False, process_id)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ""
+        try:
+            size = wintypes.DWORD(1024)
+            path = ctypes.create_unicode_buffer(size.value)
+            if not self.kernel32.QueryFullProcessImageNameW(handle, 0, path, ctypes.byref(size)):
+                return ""
+        finally:
+            self.kernel32.CloseHandle(handle)
+        name = os.path.basename(path.value)
+        if len(self._process_names) > 256:  # Process ids are reused; keep the cache small
+            self._process_names.clear()
+        self._process_names[process_id] = name
+        return name
+
+    def foreground(self):
+        ctypes, wintypes = self.ctypes, self.wintypes
+        window = self.user32.GetForegroundWindow()
+        if not window:
+            return None
+        length = self.user32.GetWindowTextLengthW(window)
+        title = ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(window, title, length + 1)
+        process_id = wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(window, ctypes.byref(process_id))
+        return ForegroundApp(self._process_name(process_id.value), title.value)
+
+
+class X11ForegroundDetector:
+    """
+    Foreground window detector for X11 sessions, using the xprop tool (x11-utils).
+    The process is the window's WM_CLASS class name, e.g. "Firefox" or "Code".
+    """
+    PROPERTY = re.compile(r'^(\w+)\([^)]*\)(?: =|:) (.*)$', re.MULTILINE)  # NAME(TYPE) = value, or NAME(TYPE): value
+
+    def __init__(self, command="xprop"):
+        self.command = shutil.which(command)
+        if self.command is None:
+            raise OSError(f"{command} was not found")
+
+    def _xprop(self, *args):
+        completed = subprocess.run([self.command, *args], capture_output=True, text=True, timeout=1)
+        return dict(self.PROPERTY.findall(completed.stdout))
+
+    def foreground(self):
+        active = self._xprop("-root", "_NET_ACTIVE_WINDOW").get("_NET_ACTIVE_WINDOW", "")
+        window_id = active.split()[-1] if active else ""
+        if not window_id.startswith("0x") or int(window_id, 16) == 0:
+            return None
+        properties = self._xprop("-id", window_id, "WM_CLASS", "_NET_WM_NAME")
+        classes = re.findall(r'"((?:[^"\\]|\\.)*)"', properties.get("WM_CLASS", ""))
+        titles = re.findall(r'"((?:[^"\\]|\\.)*)"', properties.get("_NET_WM_NAME", ""))
+        return ForegroundApp(classes[-1] if classes else "", titles[0] if titles else "")
+
+
+def create_foreground_detector():
+    """
+    Return the foreground window detector for this platform, or None if there is none.
+    """
+    try:
+        if sys.platform == "win32":
+            return WindowsForegroundDetector()
+        if os.environ.get("DISPLAY"):
+            return X11ForegroundDetector()
+    except OSError as e:
+        logging.warning(f"Foreground window detection unavailable: {e}")
+    return None
+
+
+class ForegroundWatcher:
+    """
+    Samples the foreground application every `interval` seconds on a background thread and calls
+    `on_change(app)` when it differs from the previous sample. The key handler never queries the
+    detector; it only sees the profile switch made by on_change.
+
+    `detector` is any object with foreground() -> ForegroundApp or None.
+    """
+
+    def __init__(self, detector, on_change, interval=DEFAULT_PROFILE_SAMPLE_INTERVAL):
+        self.detector = detector
+        self.on_change = on_change
+        self.interval = interval
+        self.current = None
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="foreground-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        failed = False
+        while not self._stop_event.is_set():
+            try:
+                app = self.detector.foreground()
+                failed = False
+            except Exception as e:
+                if not failed:  # Log once per run of failures
+                    logging.warning(f"Could not read the foreground window: {e}")
+                failed = True
+                app = None
+            self.samples += 1
+            if app != self.current:
+                self.current = app
+                self.on_change(app)
+            self._stop_event.wait(self.interval)
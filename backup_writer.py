@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+
+from dictionary_cache import content_hash
+
+
+class BackupWriter:
+    """
+    Keeps the local backup workbook up to date from a background thread, so a reload never waits for the disk.
+
+    save() takes the downloaded workbook bytes as they are; save_with() takes a function writing the
+    file to a given path, for when only the parsed data is at hand. Only the latest request is kept
+    while one is being written, and a request whose `source_hash` matches the backup already on disk
+    is skipped. Every write goes to a temporary file next to the backup and replaces it with
+    os.replace(), so the backup is always a complete workbook, the old or the new one, even if the
+    process is killed mid-write.
+    """
+
+    def __init__(self, file_path, write_stats=None):
+        self.file_path = file_path
+        self.write_stats = write_stats  # Optional metrics Histogram of the write times
+        self.writes = 0
+        self.skipped = 0
+        self._saved_hash = None  # source_hash of the backup on disk, read from the file on first use
+        self._pending = None
+        self._writing = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def temp_path(self):
+        return self.file_path + ".tmp"
+
+    def save(self, content, source_hash=None):
+        """
+        Queue writing the workbook bytes `content`.
+        """
+        self._submit(source_hash or content_hash(content), content)
+
+    def save_with(self, write_function, source_hash):
+        """
+        Queue `write_function(path)`, which writes the whole workbook of the data with `source_hash` to `path`.
+        """
+        self._submit(source_hash, write_function)
+
+    def _submit(self, source_hash, payload):
+        with self._condition:
+            self._pending = (source_hash, payload)  # Replaces an older request not written yet
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="backup-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until the queued backup is written. Returns False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._writing, timeout)
+
+    def stop(self, timeout=None):
+        """
+        Finish the queued write, then stop the thread.
+        """
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        with self._condition:
+            thread = self._thread
+            self._thread = None
+            self._condition.notify_all()
+        thread.join(timeout)
+
+    def _run(self):
+        current = threading.current_thread()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._thread is not current)
+                if self._pending is None:
+                    return
+                source_hash, payload = self._pending
+                self._pending = None
+                self._writing = True
+            try:
+                self._write(source_hash, payload)
+            except Exception as e:
+                logging.error(f"Could not save the local backup {self.file_path}: {e}")
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write(self, source_hash, payload):
+        if self._saved_hash is None and os.path.exists(self.file_path):
+            with open(self.file_path, 'rb') as f:
+                self._saved_hash = content_hash(f.read())
+        if source_hash == self._saved_hash and os.path.exists(self.file_path):
+            self.skipped += 1
+            logging.debug("Local backup already up to date.")
+            return
+
+        start = time.perf_counter()
+        if isinstance(payload, bytes):
+            with open(self.temp_path, 'wb') as f:
+                f.write(payload)
+        else:
+            payload(self.temp_path)
+        with open(self.temp_path, 'rb+') as f:
+            os.fsync(f.fileno())  # On disk before it replaces the backup
+        os.replace(self.temp_path, self.file_path)
+        self._saved_hash = source_hash
+        self.writes += 1
+        if self.write_stats is not None:
+            self.write_stats.add(time.perf_counter() - start)
+        logging.info(f"Local backup saved in {(time.perf_counter() - start) * 1000:.0f} ms.")
@@ -0,0 +1,120 @@
+"""
+Time the local backup writes and check the backup survives a process killed mid-write.
+
+  full    - the old path: a regular openpyxl workbook built cell by cell and saved, on the calling thread
+  stream  - engine.save_xlsx_to_file: a write-only openpyxl workbook streaming the rows
+  bytes   - BackupWriter.save() of the downloaded workbook: the caller only queues it
+
+For the BackupWriter the table shows the time spent by the caller and the time until the
+backup is on disk; saving the same content again is skipped by its hash.
+
+Usage: python benchmarks/bench_backup.py [--sizes 1000 20000 100000]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import REPO_PATH, make_replacement_data, make_workbook_bytes
+
+import engine
+from backup_writer import BackupWriter
+
+KILL_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[1] + "/benchmarks")
+import functools, engine
+from backup_writer import BackupWriter
+from synthetic import make_replacement_data
+writer = BackupWriter(sys.argv[2])
+writer.save_with(functools.partial(engine.save_xlsx_to_file, make_replacement_data(int(sys.argv[3]), seed=9)), "0" * 64)
+writer.flush()
+"""
+
+
+def save_full(replacement_data, file_path):
+    """
+    The backup writer before: every row kept as cells of a regular workbook, then saved.
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.create_sheet("Sheet1", 0)
+    sheet.append(["Word", "Replacement", "Trigger", "Mode"])
+    for word, replacement in replacement_data.items():
+        sheet.append([word, replacement])
+    workbook.save(file_path)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def check_killed_write(work_dir, entries):
+    """
+    Kill a process while it writes a large backup over a small one: the small one must still load.
+    """
+    backup_path = os.path.join(work_dir, "killed_backup.xlsx")
+    original = make_replacement_data(200, seed=8)
+    engine.save_xlsx_to_file(original, backup_path)
+    process = subprocess.Popen([sys.executable, "-c", KILL_SCRIPT, REPO_PATH, backup_path, str(entries)], cwd=work_dir)
+    deadline = time.time() + 60
+    while not os.path.exists(backup_path + ".tmp") and time.time() < deadline:
+        time.sleep(0.005)
+    time.sleep(0.05)
+    process.send_signal(signal.SIGKILL)
+    process.wait()
+    assert os.path.exists(backup_path + ".tmp"), "the write finished before the kill"
+    assert engine.load_xlsx_from_file(backup_path) == original
+    # The next write replaces the leftover temporary file
+    writer = BackupWriter(backup_path)
+    writer.save(make_workbook_bytes(original))
+    writer.stop()
+    assert not os.path.exists(backup_path + ".tmp") and engine.load_xlsx_from_file(backup_path) == original
+    print("backup still valid after a process killed mid-write")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"{'entries':>8} {'full ms':>8} {'stream ms':>9} {'queue ms':>8} {'on disk ms':>10} {'skip ms':>8}")
+        for size in args.sizes:
+            data = make_replacement_data(size)
+            content = make_workbook_bytes(data)
+            full_ms = timed(save_full, data, os.path.join(work_dir, "full.xlsx"))
+            stream_path = os.path.join(work_dir, "stream.xlsx")
+            stream_ms = timed(engine.save_xlsx_to_file, data, stream_path)
+            assert engine.load_xlsx_from_file(stream_path) == data
+
+            writer = BackupWriter(os.path.join(work_dir, f"backup_{size}.xlsx"))
+            start = time.perf_counter()
+            writer.save(content)
+            queue_ms = (time.perf_counter() - start) * 1000
+            writer.flush()
+            disk_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            writer.save(content)
+            writer.flush()
+            skip_ms = (time.perf_counter() - start) * 1000
+            writer.stop()
+            assert writer.writes == 1 and writer.skipped == 1, (writer.writes, writer.skipped)
+            assert engine.load_xlsx_from_file(writer.file_path) == data
+            print(f"{size:>8} {full_ms:>8.0f} {stream_ms:>9.0f} {queue_ms:>8.2f} {disk_ms:>10.1f} {skip_ms:>8.1f}")
+
+            # Queuing the downloaded bytes costs the reload nothing measurable
+            assert queue_ms < 5, queue_ms
+
+        check_killed_write(work_dir, max(args.sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Control API latency and memory of the headless engine.
+
+Serves engine.handle_command on a local socket with a synthetic dictionary loaded, and times
+the round trip of each command from a persistent ControlClient. The peak memory of a headless
+engine process is compared with main.py itself, both started from a compiled cache and measured
+once the dictionary is ready. main.py needs a display and the keyboard module; without them its
+memory is reported as not measured.
+
+The server is also checked against clients without the token: a request with a wrong token and a
+web page's text/plain POST carrying a reload command must both be refused, with the connection closed.
+
+Usage: python benchmarks/bench_control.py [--entries 20000] [--requests 2000]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_backends import REPO_PATH
+from synthetic import make_replacement_data, percentiles
+
+import engine
+from bench_startup import UNREACHABLE_SHEET_URL
+from control import ControlClient, ControlServer
+from dictionary_cache import content_hash, save_cache
+
+PEAK_MEMORY = """
+def peak_memory_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform != "darwin" else usage // 2 ** 20
+"""
+
+HEADLESS_SCRIPT = """
+import json, os, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[1] + "/benchmarks")
+os.chdir(sys.argv[2])
+import engine
+from fake_backends import FakeKeyboard
+""" + PEAK_MEMORY + """
+engine.start(FakeKeyboard())
+while "dictionary ready" not in engine.startup_timer.marks and time.perf_counter() - engine.startup_timer.start < 60:
+    time.sleep(0.01)
+assert "tkinter" not in sys.modules  # The engine never loads the GUI toolkit
+print(json.dumps(peak_memory_mb()))
+engine.stop()
+"""
+
+# Runs main.py unchanged; a thread reports the peak memory once the window's engine has its dictionary
+WINDOW_SCRIPT = """
+import json, os, resource, runpy, sys, threading, time
+sys.path.insert(0, sys.argv[1])
+os.chdir(sys.argv[2])
+import engine
+""" + PEAK_MEMORY + """
+def report():
+    start = time.perf_counter()
+    while "dictionary ready" not in engine.startup_timer.marks:
+        if time.perf_counter() - start > 60:
+            os._exit(1)
+        time.sleep(0.01)
+    print(json.dumps(peak_memory_mb()), flush=True)
+    os._exit(0)
+threading.Thread(target=report, daemon=True).start()
+runpy.run_path(os.path.join(sys.argv[1], "main.py"), run_name="__main__")
+"""
+
+
+def peak_memory_mb(script, entries, work_dir):
+    """
+    Peak memory in MB of `script` on a compiled cache of `entries` entries, or None if it could not run.
+    """
+    with open(os.path.join(work_dir, "settings.ini"), "w") as f:
+        f.write(f"[Settings]\nsheet_url = {UNREACHABLE_SHEET_URL}\n")
+    save_cache(os.path.join(work_dir, "replacement_data.cache"), content_hash(b"sheet"), UNREACHABLE_SHEET_URL,
+               make_replacement_data(entries), {}, {})
+    # A home of its own, so that main.py starts its engine instead of connecting to a running daemon
+    completed = subprocess.run([sys.executable, "-c", script, REPO_PATH, work_dir], capture_output=True, text=True,
+                               env={**os.environ, "HOME": work_dir}, timeout=120)
+    if completed.returncode != 0 or not completed.stdout.strip():
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def window_memory_mb(entries):
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        return None
+    with tempfile.TemporaryDirectory() as work_dir:
+        return peak_memory_mb(WINDOW_SCRIPT, entries, work_dir)
+
+
+def check_refused(work_dir):
+    """
+    Foreign clients get one error line and a closed connection, and none of their requests runs.
+    """
+    handled = []
+    server = ControlServer(lambda request: handled.append(request) or {"ok": True, "result": None},
+                           os.path.join(work_dir, "refused.sock"), os.path.join(work_dir, "token"))
+    server.start()
+    reload_request = {"command": "reload", "url": "http://attacker.invalid/sheet.xlsx"}
+    payloads = {
+        "no token": json.dumps(reload_request).encode() + b"\n",
+        "wrong token": json.dumps({**reload_request, "token": "0" * 64}).encode() + b"\n",
+        "web page POST": (b"POST / HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: text/plain\r\n\r\n"
+                          + json.dumps(reload_request).encode() + b"\n"),
+    }
+    for name, payload in payloads.items():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(server.address)
+        with sock, sock.makefile("rwb") as stream:
+            stream.write(payload)
+            stream.flush()
+            response = json.loads(stream.readline())
+            closed = stream.readline() == b""
+        print(f"{name}: {response['error']!r}, connection closed: {closed}")
+        assert not response["ok"] and closed, (name, response)
+    client = ControlClient(server.address, token_path=server.token_path)
+    client.call("status")
+    client.close()
+    server.stop()
+    assert handled == [{"command": "status"}], handled
+    assert os.stat(server.token_path).st_mode & 0o077 == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    replacement_data = make_replacement_data(args.entries)
+    engine.publish_replacement_data(replacement_data)
+    words = list(replacement_data)[:5]
+    commands = [
+        ("status", {}),
+        ("stats", {}),
+        ("pause", {}),
+        ("resume", {}),
+        ("expand", {"text": " ".join(words) + " "}),
+    ]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        token_path = os.path.join(work_dir, "token")
+        server = ControlServer(engine.handle_command, os.path.join(work_dir, "control.sock"), token_path)
+        server.start()
+        client = ControlClient(server.address, token_path=token_path)
+        client.call("status")  # Connect
+
+        print(f"{'command':>8} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+        clock = time.perf_counter_ns
+        medians = {}
+        for command, arguments in commands:
+            latencies = []
+            for _ in range(args.requests):
+                start = clock()
+                result = client.call(command, **arguments)
+                latencies.append((clock() - start) / 1000)
+            stats = percentiles(latencies)
+            medians[command] = stats["p50"]
+            print(f"{command:>8} {stats['p50']:>8.0f} {stats['p99']:>8.0f} {stats['max']:>8.0f}")
+        assert len(result["expansions"]) == len(words), result
+        client.close()
+        server.stop()
+        print()
+        check_refused(work_dir)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        headless = peak_memory_mb(HEADLESS_SCRIPT, args.entries, work_dir)
+    window = window_memory_mb(args.entries)
+    print()
+    print(f"peak memory, headless engine: {headless} MB")
+    print("peak memory, main.py:         " + (f"{window} MB" if window is not None
+                                               else "not measured (needs a display and the keyboard module)"))
+
+    # The control commands other than stats answer well under a millisecond
+    assert max(medians[command] for command in ("status", "pause", "resume", "expand")) < 1000, medians
+    assert headless is not None
+    if window is not None:
+        assert headless < window, (headless, window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare time spent in the keyboard hook callback when expansions are typed inline
+versus queued to the InjectionWorker, using a fake backend with a per-key delay.
+The keys typed while an expansion is being sent keep going to the matcher, so both modes must
+perform the same expansions.
+
+Usage: python benchmarks/bench_injection_queue.py [--words 300] [--key-delay 0.0002] [--type-delay 0.002]
+"""
+import argparse
+import time
+
+from fake_backends import FakeKeyboard
+from synthetic import make_replacement_data, make_key_stream, percentiles
+
+from injector import ExpansionJob, InjectionWorker, TypingInjector
+from matcher import ReplacementMatcher
+
+
+def run(keys, replacement_data, backend, queued, type_delay):
+    """
+    Feed the keys through a handler like main.handle_key and return the callback durations.
+    """
+    matcher = ReplacementMatcher(replacement_data)
+    injector = TypingInjector(backend)
+    worker = InjectionWorker(injector)
+    if queued:
+        worker.start()
+    callback_times = []
+    for name in keys:
+        start = time.perf_counter()
+        match = matcher.feed(name)
+        if match:
+            job = ExpansionJob(*match, "", " ", time.perf_counter(), None)
+            if queued:
+                worker.submit(job)
+            else:
+                injector.inject(job)
+                worker.injection_stats.add(time.perf_counter() - job.queued_at)
+        callback_times.append(time.perf_counter() - start)
+        if queued:
+            time.sleep(type_delay)  # Typing speed; the worker types while the user keeps typing
+    worker.stop()
+    return callback_times, worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--key-delay", type=float, default=0.0002, help="seconds per synthetic key")
+    parser.add_argument("--type-delay", type=float, default=0.002, help="seconds between typed keys, queued mode")
+    args = parser.parse_args()
+
+    replacement_data = make_replacement_data(1000)
+    keys = make_key_stream(replacement_data, args.words, hit_ratio=0.2)
+
+    print(f"{'mode':>7} {'cb p50 us':>10} {'cb p99 us':>10} {'cb max ms':>10} {'injections':>11} {'inject avg ms':>14}")
+    injections = {}
+    for mode, queued in (("inline", False), ("queued", True)):
+        backend = FakeKeyboard(key_delay=args.key_delay)
+        callback_times, worker = run(keys, replacement_data, backend, queued, args.type_delay)
+        stats = percentiles(callback_times, points=(50, 99))
+        injections[mode] = worker.injection_stats.count
+        inject_avg = worker.injection_stats.average * 1000
+        print(f"{mode:>7} {stats['p50'] * 1e6:>10.1f} {stats['p99'] * 1e6:>10.1f} {stats['max'] * 1000:>10.2f} "
+              f"{injections[mode]:>11} {inject_avg:>14.2f}")
+
+    assert injections["queued"] == injections["inline"] > 0, injections
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare the typing and paste injectors on expansions of growing length, with mock
+keyboard and clipboard backends. The keyboard backend sleeps a fixed time per synthetic
+key to model the target application.
+
+Usage: python benchmarks/bench_injectors.py [--lengths 20 200 1000 5000] [--key-delay 0.0001]
+"""
+import argparse
+import time
+
+from fake_backends import FakeClipboard, FakeKeyboard
+
+from injector import ExpansionJob, PasteInjector, TypingInjector
+
+
+def make_job(length):
+    line = "Uống thuốc theo toa, tái khám theo hẹn. "
+    text = (line * (length // len(line) + 1))[:length]
+    # One line break every ~80 characters, like the multi-paragraph templates of the sheet
+    text = "\n".join(text[i:i + 80] for i in range(0, len(text), 80))
+    return ExpansionJob("tvstm", text, "space", "", " ", time.perf_counter(), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[20, 200, 1000, 5000])
+    parser.add_argument("--key-delay", type=float, default=0.0001, help="seconds per synthetic key")
+    parser.add_argument("--restore-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'length':>7} {'injector':>8} {'keystrokes':>11} {'ms':>9} {'clipboard kept':>15}")
+    for length in args.lengths:
+        job = make_job(length)
+        for name in ("type", "paste"):
+            keyboard = FakeKeyboard(key_delay=args.key_delay)
+            clipboard = FakeClipboard("user clipboard")
+            if name == "type":
+                injector = TypingInjector(keyboard)
+            else:
+                injector = PasteInjector(keyboard, clipboard, restore_delay=args.restore_delay)
+            start = time.perf_counter()
+            injector.inject(job)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"{length:>7} {name:>8} {keyboard.keystrokes:>11} {elapsed_ms:>9.1f} "
+                  f"{str(clipboard.text == 'user clipboard'):>15}")
+
+
+if __name__ == "__main__":
+    main()
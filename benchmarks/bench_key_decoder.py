@@ -0,0 +1,139 @@
+"""
+Replay recorded Telex and VNI event streams through the key decoder and measure match accuracy and cost per event.
+
+Each stream (see ime_corpus.py) marks the abbreviation that should fire at every trigger key.
+The streams are replayed through the matcher twice: as the key handler did before the decoder,
+feeding the name of every key down and skipping any single character that is not alphanumeric,
+and through KeyDecoder. The accuracy is the share of trigger keys where exactly the expected
+abbreviation fired, or nothing when none was expected.
+
+Usage: python benchmarks/bench_key_decoder.py [--entries 20000] [--repeat 20] [corpus.events ...]
+"""
+import argparse
+import glob
+import os
+import time
+
+from synthetic import REPO_PATH, make_replacement_data
+
+from cursor_tracker import FOCUS_CHANGE_KEYS
+from ime_corpus import ABBREVIATIONS, WORDS
+from key_decoder import KeyDecoder, RESET, KEY_DOWN
+from matcher import ReplacementMatcher
+
+CORPUS_DIR = os.path.join(REPO_PATH, "benchmarks", "corpus")
+
+
+def load_corpus(file_path):
+    """
+    Return (events, expected): (event_type, key name, seconds) tuples, and {event index: expected word or None}.
+    """
+    events = []
+    expected = {}
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if fields[0] == "#expect":
+                expected[len(events)] = None if fields[1] == "-" else fields[1]
+            elif len(fields) == 3:
+                events.append((fields[1], fields[2], float(fields[0]) / 1000))
+    return events, expected
+
+
+def replay_legacy(matcher, events, expected):
+    """
+    Replay as the key handler did before the decoder; returns {event index: fired word or None} at the expected triggers.
+    """
+    matcher.reset()
+    fired = {}
+    for index, (event_type, name, _) in enumerate(events):
+        if event_type != KEY_DOWN:
+            continue
+        if name in FOCUS_CHANGE_KEYS:
+            matcher.reset()
+        if len(name) == 1 and not name.isalnum():
+            continue
+        match = matcher.feed(name)
+        if index in expected:
+            fired[index] = match[0] if match else None
+    return fired
+
+
+def replay_decoder(matcher, events, expected):
+    """
+    Replay through a KeyDecoder, as engine.on_key_event does.
+    """
+    matcher.reset()
+    decoder = KeyDecoder()
+    fired = {}
+    for index, (event_type, name, event_time) in enumerate(events):
+        keys = decoder.decode(event_type, name, event_time)
+        if not keys:
+            continue
+        if name in FOCUS_CHANGE_KEYS:
+            matcher.reset()
+        match = None
+        for key in keys:
+            if key is RESET:
+                matcher.reset()
+                continue
+            match = matcher.feed(key) or match
+        if index in expected:
+            fired[index] = match[0] if match else None
+    return fired
+
+
+def accuracy(fired, expected):
+    return sum(fired.get(index) == word for index, word in expected.items()) / len(expected)
+
+
+def time_replay(replay, matcher, events, expected, repeat):
+    """
+    Return the best ns per event over `repeat` replays.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        replay(matcher, events, expected)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("corpus", nargs="*", default=sorted(glob.glob(os.path.join(CORPUS_DIR, "*.events"))))
+    args = parser.parse_args()
+
+    replacement_data = make_replacement_data(args.entries)
+    for word in WORDS:
+        replacement_data.pop(word, None)  # Ordinary words of the text must not fire
+    replacement_data.update(ABBREVIATIONS)
+    matcher = ReplacementMatcher(replacement_data, "space", set())
+
+    print(f"{'corpus':<28} {'events':>7} {'triggers':>8} {'legacy':>7} {'decoder':>7} {'legacy ns':>9} {'decoder ns':>10}")
+    for file_path in args.corpus:
+        events, expected = load_corpus(file_path)
+        legacy_accuracy = accuracy(replay_legacy(matcher, events, expected), expected)
+        decoder_fired = replay_decoder(matcher, events, expected)
+        decoder_accuracy = accuracy(decoder_fired, expected)
+        legacy_ns = time_replay(replay_legacy, matcher, events, expected, args.repeat)
+        decoder_ns = time_replay(replay_decoder, matcher, events, expected, args.repeat)
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        print(f"{name:<28} {len(events):>7} {len(expected):>8} {legacy_accuracy:>7.1%} {decoder_accuracy:>7.1%}"
+              f" {legacy_ns:>9.0f} {decoder_ns:>10.0f}")
+        misses = [(index, word, decoder_fired.get(index)) for index, word in expected.items()
+                  if decoder_fired.get(index) != word]
+        for index, word, fired in misses[:5]:
+            print(f"    event {index}: expected {word!r}, fired {fired!r}")
+
+        assert decoder_accuracy > legacy_accuracy, (decoder_accuracy, legacy_accuracy)
+        assert decoder_accuracy >= 0.97, decoder_accuracy
+        # Decoding keeps the key handler in the microsecond range
+        assert decoder_ns < 5000, decoder_ns
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Merge layered dictionaries and measure the cost of a full build, of an incremental update of
+one layer, and of the per-key lookup in the merged index.
+
+Each layer overrides part of the words of the base layer and adds words of its own. The
+incremental update changes a few entries of one layer; the resulting matcher is checked
+against a matcher rebuilt from scratch on a replayed keystroke stream.
+
+Usage: python benchmarks/bench_layers.py [--layers 5] [--entries 20000] [--changes 50]
+"""
+import argparse
+import random
+import time
+
+from synthetic import make_replacement_data, make_key_stream, make_workbook_bytes, percentiles
+
+from layers import LayeredDictionary, DictionaryLayer
+from matcher import DictionarySnapshot
+from xlsx_reader import iter_xlsx_rows
+
+
+def make_layers(count, entries, override_ratio=0.3):
+    """
+    Build `count` layers of `entries` entries: the base layer, then layers overriding
+    `override_ratio` of the base words and adding new words.
+    """
+    base = make_replacement_data(entries, seed=0)
+    base_words = list(base)
+    rng = random.Random(42)
+    layers = [DictionaryLayer("base", 0, base, frozenset(), {}, None, "base")]
+    for priority in range(1, count):
+        overridden = rng.sample(base_words, int(entries * override_ratio))
+        replacement_data = make_replacement_data(entries - len(overridden), seed=priority)
+        replacement_data.update((word, f"Layer {priority} text for {word}") for word in overridden)
+        instant_words = frozenset(rng.sample(list(replacement_data), 20))
+        layers.append(DictionaryLayer(f"layer{priority}", priority, replacement_data, instant_words, {}, None, f"layer{priority}"))
+    return layers
+
+
+def build(layers):
+    dictionary = LayeredDictionary()
+    for layer in layers:
+        dictionary.set_layer(layer)
+    snapshot = DictionarySnapshot(dictionary.replacement_data, "space", dictionary.instant_words,
+                                  injection_modes=dictionary.injection_modes)
+    return dictionary, snapshot
+
+
+def edit_layer(layer, changes, seed=7):
+    """
+    Return a copy of `layer` with `changes` entries changed, removed or added.
+    """
+    rng = random.Random(seed)
+    replacement_data = dict(layer.replacement_data)
+    words = rng.sample(list(replacement_data), changes)
+    for index, word in enumerate(words):
+        if index % 3 == 0:
+            del replacement_data[word]
+        else:
+            replacement_data[word] = f"Edited {word}"
+    replacement_data.update((f"new{index}", f"New entry {index}") for index in range(changes // 3))
+    return layer._replace(replacement_data=replacement_data)
+
+
+def replay(matcher, keys):
+    clock = time.perf_counter_ns
+    latencies = []
+    matches = []
+    for name in keys:
+        start = clock()
+        match = matcher.feed(name)
+        latencies.append(clock() - start)
+        if match:
+            matches.append(match)
+    return latencies, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--layers", type=int, default=5)
+    parser.add_argument("--entries", type=int, default=20000, help="entries per layer")
+    parser.add_argument("--changes", type=int, default=50, help="entries edited in the updated layer")
+    parser.add_argument("--words", type=int, default=20000, help="words in the replayed keystroke stream")
+    args = parser.parse_args()
+
+    layers = make_layers(args.layers, args.entries)
+
+    start = time.perf_counter()
+    dictionary, snapshot = build(layers)
+    full_ms = (time.perf_counter() - start) * 1000
+    print(f"{args.layers} layers x {args.entries} entries -> {len(dictionary.replacement_data)} merged entries")
+    print(f"full merge and index:            {full_ms:8.1f} ms")
+
+    workbook = make_workbook_bytes(layers[-1].replacement_data)
+    start = time.perf_counter()
+    for _ in iter_xlsx_rows(workbook, min_row=2):
+        pass
+    print(f"parse one layer sheet (avoided): {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    for updated_index in (len(layers) - 1, 0):
+        edited = edit_layer(layers[updated_index], args.changes)
+        start = time.perf_counter()
+        changed_words = dictionary.set_layer(edited)
+        updated = DictionarySnapshot(dictionary.replacement_data, "space", dictionary.instant_words,
+                                     injection_modes=dictionary.injection_modes,
+                                     previous=snapshot, changed_words=changed_words)
+        incremental_ms = (time.perf_counter() - start) * 1000
+
+        layers[updated_index] = edited
+        start = time.perf_counter()
+        _, rebuilt = build(layers)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        print(f"update {edited.name:>6} ({len(changed_words):>3} words changed): incremental {incremental_ms:6.2f} ms, "
+              f"full rebuild {rebuild_ms:7.1f} ms")
+
+        # The incrementally updated index must behave exactly like the rebuilt one
+        assert dict(updated.replacement_data) == dict(rebuilt.replacement_data)
+        keys = make_key_stream(rebuilt.replacement_data, args.words)
+        for word in changed_words:
+            keys += list(word) + ["space"]
+        _, updated_matches = replay(updated.matcher, keys)
+        _, rebuilt_matches = replay(rebuilt.matcher, keys)
+        assert updated_matches == rebuilt_matches
+        snapshot = updated
+
+    print()
+    print(f"{'index':>14} {'entries':>8} {'p50 ns':>7} {'p90 ns':>7} {'p99 ns':>7}")
+    keys = make_key_stream(snapshot.replacement_data, args.words)
+    single = DictionarySnapshot(layers[0].replacement_data)
+    for name, matcher, entries in (("base only", single.matcher, len(layers[0].replacement_data)),
+                                   ("merged", snapshot.matcher, len(snapshot.replacement_data))):
+        replay(matcher, keys[:1000])  # Warm up
+        stats = percentiles(replay(matcher, keys)[0])
+        print(f"{name:>14} {entries:>8} {stats['p50']:>7} {stats['p90']:>7} {stats['p99']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure keyboard hook restart latency against a fake keyboard backend and check
+that no key event is lost or delivered twice while the hook is restarted.
+
+A producer thread emits key events through the fake backend the way the `keyboard`
+library does (every registered handler gets the same event object) while the main
+thread restarts the listener over and over.
+
+Usage: python benchmarks/bench_listener_restart.py [--events 200000] [--restarts 500]
+"""
+import argparse
+import threading
+import time
+
+from fake_backends import FakeEvent, FakeKeyboard
+from synthetic import percentiles
+
+from keyboard_listener import KeyboardListener
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--restarts", type=int, default=500)
+    args = parser.parse_args()
+
+    backend = FakeKeyboard()
+    received = []
+    listener = KeyboardListener(backend, lambda event: received.append(event.sequence))
+    listener.start()
+
+    done = threading.Event()
+
+    def produce():
+        for sequence in range(args.events):
+            backend.emit(FakeEvent("down", "a", sequence))
+        done.set()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    restart_times = []
+    while not done.is_set() and len(restart_times) < args.restarts:
+        start = time.perf_counter_ns()
+        listener.restart()
+        restart_times.append(time.perf_counter_ns() - start)
+    producer.join()
+
+    start = time.perf_counter_ns()
+    listener.stop()
+    listener.join()
+    stop_ns = time.perf_counter_ns() - start
+
+    lost = args.events - len(set(received))
+    duplicated = len(received) - len(set(received))
+    stats = percentiles(restart_times, points=(50, 90, 99))
+    print(f"events emitted: {args.events}, restarts: {len(restart_times)}")
+    print(f"restart latency us: p50 {stats['p50'] / 1000:.1f}  p90 {stats['p90'] / 1000:.1f}  "
+          f"p99 {stats['p99'] / 1000:.1f}  max {stats['max'] / 1000:.1f}")
+    print(f"stop + join us: {stop_ns / 1000:.1f}")
+    print(f"lost events: {lost}, duplicated events: {duplicated}, in order: {received == sorted(received)}")
+    print(f"hooks left registered: {len(backend.handlers)}")
+    if lost or duplicated or backend.handlers:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
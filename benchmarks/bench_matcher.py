@@ -0,0 +1,78 @@
+"""
+Replay a keystroke stream against the trie matcher and the old buffer lookup.
+
+Usage: python benchmarks/bench_matcher.py [--stream recorded_keys.txt] [--sizes 1000 10000 100000]
+"""
+import argparse
+import time
+
+from synthetic import make_replacement_data, make_key_stream, load_key_stream, percentiles
+
+from matcher import ReplacementMatcher
+
+
+def legacy_handler(replacement_data):
+    """
+    The buffer based key handler used before the matcher, without the keyboard side effects.
+    """
+    buffer = ""
+
+    def handle_key(name):
+        nonlocal buffer
+        match = None
+        if name == 'space':
+            if buffer in replacement_data:
+                match = (buffer, replacement_data[buffer], name)
+            buffer = ""
+        elif name == 'backspace':
+            buffer = buffer[:-1]
+        elif name.isalnum() and name not in ['ctrl', 'enter']:
+            buffer += name
+        return match
+
+    return handle_key
+
+
+def replay(handle_key, keys):
+    """
+    Feed every key to the handler and return the per-key latencies in nanoseconds and the match count.
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    matches = 0
+    for name in keys:
+        start = clock()
+        match = handle_key(name)
+        latencies.append(clock() - start)
+        if match:
+            matches += 1
+    return latencies, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stream", help="recorded keystroke stream, one key name per line")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--words", type=int, default=20000, help="words in the synthetic stream")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'engine':>8} {'build ms':>9} {'matches':>8} "
+          f"{'p50 ns':>8} {'p90 ns':>8} {'p99 ns':>8} {'p99.9 ns':>9} {'max ns':>9}")
+    for size in args.sizes:
+        replacement_data = make_replacement_data(size)
+        keys = load_key_stream(args.stream) if args.stream else make_key_stream(replacement_data, args.words)
+
+        start = time.perf_counter()
+        matcher = ReplacementMatcher(replacement_data)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for engine, handle_key, build in (("trie", matcher.feed, build_ms), ("legacy", legacy_handler(replacement_data), 0.0)):
+            replay(handle_key, keys[:1000])  # Warm up
+            latencies, matches = replay(handle_key, keys)
+            stats = percentiles(latencies)
+            print(f"{size:>8} {engine:>8} {build:>9.1f} {matches:>8} "
+                  f"{stats['p50']:>8} {stats['p90']:>8} {stats['p99']:>8} {stats['p99.9']:>9} {stats['max']:>9}")
+
+
+if __name__ == "__main__":
+    main()
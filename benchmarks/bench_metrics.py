@@ -0,0 +1,121 @@
+"""
+Measure the cost of the metrics recorded in the key handler, and of taking and writing a snapshot.
+
+The key stream is replayed through the matcher with and without the counters and histograms
+that main.py's handle_key records, so the difference is the per-key overhead of the metrics.
+A SharedHistogram updated from several threads at once must count every value.
+
+Usage: python benchmarks/bench_metrics.py [--entries 20000] [--words 20000]
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+
+from synthetic import make_replacement_data, make_key_stream, percentiles
+
+from matcher import ReplacementMatcher
+from metrics import MetricsRegistry, write_snapshot
+
+
+def plain_handler(matcher):
+    def handle_key(name):
+        return matcher.feed(name)
+
+    return handle_key
+
+
+def instrumented_handler(matcher, metrics):
+    """
+    The metrics handle_key records on every key, without the keyboard side effects.
+    """
+    key_events = metrics.counter("key_events")
+    matches = metrics.counter("matches")
+    lookup_stats = metrics.histogram("lookup")
+    callback_stats = metrics.histogram("hook_callback")
+    clock = time.perf_counter
+
+    def handle_key(name):
+        start = clock()
+        key_events.add()
+        lookup_start = clock()
+        match = matcher.feed(name)
+        lookup_stats.add(clock() - lookup_start)
+        if match:
+            matches.add()
+        callback_stats.add(clock() - start)
+        return match
+
+    return handle_key
+
+
+def replay(handle_key, keys):
+    clock = time.perf_counter_ns
+    latencies = []
+    for name in keys:
+        start = clock()
+        handle_key(name)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def check_shared_histogram(threads=4, count=200000):
+    """
+    Add `count` values from each of `threads` threads to one shared histogram; none may be lost.
+    """
+    histogram = MetricsRegistry().histogram("dictionary_compile", shared=True)
+
+    def add_values():
+        for _ in range(count):
+            histogram.add(0.001)
+
+    workers = [threading.Thread(target=add_values) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    print(f"shared histogram: {histogram.count} of {threads * count} values from {threads} threads")
+    assert histogram.count == sum(histogram.buckets) == threads * count, histogram.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=20000)
+    args = parser.parse_args()
+
+    replacement_data = make_replacement_data(args.entries)
+    keys = make_key_stream(replacement_data, args.words)
+    metrics = MetricsRegistry()
+
+    print(f"{'handler':>13} {'p50 ns':>8} {'p90 ns':>8} {'p99 ns':>8} {'mean ns':>8}")
+    for name, handle_key in (("plain", plain_handler(ReplacementMatcher(replacement_data))),
+                             ("instrumented", instrumented_handler(ReplacementMatcher(replacement_data), metrics))):
+        replay(handle_key, keys[:1000])  # Warm up
+        latencies = replay(handle_key, keys)
+        stats = percentiles(latencies)
+        print(f"{name:>13} {stats['p50']:>8} {stats['p90']:>8} {stats['p99']:>8} {sum(latencies) / len(latencies):>8.0f}")
+
+    assert metrics.counter("key_events").value == len(keys) + 1000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for extension in ("json", "csv"):
+            file_path = os.path.join(temp_dir, f"metrics.{extension}")
+            start = time.perf_counter()
+            write_snapshot(metrics.snapshot(), file_path)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with open(file_path, newline='', encoding='utf-8') as f:
+                if extension == "json":
+                    key_events = json.load(f)["counters"]["key_events"]
+                else:
+                    key_events = next(int(row["value"]) for row in csv.DictReader(f) if row["metric"] == "key_events")
+            assert key_events == len(keys) + 1000
+            print(f"snapshot + write {extension}: {elapsed_ms:.2f} ms")
+    check_shared_histogram()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Count the synthetic keystrokes of the minimal-edit expansion against retyping the whole
+expansion, for every entry of a replacement sheet (by default the shipped backup sheet),
+plus a synthetic set of completion-style entries ("bn" -> "bnh nhân").
+
+Usage: python benchmarks/bench_minimal_edit.py [--xlsx dist/backup_replacement_data.xlsx] [--completions 1000]
+"""
+import argparse
+import os
+import random
+import time
+
+from synthetic import REPO_PATH
+
+from injector import ExpansionJob, naive_keystrokes, plan_edit
+from xlsx_reader import iter_xlsx_rows
+
+DEFAULT_XLSX = os.path.join(REPO_PATH, "dist", "backup_replacement_data.xlsx")
+SPECIAL_ROWS = ("BEFORE_REPLACEMENT", "AFTER_REPLACEMENT", "TRIGGER_KEYS", "LINK_EDIT_FILE")
+
+
+def sheet_entries(file_path):
+    """
+    Read (word, replacement) pairs the way parse_rows_for_replacements does, plus BEFORE/AFTER_REPLACEMENT.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    entries = []
+    before, after = "", " "
+    for row in iter_xlsx_rows(data, min_row=2):
+        word = str(row[0] if row[0] is not None else "").strip()
+        replacement = str(row[1] if row[1] is not None else "")
+        if word == "BEFORE_REPLACEMENT":
+            before = replacement
+        elif word == "AFTER_REPLACEMENT":
+            after = replacement
+        elif word and word not in SPECIAL_ROWS:
+            entries.append((word, replacement.replace('\\n', '\n')))
+    return entries, before, after
+
+
+def completion_entries(count, seed=0):
+    rng = random.Random(seed)
+    entries = []
+    for _ in range(count):
+        word = "".join(rng.choice("abcdefghiklmnopqrstuvxy") for _ in range(rng.randint(2, 4)))
+        entries.append((word, word + "".join(rng.choice("ahnêôư ") for _ in range(rng.randint(3, 30)))))
+    return entries
+
+
+def report(label, entries, before, after):
+    naive = minimal = 0
+    start = time.perf_counter()
+    for word, replacement in entries:
+        job = ExpansionJob(word, replacement, "space", before, after, 0.0, None)
+        plan = plan_edit(job)
+        naive += naive_keystrokes(job)
+        minimal += plan.backspaces + len(plan.text)
+    plan_us = (time.perf_counter() - start) / max(len(entries), 1) * 1e6
+    saved = (naive - minimal) / naive * 100 if naive else 0.0
+    print(f"{label:>12} {len(entries):>8} {naive:>10} {minimal:>10} {saved:>8.1f}% {plan_us:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xlsx", default=DEFAULT_XLSX)
+    parser.add_argument("--completions", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'entries':>12} {'count':>8} {'retype':>10} {'minimal':>10} {'saved':>9} {'plan us':>10}")
+    entries, before, after = sheet_entries(args.xlsx)
+    report("sheet", entries, before, after)
+    report("completions", completion_entries(args.completions), "", " ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure the CPU cost of mouse tracking with a synthetic event generator.
+
+The generator replays a 1000 Hz mouse moving in small circles for --seconds of simulated time,
+with a key typed every 150 ms during the "typing" phases. It compares the old always-on
+on_mouse_move callback with the CursorInvalidator (armed only while a word is typed,
+sampled motion, self-stopping when idle, stopped while paused). The invalidator's listeners
+must be started on its own thread, never by arm() in the key handler; the generator waits for
+them in real time, outside the simulated clock.
+
+Usage: python benchmarks/bench_mouse_tracking.py [--seconds 60] [--rate 1000]
+"""
+import argparse
+import functools
+import math
+import operator
+import threading
+import time
+from unittest import mock
+
+from fake_backends import FakeMouseListener
+
+import cursor_tracker
+from cursor_tracker import CursorInvalidator
+
+
+class LegacyTracker:
+    """
+    The module-level on_mouse_move callback used before, called for every motion event.
+    """
+
+    def __init__(self):
+        self.last_mouse_position = (0, 0)
+        self.mouse_moved_significantly = False
+
+    def on_move(self, x, y):
+        if abs(x - self.last_mouse_position[0]) > 10 or abs(y - self.last_mouse_position[1]) > 10:
+            self.mouse_moved_significantly = True
+            self.last_mouse_position = (x, y)
+
+
+class NoTracker:
+    """
+    Receives nothing; measures the cost of the event generator itself.
+    """
+
+
+def run(scenario, seconds, rate, tracker):
+    """
+    Replay the synthetic events in simulated time and return (CPU seconds, callbacks delivered).
+    """
+    clock = [0.0]
+    delivered = 0
+    invalidator = isinstance(tracker, CursorInvalidator)
+    if invalidator:
+        tracker.start()
+        tracker.pause() if scenario == "paused" else tracker.resume()
+    elif isinstance(tracker, LegacyTracker):
+        # The old listener was started at import time and never stopped
+        FakeMouseListener(on_move=tracker.on_move).start()
+
+    key_every = int(rate * 0.15)
+    events = int(seconds * rate)
+    positions = [(500 + 30 * math.cos(i / rate * 2 * math.pi), 400 + 30 * math.sin(i / rate * 2 * math.pi))
+                 for i in range(events)]
+    simulated_monotonic = functools.partial(operator.getitem, clock, 0)  # Cheap stand-in for time.monotonic
+    with mock.patch.object(cursor_tracker.time, "monotonic", simulated_monotonic):
+        start = time.process_time()
+        for index in range(events):
+            clock[0] = index / rate
+            x, y = positions[index]
+            if FakeMouseListener.running:
+                delivered += len(FakeMouseListener.running)
+                FakeMouseListener.move(x, y)
+            # Type a 5 letter word every 3 s in the typing scenario: arm on the letters, disarm on the space
+            if scenario == "typing" and invalidator and index % key_every == 0:
+                step = (index // key_every) % 20
+                if step < 5:
+                    tracker.arm()
+                    while step == 0 and not FakeMouseListener.running:  # Started on the invalidator's thread
+                        time.sleep(0.0001)
+                elif step == 5:
+                    tracker.consume_invalidation()
+                    tracker.disarm()
+        cpu = time.process_time() - start
+    if invalidator:
+        tracker.stop()
+    FakeMouseListener.running.clear()
+    return cpu, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--rate", type=int, default=1000, help="motion events per second")
+    args = parser.parse_args()
+
+    print(f"{'scenario':>9} {'tracker':>12} {'callbacks':>10} {'CPU ms':>8} {'listeners started':>18}")
+    FakeMouseListener.started_on.clear()
+    for scenario in ("idle", "typing", "paused"):
+        generator_cpu, _ = run(scenario, args.seconds, args.rate, NoTracker())
+        for name in ("legacy", "invalidator"):
+            FakeMouseListener.started = 0
+            tracker = LegacyTracker() if name == "legacy" else CursorInvalidator(FakeMouseListener)
+            cpu, delivered = run(scenario, args.seconds, args.rate, tracker)
+            cpu = max(0.0, cpu - generator_cpu)  # Only the tracking overhead
+            print(f"{scenario:>9} {name:>12} {delivered:>10} {cpu * 1000:>8.1f} {FakeMouseListener.started:>18}")
+    # Only the legacy listener is started by the generator itself
+    assert FakeMouseListener.started_on == {threading.current_thread().name, "mouse-watch"}, FakeMouseListener.started_on
+
+
+if __name__ == "__main__":
+    main()
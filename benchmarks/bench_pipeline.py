@@ -0,0 +1,199 @@
+"""
+Benchmark the whole expansion pipeline headless and compare it with a stored baseline.
+
+For each size a synthetic workbook is parsed and published as the engine does after a download
+(load time and peak traced memory), then a synthetic typing stream goes through the engine's own
+key handler, on_key_event(), behind a KeyboardListener on the fake keyboard, and the expansions are
+typed by the engine's injector thread into the fake keyboard. Reported per size:
+
+  parse_ms, publish_ms     - parse_xlsx_bytes_for_replacements, publish_replacement_data, best of --repeat
+  peak_mb                  - traced peak memory of both
+  key_p50_ns, key_p99_ns   - time of one key down event through the hook
+  keystrokes_per_s         - synthetic keystrokes the injector sends, for a batch of replace_word() calls,
+                             while the fake keyboard echoes each of them through the hook
+
+--json writes the results to a file; --baseline compares them with a stored file and fails when a
+metric is more than --tolerance worse. Baselines are only comparable on the same machine: refresh
+benchmarks/baseline_pipeline.json with --json when it changes.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 1000 20000 200000] [--words 3000] [--repeat 3] [--json results.json]
+       [--baseline benchmarks/baseline_pipeline.json] [--tolerance 0.5]
+"""
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from fake_backends import FakeEvent, FakeKeyboard, FakeMouseListener, REPO_PATH
+from synthetic import make_replacement_data, make_key_stream, make_workbook_bytes, percentiles
+
+import engine
+from cursor_tracker import CursorInvalidator
+from injector import InjectionWorker
+from keyboard_listener import KeyboardListener
+from metrics import MetricsRegistry
+
+DEFAULT_BASELINE = os.path.join(REPO_PATH, "benchmarks", "baseline_pipeline.json")
+HIGHER_IS_BETTER = {"keystrokes_per_s"}
+
+
+def measure_load(content, repeat):
+    """
+    Parse and publish the workbook; returns the best (parse ms, publish ms) of `repeat` runs and the peak MB of a traced run.
+    """
+    parse_ms = publish_ms = float("inf")
+    for _ in range(repeat):
+        engine.publish_replacement_data({})
+        gc.collect()
+        start = time.perf_counter()
+        replacement_data = engine.parse_xlsx_bytes_for_replacements(content)
+        parse_ms = min(parse_ms, (time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        engine.publish_replacement_data(replacement_data)
+        publish_ms = min(publish_ms, (time.perf_counter() - start) * 1000)
+
+    engine.publish_replacement_data({})
+    gc.collect()
+    tracemalloc.start()
+    engine.publish_replacement_data(engine.parse_xlsx_bytes_for_replacements(content))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return parse_ms, publish_ms, peak / 2 ** 20
+
+
+def start_pipeline():
+    """
+    Wire the engine to the fake backends as start() does, without the sync, cache or profile threads.
+    """
+    keyboard = FakeKeyboard(echo=True)  # The injector's keys come back through the hook, as they do for real
+    engine.keyboard = keyboard
+    engine.cursor_invalidator = CursorInvalidator(FakeMouseListener, on_invalidate=engine.release_held_keys)
+    engine.cursor_invalidator.start()
+    engine.injection_worker = InjectionWorker(engine.create_injector(), metrics=MetricsRegistry())
+    engine.injection_worker.start()
+    engine.keyboard_listener = KeyboardListener(keyboard, engine.on_key_event(), suppress=True)
+    engine.keyboard_listener.start()
+    return keyboard
+
+
+def stop_pipeline():
+    engine.keyboard.wait_echo()
+    engine.keyboard_listener.stop()
+    engine.keyboard_listener.join(1)
+    engine.injection_worker.stop(5)
+    engine.cursor_invalidator.stop()
+
+
+def wait_idle():
+    while engine.injection_worker.busy:
+        time.sleep(0.0001)
+
+
+def replay(keyboard, keys):
+    """
+    Type `keys` through the hook; returns the ns of each key down. After an expansion is queued the
+    replay waits for it to be typed, as a user would, outside the measured time.
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    for sequence, name in enumerate(keys):
+        event = FakeEvent("down", name, sequence, time.time())
+        start = clock()
+        keyboard.emit(event)
+        latencies.append(clock() - start)
+        keyboard.emit(FakeEvent("up", name, sequence, time.time()))
+        if engine.injection_worker.busy:
+            wait_idle()
+            keyboard.wait_echo()
+    return latencies
+
+
+def measure_injection(keyboard, replacement_data, count):
+    """
+    Queue `count` expansions through replace_word() and return the injected keystrokes per second.
+    """
+    words = list(replacement_data)[:count]
+    keystrokes = keyboard.keystrokes
+    start = time.perf_counter()
+    for word in words:
+        while not engine.injection_worker.queue.empty():  # Stay within the queue size
+            time.sleep(0.0001)
+        engine.replace_word(word, replacement_data[word])
+    wait_idle()
+    return (keyboard.keystrokes - keystrokes) / (time.perf_counter() - start)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each metric against the baseline; returns the regressions as (size, metric, value, baseline value).
+    """
+    regressions = []
+    print(f"\n{'size':>8} {'metric':<18} {'baseline':>12} {'now':>12} {'change':>8}")
+    for size, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(size, {}).get(metric)
+            if not reference:
+                continue
+            change = value / reference - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"{size:>8} {metric:<18} {reference:>12.1f} {value:>12.1f} {change:>+8.0%}{flag}")
+            if flag:
+                regressions.append((size, metric, value, reference))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 200000])
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--expansions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with this results file, e.g. " + os.path.relpath(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'size':>8} {'parse ms':>9} {'publish ms':>10} {'peak MB':>8} {'key p50 ns':>10} {'key p99 ns':>10}"
+          f" {'keys/s':>9} {'expanded':>8}")
+    for size in args.sizes:
+        replacement_data = make_replacement_data(size)
+        content = make_workbook_bytes(replacement_data)
+        parse_ms, publish_ms, peak_mb = measure_load(content, args.repeat)
+        assert len(engine.active_snapshot.replacement_data) == size
+
+        keyboard = start_pipeline()
+        keys = make_key_stream(replacement_data, words=args.words)
+        matches = engine.metrics.counter("matches").value
+        latencies = percentiles(replay(keyboard, keys))
+        expanded = engine.metrics.counter("matches").value - matches
+        assert engine.injection_worker.expansions.value == expanded > 0, (engine.injection_worker.expansions.value, expanded)
+        keystrokes_per_s = measure_injection(keyboard, replacement_data, args.expansions)
+        stop_pipeline()
+
+        results[str(size)] = {
+            "parse_ms": round(parse_ms, 1),
+            "publish_ms": round(publish_ms, 1),
+            "peak_mb": round(peak_mb, 1),
+            "key_p50_ns": latencies["p50"],
+            "key_p99_ns": latencies["p99"],
+            "keystrokes_per_s": round(keystrokes_per_s),
+        }
+        print(f"{size:>8} {parse_ms:>9.0f} {publish_ms:>10.0f} {peak_mb:>8.1f} {latencies['p50']:>10}"
+              f" {latencies['p99']:>10} {keystrokes_per_s:>9.0f} {expanded:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        assert not regressions, f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}"
+
+
+if __name__ == "__main__":
+    main()
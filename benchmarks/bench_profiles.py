@@ -0,0 +1,127 @@
+"""
+Switch application profiles under a replayed keystroke stream with a fake foreground detector.
+
+The key handler swaps to the snapshot of the profile picked by the foreground watcher, which
+samples the detector at a low rate on its own thread. The benchmark checks that expansions come
+from the profile of the focused application, that the detector is sampled independently of the
+number of keys, and compares the per-key cost with a handler without profiles.
+
+Usage: python benchmarks/bench_profiles.py [--entries 20000] [--words 20000] [--interval 0.01]
+"""
+import argparse
+import threading
+import time
+
+from fake_backends import FakeForegroundDetector
+from synthetic import make_replacement_data, make_key_stream, percentiles
+
+from app_profiles import ForegroundApp, ForegroundWatcher, ProfileSelector, DEFAULT_PROFILE
+from matcher import DictionarySnapshot
+
+APPS = [ForegroundApp("winword.exe", "Report.docx - Word"), ForegroundApp("Code", "main.py - Visual Studio Code"),
+        ForegroundApp("firefox", "Mail - Mozilla Firefox")]
+PATTERNS = ["winword.exe", "code", "title:*mail*"]
+
+
+class ProfileState:
+    """
+    The profile globals of main.py: the snapshots of every profile and the one used by the key handler.
+    """
+
+    def __init__(self, snapshots, selector):
+        self.snapshots = snapshots
+        self.selector = selector
+        self.profile = DEFAULT_PROFILE
+        self.active = snapshots[DEFAULT_PROFILE]
+        self.lock = threading.Lock()
+
+    def switch(self, app):
+        profile = self.selector.profile_for(app)
+        if profile != self.profile:
+            with self.lock:
+                self.profile = profile
+                self.active = self.snapshots[profile]
+
+
+def make_handler(state):
+    last_snapshot = None
+
+    def handle_key(name):
+        nonlocal last_snapshot
+        snapshot = state.active
+        matcher = snapshot.matcher
+        if snapshot is not last_snapshot:
+            matcher.reset()
+            last_snapshot = snapshot
+        return matcher.feed(name)
+
+    return handle_key
+
+
+def replay(handle_key, keys):
+    clock = time.perf_counter_ns
+    latencies = []
+    matches = []
+    for name in keys:
+        start = clock()
+        match = handle_key(name)
+        latencies.append(clock() - start)
+        if match:
+            matches.append(match)
+    return latencies, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=0.01, help="foreground sampling interval in seconds")
+    args = parser.parse_args()
+
+    base = make_replacement_data(args.entries)
+    snapshots = {DEFAULT_PROFILE: DictionarySnapshot(base)}
+    for pattern in PATTERNS:
+        # Every profile overrides all the words with its own text, so a match tells which profile was used
+        snapshots[pattern] = DictionarySnapshot({word: f"{pattern}: {word}" for word in base})
+    keys = make_key_stream(base, args.words)
+
+    plain = DictionarySnapshot(base).matcher
+    replay(plain.feed, keys[:1000])  # Warm up
+    plain_stats = percentiles(replay(plain.feed, keys)[0])
+
+    state = ProfileState(snapshots, ProfileSelector(PATTERNS))
+    detector = FakeForegroundDetector()
+    watcher = ForegroundWatcher(detector, state.switch, args.interval)
+    watcher.start()
+    handle_key = make_handler(state)
+
+    print(f"{'app':>12} {'profile':>14} {'switch ms':>10} {'matches':>8} {'wrong':>6} {'p50 ns':>7} {'p99 ns':>7}")
+    all_latencies = []
+    for app in APPS + [None]:
+        detector.app = app
+        expected = state.selector.profile_for(app)
+        start = time.perf_counter()
+        while state.profile != expected:  # Wait for the watcher to pick up the new window
+            time.sleep(args.interval / 10)
+        switch_ms = (time.perf_counter() - start) * 1000
+
+        latencies, matches = replay(handle_key, keys)
+        all_latencies += latencies
+        prefix = "" if expected == DEFAULT_PROFILE else f"{expected}: "
+        wrong = sum(1 for _, replacement, _ in matches if not replacement.startswith(prefix) or
+                    (expected == DEFAULT_PROFILE and ": " in replacement.split("\n")[0]))
+        stats = percentiles(latencies)
+        name = app.process if app else "(none)"
+        print(f"{name:>12} {expected:>14} {switch_ms:>10.1f} {len(matches):>8} {wrong:>6} {stats['p50']:>7} {stats['p99']:>7}")
+        assert wrong == 0
+
+    watcher.stop()
+    stats = percentiles(all_latencies)
+    print()
+    print(f"per key, without profiles: p50 {plain_stats['p50']} ns, p99 {plain_stats['p99']} ns")
+    print(f"per key, with profiles:    p50 {stats['p50']} ns, p99 {stats['p99']} ns")
+    print(f"detector sampled {detector.calls} times for {len(all_latencies)} keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Replay a keystroke stream against dictionaries with a growing number of case-insensitive and pattern rules.
+
+The plain words stay in the case-folded trie and the regex/wildcard rules are compiled once and
+indexed by their literal prefix, or their literal suffix when they start with a wildcard or a group,
+so neither the per-key nor the per-trigger cost should grow with the number of rules. The benchmark also checks the case propagation and the capture substitution
+on a few known inputs.
+
+Usage: python benchmarks/bench_rules.py [--entries 20000] [--rules 0 100 1000 5000] [--words 20000]
+"""
+import argparse
+import random
+import string
+import time
+
+from synthetic import make_replacement_data, make_key_stream, percentiles
+
+from matcher import ReplacementMatcher
+
+EXPECTED = [
+    # (typed, expected replacement)
+    ("bn", "bonjour"),
+    ("Bn", "Bonjour"),
+    ("BN", "BONJOUR"),
+    ("Tel", "Telephone"),  # Exact entry in the sheet, no case propagation
+    ("addrhome", "Address: home"),
+    ("ADDRHOME", "ADDRESS: HOME"),
+    ("12kg", "12 kilograms"),
+    ("x7y", "<7>"),
+]
+
+
+def make_rules(count, seed=2):
+    """
+    Build `count` wildcard and regex rules: most with distinct literal prefixes, a quarter without
+    one (leading wildcard, regex starting with a group), which all share the root of the index.
+    """
+    rng = random.Random(seed)
+    rules = {}
+    while len(rules) < count:
+        literal = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 6)))
+        kind = rng.random()
+        if kind < 0.6:
+            rules[literal + "*"] = f"{literal} \\1"
+        elif kind < 0.75:
+            rules[f"re:{literal}(\\d+)"] = f"{literal} number \\1"
+        elif kind < 0.9:
+            rules["*" + literal] = f"\\1 {literal}"
+        else:
+            rules[f"re:(\\d+){literal}"] = f"\\1 {literal}"
+    return rules
+
+
+def make_mixed_stream(keys, seed=3):
+    """
+    Type a third of the words with a capital first letter and some in capitals.
+    """
+    rng = random.Random(seed)
+    mixed = []
+    word_start = True
+    shout = False
+    for name in keys:
+        if len(name) == 1:
+            if word_start:
+                shout = rng.random() < 0.05
+                name = name.upper() if shout or rng.random() < 0.3 else name
+            elif shout:
+                name = name.upper()
+            word_start = False
+        else:
+            word_start = name == 'space'
+        mixed.append(name)
+    return mixed
+
+
+def replay(matcher, keys):
+    clock = time.perf_counter_ns
+    latencies = []
+    matches = 0
+    trigger_latencies = []
+    for name in keys:
+        start = clock()
+        match = matcher.feed(name)
+        elapsed = clock() - start
+        latencies.append(elapsed)
+        if name == 'space':
+            trigger_latencies.append(elapsed)
+        if match:
+            matches += 1
+    return latencies, trigger_latencies, matches
+
+
+def check_expected():
+    matcher = ReplacementMatcher({"bn": "bonjour", "Tel": "Telephone", "addr*": "Address: \\1",
+                                  "re:(\\d+)kg": "\\1 kilograms", "x?y": "<\\1>"}, ignore_case=True)
+    for typed, expected in EXPECTED:
+        match = None
+        for name in list(typed) + ['space']:
+            match = matcher.feed(name) or match
+        assert match is not None and match[1] == expected, (typed, match, expected)
+    print(f"{len(EXPECTED)} case and pattern checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--rules", type=int, nargs="+", default=[0, 100, 1000, 5000])
+    parser.add_argument("--words", type=int, default=20000)
+    args = parser.parse_args()
+
+    check_expected()
+    base = make_replacement_data(args.entries)
+    keys = make_mixed_stream(make_key_stream(base, args.words))
+
+    print(f"{'rules':>6} {'build ms':>9} {'matches':>8} {'key p50 ns':>11} {'key p99 ns':>11} {'trigger p50':>12} {'trigger p99':>12}")
+    results = []
+    trigger_results = []
+    for count in args.rules:
+        data = dict(base)
+        data.update(make_rules(count))
+        start = time.perf_counter()
+        matcher = ReplacementMatcher(data, ignore_case=True)
+        build_ms = (time.perf_counter() - start) * 1000
+        replay(matcher, keys[:1000])  # Warm up
+        latencies, trigger_latencies, matches = replay(matcher, keys)
+        stats = percentiles(latencies)
+        trigger_stats = percentiles(trigger_latencies)
+        results.append(stats["p50"])
+        trigger_results.append(trigger_stats["p50"])
+        print(f"{count:>6} {build_ms:>9.1f} {matches:>8} {stats['p50']:>11} {stats['p99']:>11} "
+              f"{trigger_stats['p50']:>12} {trigger_stats['p99']:>12}")
+
+    # Typing keys only walk the trie; on a trigger key only the rules sharing the word's prefix are tried
+    assert max(results) < 3 * min(results) + 500, results
+    assert max(trigger_results[1:] or [0]) < 3 * min(trigger_results[1:] or [0]) + 2000, trigger_results
+
+
+if __name__ == "__main__":
+    main()
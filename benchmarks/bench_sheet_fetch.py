@@ -0,0 +1,125 @@
+"""
+Check and time the conditional sheet refresh against a local HTTP stand-in.
+
+The stand-in serves a synthetic workbook with an ETag and Last-Modified header and answers
+304 Not Modified to matching conditional requests (or never, with --no-validators, to exercise
+the content-hash skip). Each refresh cycle reports the status seen, the body bytes transferred
+and the time taken. A sheet with settings rows but no replacements is then served to the engine's
+sync, which must refuse it without applying any of its settings.
+
+Usage: python benchmarks/bench_sheet_fetch.py [--size 20000] [--no-validators]
+"""
+import argparse
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import make_replacement_data, make_workbook_bytes
+
+import engine
+from sheet_fetcher import SheetFetcher
+
+
+class SheetServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, body, use_validators=True):
+        super().__init__(("127.0.0.1", 0), SheetHandler)
+        self.use_validators = use_validators
+        self.statuses = []
+        self.bytes_sent = 0
+        self.set_body(body)
+
+    def set_body(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.last_modified = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime())
+
+
+class SheetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so the pooled session can reuse the connection
+
+    def do_GET(self):
+        server = self.server
+        if server.use_validators and self.headers.get("If-None-Match") == server.etag:
+            server.statuses.append(304)
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        server.statuses.append(200)
+        server.bytes_sent += len(server.body)
+        self.send_response(200)
+        if server.use_validators:
+            self.send_header("ETag", server.etag)
+            self.send_header("Last-Modified", server.last_modified)
+        self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check_empty_sheet(server, url):
+    """
+    Sync a download without replacements: the engine raises, and its settings, per-entry options
+    and dictionary stay as they were.
+    """
+    engine.sheet_fetcher = SheetFetcher()  # No state file
+    engine.publish_replacement_data(make_replacement_data(100))
+    before = engine.current_settings(), engine.INSTANT_WORDS, engine.INJECTION_MODES, engine.active_snapshot
+    server.set_body(make_workbook_bytes({}, special_rows=[("AFTER_REPLACEMENT", "!"), ("TRIGGER_KEYS", "x")]))
+    try:
+        engine.sync_replacement_data(url)
+    except ValueError as e:
+        print(f"\nempty sheet: {e}, settings kept")
+    else:
+        raise AssertionError("a sheet without replacements was accepted")
+    after = engine.current_settings(), engine.INSTANT_WORDS, engine.INJECTION_MODES, engine.active_snapshot
+    assert after == before, (after[0], before[0])
+    engine.sheet_fetcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000, help="rows in the synthetic sheet")
+    parser.add_argument("--no-validators", action="store_true", help="serve no ETag/Last-Modified")
+    args = parser.parse_args()
+
+    first = make_workbook_bytes(make_replacement_data(args.size, seed=0))
+    second = make_workbook_bytes(make_replacement_data(args.size, seed=1))
+    server = SheetServer(first, use_validators=not args.no_validators)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/pub?output=xlsx"
+
+    fetcher = SheetFetcher()
+    known_hash = None
+    # (label, body served before the refresh, expected changed flag)
+    cycles = [("initial", first, True), ("unchanged", first, False), ("unchanged", first, False),
+              ("edited", second, True), ("unchanged", second, False)]
+
+    print(f"{'cycle':>10} {'status':>7} {'changed':>8} {'body bytes':>11} {'ms':>8}")
+    for label, body, expected_changed in cycles:
+        if body is not server.body:
+            server.set_body(body)
+        bytes_before = server.bytes_sent
+        start = time.perf_counter()
+        result = fetcher.fetch(url, known_hash)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert result.changed == expected_changed, f"{label}: expected changed={expected_changed}"
+        if result.changed:
+            known_hash = result.content_hash  # The caller would parse and keep this content now
+        print(f"{label:>10} {server.statuses[-1]:>7} {str(result.changed):>8} "
+              f"{server.bytes_sent - bytes_before:>11} {elapsed_ms:>8.1f}")
+
+    fetcher.close()
+    check_empty_sheet(server, url)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Startup timing report: module import times, time to a hook ready to match keys, and first paint.
+
+Every import is timed in a fresh interpreter. The hook-ready times use the fake keyboard
+backend, so the report runs headless; first paint is only measured when a display is available.
+engine.start() is also timed in a fresh interpreter, from a compiled cache: its hook is ready
+before the dictionary, which is loaded and indexed on its own thread.
+
+Usage: python benchmarks/bench_startup.py [--entries 20000] [--repeat 3] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_backends import FakeKeyboard, REPO_PATH
+from synthetic import make_replacement_data, make_workbook_bytes
+
+from dictionary_cache import content_hash, load_cache, save_cache
+from keyboard_listener import KeyboardListener
+from matcher import DictionarySnapshot, DEFAULT_TRIGGER_KEYS
+from xlsx_reader import iter_xlsx_rows
+
+PROJECT_MODULES = ["matcher", "xlsx_reader", "dictionary_cache", "backup_writer", "sheet_fetcher", "sync_scheduler",
+                   "keyboard_listener", "cursor_tracker", "key_decoder", "key_holder", "injector", "startup_timing",
+                   "usage_store", "engine", "control"]
+THIRD_PARTY_MODULES = ["tkinter", "keyboard", "requests", "openpyxl", "pynput.mouse", "pyperclip"]
+
+# What main.py imports before the window is shown, before and after moving the heavy modules off the startup path
+EAGER_STARTUP = ["tkinter", "keyboard", "requests", "openpyxl", "pynput.mouse"] + PROJECT_MODULES
+LAZY_STARTUP = ["tkinter", "keyboard"] + PROJECT_MODULES
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+sys.path.insert(0, sys.argv[1])
+missing = []
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        missing.append(name)
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "missing": missing}))
+"""
+
+ENGINE_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[1] + "/benchmarks")
+os.chdir(sys.argv[2])
+import engine
+from fake_backends import FakeKeyboard
+from startup_timing import StartupTimer
+engine.SHEET_URL = sys.argv[3]
+timer = StartupTimer()
+engine.start(FakeKeyboard(), timer)
+while "dictionary ready" not in timer.marks and time.perf_counter() - timer.start < 60:
+    time.sleep(0.001)
+engine.stop()
+print(json.dumps(timer.marks))
+"""
+UNREACHABLE_SHEET_URL = "http://127.0.0.1:9/sheet.xlsx"  # The sync fails at once, the cache is used
+
+PAINT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import tkinter as tk
+root = tk.Tk()
+root.geometry("800x400")
+for row in range(6):
+    tk.Label(root, text=f"Label {row}").grid(row=row, column=0)
+    tk.Entry(root, width=50).grid(row=row, column=1)
+root.update()
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000}))
+root.destroy()
+"""
+
+
+def run_script(script, *args):
+    completed = subprocess.run([sys.executable, "-c", script, *args], capture_output=True, text=True)
+    if completed.returncode != 0:
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def import_time(modules, repeat):
+    """
+    Best time in ms to import `modules` in a fresh interpreter, and the modules that are not installed.
+    """
+    runs = [run_script(IMPORT_SCRIPT, REPO_PATH, *modules) for _ in range(repeat)]
+    return min(run["ms"] for run in runs), runs[0]["missing"]
+
+
+def first_paint(repeat):
+    """
+    Best time in ms from starting to import tkinter to a drawn window, or None without a display.
+    """
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        return None
+    runs = [run_script(PAINT_SCRIPT) for _ in range(repeat)]
+    if None in runs:
+        return None
+    return min(run["ms"] for run in runs)
+
+
+def hook_ready(load_dictionary):
+    """
+    Time in ms to get the dictionary with `load_dictionary`, compile it and start the hook on a fake keyboard.
+    """
+    start = time.perf_counter()
+    replacement_data = load_dictionary()
+    DictionarySnapshot(replacement_data, DEFAULT_TRIGGER_KEYS)
+    listener = KeyboardListener(FakeKeyboard(), lambda event: None)
+    listener.start()
+    elapsed = (time.perf_counter() - start) * 1000
+    listener.stop()
+    listener.join()
+    return elapsed
+
+
+def engine_start(entries):
+    """
+    Run engine.start() on a compiled cache of `entries` entries; returns its startup marks in ms.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        replacement_data = make_replacement_data(entries)
+        save_cache(os.path.join(work_dir, "replacement_data.cache"), content_hash(b"sheet"), UNREACHABLE_SHEET_URL,
+                   replacement_data, {}, {})
+        return run_script(ENGINE_SCRIPT, REPO_PATH, work_dir, UNREACHABLE_SHEET_URL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000, help="entries in the synthetic dictionary")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {"imports": {}, "startup_imports": {}, "hook_ready": {}, "engine_start": None, "first_paint": None}
+    for name in THIRD_PARTY_MODULES + PROJECT_MODULES:
+        ms, missing = import_time([name], args.repeat)
+        report["imports"][name] = None if missing else ms
+    for label, modules in (("eager", EAGER_STARTUP), ("lazy", LAZY_STARTUP)):
+        ms, missing = import_time(modules, args.repeat)
+        report["startup_imports"][label] = {"ms": ms, "missing": missing}
+
+    replacement_data = make_replacement_data(args.entries)
+    workbook = make_workbook_bytes(replacement_data)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = os.path.join(temp_dir, "replacement_data.cache")
+        save_cache(cache_path, content_hash(workbook), "url", replacement_data, {}, {})
+        hook_ready(lambda: load_cache(cache_path).replacement_data)  # Warm up
+        report["hook_ready"]["cache"] = min(hook_ready(lambda: load_cache(cache_path).replacement_data)
+                                            for _ in range(args.repeat))
+    # The old startup parsed the downloaded workbook before starting the hook (download time not included)
+    report["hook_ready"]["sheet"] = min(hook_ready(lambda: {row[0]: row[1] for row in iter_xlsx_rows(workbook, min_row=2)})
+                                        for _ in range(args.repeat))
+    report["engine_start"] = engine_start(args.entries)
+    report["first_paint"] = first_paint(args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'module':>20} {'import ms':>10}")
+    for name, ms in report["imports"].items():
+        print(f"{name:>20} {'not installed' if ms is None else f'{ms:.1f}':>10}")
+    print()
+    for label, result in report["startup_imports"].items():
+        missing = f" (not installed: {', '.join(result['missing'])})" if result["missing"] else ""
+        print(f"startup imports, {label:>5}: {result['ms']:8.1f} ms{missing}")
+    print(f"hook ready from the cache:   {report['hook_ready']['cache']:8.1f} ms ({args.entries} entries)")
+    print(f"hook ready after parsing:    {report['hook_ready']['sheet']:8.1f} ms (plus the download)")
+    marks = report["engine_start"]
+    if marks is None:
+        print("engine.start():               failed")
+    else:
+        print(f"engine.start(): hook ready {marks['hook ready']:.1f} ms, dictionary ready"
+              f" {marks.get('dictionary ready', float('nan')):.1f} ms ({args.entries} entries)")
+        assert marks["hook ready"] < marks.get("dictionary ready", float("inf")), marks
+    if report["first_paint"] is None:
+        print("first paint:                 skipped (no display)")
+    else:
+        print(f"first paint:                 {report['first_paint']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Log bursts of records from worker threads through the status bar handler and count the redraws,
+against the old handler that redrew the status bar from the logging thread on every record.
+Also compares an f-string log call with a %-style, level-guarded one while INFO is disabled.
+
+Usage: python benchmarks/bench_status_log.py [--records 20000] [--threads 4] [--rate 4]
+"""
+import argparse
+import logging
+import threading
+import time
+
+from fake_backends import FakeTkWidget
+
+from status_log import StatusBarHandler
+
+
+class DirectStatusBarHandler(logging.Handler):
+    """
+    The handler used before: formats and redraws on the thread that logs.
+    """
+
+    def __init__(self, widget):
+        super().__init__()
+        self.widget = widget
+
+    def emit(self, record):
+        self.widget.config(text=self.format(record))
+
+
+def log_burst(logger, records, threads):
+    """
+    Log `records` records spread over `threads` threads. Returns the seconds spent in the logging calls.
+    """
+    per_thread = records // threads
+
+    def worker(index):
+        for number in range(per_thread):
+            logger.info("Replaced '%s' with %d keystrokes in %.1f ms", f"word{index}", number, 1.5)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def disabled_call_cost(calls):
+    """
+    Nanoseconds per call of an INFO log line while the logger is at WARNING.
+    """
+    logger = logging.getLogger("bench.disabled")
+    logger.setLevel(logging.WARNING)
+    word, keystrokes, elapsed = "word", 12, 0.0015
+    results = {}
+
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        logger.info(f"Replaced '{word}' with {keystrokes} keystrokes in {elapsed * 1000:.1f} ms")
+    results["f-string"] = (time.perf_counter_ns() - start) / calls
+
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Replaced '%s' with %d keystrokes in %.1f ms", word, keystrokes, elapsed * 1000)
+    results["guarded %-style"] = (time.perf_counter_ns() - start) / calls
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=4, help="status bar updates per second")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time the fake Tk loop runs after the burst")
+    args = parser.parse_args()
+
+    print(f"{'handler':>8} {'records':>8} {'log us/rec':>11} {'redraws':>8} {'off-thread redraws':>19}")
+    for name in ("direct", "queued"):
+        widget = FakeTkWidget()
+        logger = logging.getLogger(f"bench.{name}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = DirectStatusBarHandler(widget) if name == "direct" else StatusBarHandler(widget, args.rate)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+        if name == "queued":
+            handler.start()
+
+        tk_thread = threading.current_thread()
+        off_thread = 0
+        config = widget.config
+
+        def counting_config(text):
+            nonlocal off_thread
+            if threading.current_thread() is not tk_thread:
+                off_thread += 1
+            config(text)
+
+        widget.config = counting_config
+        seconds = log_burst(logger, args.records, args.threads)
+        widget.run_for(args.seconds)
+        handler.close()
+        logger.removeHandler(handler)
+        records = args.records // args.threads * args.threads
+        print(f"{name:>8} {records:>8} {seconds / records * 1e6:>11.2f} {len(widget.texts):>8} {off_thread:>19}")
+
+        if name == "queued":
+            # The burst is shown within one interval, then nothing is redrawn until new records arrive
+            assert off_thread == 0
+            assert len(widget.texts) <= args.rate * args.seconds + 1
+
+    print()
+    for style, ns in disabled_call_cost(200000).items():
+        print(f"INFO disabled, {style:>16}: {ns:6.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Compare the suppressing hook mode with the default hook on the fake keyboard.
+
+The same synthetic typing stream goes through the engine's key handler twice, behind a
+KeyboardListener on the fake keyboard: with the default hook, where the typed keys reach the
+application and an expansion deletes the typed word, and with a KeyHolder, where the keys of a
+word that may still expand are held back. Reported per mode:
+
+  expansion keys   - synthetic keystrokes of the expansions, of which backspaces
+  released keys    - held back keys sent on unchanged, because the word did not expand
+  key p50/p99 ns   - time of one key down event through the hook
+
+The typos of the synthetic stream are left out: a word corrected with backspace is sent on when
+the typo leaves the trie, and expands by deleting it, as with the default hook. Both modes must
+leave the same text in the application. The flush latency is the time until held
+keys show up after a key that leaves the trie, and after the last key when no other key follows
+(the hold timeout).
+
+Keys typed while an expansion is being sent are checked on a slow fake keyboard that echoes the
+synthetic keys to the hook: both modes expand every word and queue the other keys behind the
+expansion, so the text comes out as if typed slowly, without the hook ever waiting for the
+expansion to be typed. Shortcuts and clicks
+while keys are held send the held keys on, and the shortcut reaches the application unchanged.
+
+Usage: python benchmarks/bench_suppress.py [--entries 2000] [--words 2000] [--timeout 0.3]
+"""
+import argparse
+import time
+
+from fake_backends import FakeEvent, FakeKeyboard, FakeMouseListener
+from synthetic import make_replacement_data, make_key_stream, percentiles
+
+import engine
+from cursor_tracker import CursorInvalidator
+from injector import InjectionWorker
+from key_holder import KeyHolder, DEFAULT_HOLD_TIMEOUT
+from keyboard_listener import KeyboardListener
+from metrics import MetricsRegistry
+
+NAMED_KEYS = {"<space>": " ", "<enter>": "\n", "<tab>": "\t"}
+
+
+def start_pipeline(suppress, timeout, keyboard=None):
+    """
+    Wire the engine to the fake backends as start() does, with or without the suppressing hook mode (the KeyHolder).
+    """
+    keyboard = keyboard or FakeKeyboard(echo=True)  # The injector's keys come back through the hook
+    engine.keyboard = keyboard
+    engine.cursor_invalidator = CursorInvalidator(FakeMouseListener, on_invalidate=engine.release_held_keys)
+    engine.cursor_invalidator.start()
+    engine.injection_worker = InjectionWorker(engine.create_injector(), metrics=MetricsRegistry())
+    engine.injection_worker.start()
+    engine.key_holder = None
+    if suppress:
+        engine.key_holder = KeyHolder(lambda keys: engine.injection_worker.release(keys, engine.output_backend()), timeout,
+                                      MetricsRegistry())
+    engine.keyboard_listener = KeyboardListener(keyboard, engine.on_key_event(), suppress=True)
+    engine.keyboard_listener.start()
+    return keyboard
+
+
+def stop_pipeline():
+    engine.keyboard.wait_echo()
+    engine.keyboard_listener.stop()
+    engine.keyboard_listener.join(1)
+    if engine.key_holder is not None:
+        engine.key_holder.stop()
+        engine.key_holder = None
+    engine.injection_worker.stop(5)
+    engine.cursor_invalidator.stop()
+
+
+def wait_idle():
+    while engine.injection_worker.busy:
+        time.sleep(0.0001)
+
+
+def screen_text(keyboard):
+    """
+    The text in the application after the keys on the fake keyboard's screen.
+    """
+    text = []
+    for key in keyboard.screen:
+        if key == "<backspace>":
+            if text:
+                text.pop()
+        else:
+            text.append(NAMED_KEYS.get(key, key))
+    return "".join(text)
+
+
+def replay(keyboard, keys):
+    """
+    Type `keys` through the hook; returns the ns of each key down. Expansions and released keys are
+    waited for, as a user would, outside the measured time.
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    for sequence, name in enumerate(keys):
+        event = FakeEvent("down", name, sequence, time.time())
+        start = clock()
+        keyboard.emit(event)
+        latencies.append(clock() - start)
+        keyboard.emit(FakeEvent("up", name, sequence, time.time()))
+        if engine.injection_worker.busy:
+            wait_idle()
+            keyboard.wait_echo()
+    return latencies
+
+
+def run_mode(suppress, replacement_data, keys, timeout):
+    """
+    Replay `keys` in one mode; returns the final text and the counts of the table.
+    """
+    keyboard = start_pipeline(suppress, timeout)
+    latencies = percentiles(replay(keyboard, keys))
+    if engine.key_holder is not None:
+        engine.key_holder.release()  # The last word, normally sent on by the timeout
+    wait_idle()
+    worker = engine.injection_worker
+    result = {
+        "text": screen_text(keyboard),
+        "expanded": worker.expansions.value,
+        "expansion_keys": worker.keystrokes.value,
+        "backspaces": keyboard.output.count("<backspace>"),
+        "released": worker.keys_released.value,
+        "latencies": latencies,
+    }
+    stop_pipeline()
+    return result
+
+
+def flush_latency(word, off_trie_key, timeout):
+    """
+    Hold the beginning of `word`, then measure the ms until it shows up after `off_trie_key`,
+    and after the timeout when no key follows.
+    """
+    results = []
+    for next_key in (off_trie_key, None):
+        keyboard = start_pipeline(True, timeout)
+        prefix = list(word[:-1])
+        replay(keyboard, prefix)
+        assert keyboard.screen == [], keyboard.screen  # Every key of the prefix is held back
+        start = time.perf_counter()
+        if next_key is not None:
+            keyboard.emit(FakeEvent("down", next_key, len(prefix), time.time()))
+        expected = prefix + ([next_key] if next_key else [])
+        while keyboard.screen != expected and time.perf_counter() - start < timeout + 1:
+            time.sleep(0.0001)
+        results.append((time.perf_counter() - start) * 1000)
+        assert keyboard.screen == expected, (keyboard.screen, expected)
+        stop_pipeline()
+    return results
+
+
+def type_during_expansion(suppress, text, key_delay, wait):
+    """
+    Type `text` on a fake keyboard sending `key_delay` seconds per synthetic key and echoing it to the hook,
+    without waiting for the expansions unless `wait`; returns (expansions, final text, slowest key down in ms).
+    """
+    keyboard = start_pipeline(suppress, 5, FakeKeyboard(key_delay, echo=True))
+    slowest = 0.0
+    for sequence, char in enumerate(text):
+        name = {" ": "space"}.get(char, char)
+        start = time.perf_counter()
+        keyboard.emit(FakeEvent("down", name, sequence, time.time()))
+        slowest = max(slowest, time.perf_counter() - start)
+        keyboard.emit(FakeEvent("up", name, sequence, time.time()))
+        if wait:
+            wait_idle()
+            keyboard.wait_echo()
+        time.sleep(0.001)
+    if engine.key_holder is not None:
+        engine.key_holder.release()
+    wait_idle()
+    keyboard.wait_echo()
+    result = engine.injection_worker.expansions.value, screen_text(keyboard), slowest * 1000
+    stop_pipeline()
+    return result
+
+
+def check_typed_during_expansion(key_delay=0.01):
+    """
+    "bn ok xn " typed fast while the expansion of "bn" is still being sent.
+    """
+    engine.publish_replacement_data({"bn": "bệnh nhân", "xn": "xét nghiệm"})
+    text = "bn ok xn "
+    for mode, suppress in (("default", False), ("suppress", True)):
+        expected_count, expected_text, _ = type_during_expansion(suppress, text, key_delay, wait=True)
+        count, typed, _ = type_during_expansion(suppress, text, key_delay, wait=False)
+        print(f"{mode:<10} typed during an expansion: {count} expansions, {typed!r} (typed slowly {expected_text!r})")
+        assert count == expected_count == 2, (count, expected_count)
+        assert typed == expected_text, (typed, expected_text)
+
+
+def check_hook_never_waits(key_delay=0.01):
+    """
+    Type more keys than the injection queue holds while a 200 character expansion is being sent:
+    every key down returns at once, instead of waiting for the expansion to be typed.
+    """
+    engine.publish_replacement_data({"lg": "0123456789" * 20})
+    text = "lg " + "ok " * 20
+    count, typed, slowest_ms = type_during_expansion(True, text, key_delay, wait=False)
+    print(f"{len(text) - 3} keys typed during a 200 character expansion: slowest key down {slowest_ms:.1f} ms")
+    assert count == 1 and typed == "0123456789" * 20 + " " + text[3:], typed
+    assert slowest_ms < 50, slowest_ms
+
+
+def check_shortcuts():
+    """
+    Hold "b", then press Ctrl+S, Alt or click: "b" is sent on right away, the shortcut keys are
+    let through and never sent again, and Ctrl+S is not typed as text. "b" is sent when the
+    modifier goes down, so it reaches the application before the key of the shortcut.
+    """
+    engine.publish_replacement_data({"bn": "bệnh nhân"})
+    sequences = {
+        "ctrl+s": ([("down", "ctrl"), ("down", "s"), ("up", "s"), ("up", "ctrl")], ["<ctrl>", "b", "s"]),
+        "alt": ([("down", "alt"), ("up", "alt")], ["<alt>", "b"]),
+        "click": ([], ["b"]),
+    }
+    for name, (events, expected) in sequences.items():
+        keyboard = start_pipeline(True, 5)
+        replay(keyboard, ["b"])
+        assert keyboard.screen == [], keyboard.screen
+        passed = []
+        for sequence, (event_type, key) in enumerate(events, 1):
+            if not keyboard.emit(FakeEvent(event_type, key, sequence, time.time())) and event_type == "down":
+                passed.append(f"suppressed {key}")
+            wait_idle()  # A person takes a while to press the next key
+        if name == "click":
+            deadline = time.perf_counter() + 1
+            while not FakeMouseListener.running and time.perf_counter() < deadline:
+                time.sleep(0.0001)  # Started on the invalidator's thread once a word is typed
+            FakeMouseListener.click(100, 100)
+        wait_idle()
+        keyboard.wait_echo()
+        print(f"b, then {name}: sent {keyboard.output}, application got {keyboard.screen}")
+        assert keyboard.output == ["b"] and not passed, (keyboard.output, passed)
+        assert keyboard.screen == expected, (keyboard.screen, expected)
+        stop_pipeline()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_HOLD_TIMEOUT)
+    args = parser.parse_args()
+
+    replacement_data = make_replacement_data(args.entries)
+    engine.publish_replacement_data(replacement_data)
+    keys = make_key_stream(replacement_data, words=args.words)
+    keys = [key for key, next_key in zip(keys, keys[1:] + [None]) if "backspace" not in (key, next_key)]
+
+    print(f"{'mode':<10} {'expanded':>8} {'expansion keys':>14} {'backspaces':>10} {'released keys':>13}"
+          f" {'key p50 ns':>10} {'key p99 ns':>10}")
+    results = {}
+    for mode, suppress in (("default", False), ("suppress", True)):
+        result = results[mode] = run_mode(suppress, replacement_data, keys, args.timeout)
+        print(f"{mode:<10} {result['expanded']:>8} {result['expansion_keys']:>14} {result['backspaces']:>10}"
+              f" {result['released']:>13} {result['latencies']['p50']:>10} {result['latencies']['p99']:>10}")
+
+    default, suppress = results["default"], results["suppress"]
+    assert suppress["text"] == default["text"], "the modes left different text in the application"
+    assert suppress["expanded"] == default["expanded"] > 0, (suppress["expanded"], default["expanded"])
+    # Held back words are replaced without deleting anything
+    assert suppress["backspaces"] == 0 and default["backspaces"] > 0, (suppress["backspaces"], default["backspaces"])
+    assert suppress["expansion_keys"] < default["expansion_keys"], (suppress["expansion_keys"], default["expansion_keys"])
+
+    # A long word whose beginning is no word itself; "-" is in none of the synthetic words
+    word = max((word for word in replacement_data if word[:-1] not in replacement_data), key=len)
+    off_trie_ms, timeout_ms = flush_latency(word, "-", args.timeout)
+    print(f"\nflush of {len(word) - 1} held keys: {off_trie_ms:.1f} ms after a key off the trie,"
+          f" {timeout_ms:.0f} ms without a following key (timeout {args.timeout * 1000:.0f} ms)")
+    assert off_trie_ms < 50, off_trie_ms
+    assert args.timeout * 1000 <= timeout_ms < args.timeout * 1000 + 100, timeout_ms
+
+    print()
+    check_typed_during_expansion()
+    check_hook_never_waits()
+    check_shortcuts()
+
+
+if __name__ == "__main__":
+    main()
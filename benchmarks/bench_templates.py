@@ -0,0 +1,128 @@
+"""
+Measure the template placeholders: load time compilation, rendering, and the cost left on plain entries.
+
+Replacements with {date}, {time}, {clipboard} or {cursor} are compiled once per snapshot into
+segment lists; the expansion only looks up whether the entry has a template. The benchmark
+compares that lookup for plain and template entries with the rendering on the injector thread,
+and checks the injected text and the caret moves with a fake keyboard.
+
+Usage: python benchmarks/bench_templates.py [--entries 100000] [--template-ratio 0.05] [--expansions 100000]
+"""
+import argparse
+import random
+import time
+
+from fake_backends import FakeClipboard, FakeKeyboard
+from synthetic import make_replacement_data
+
+from injector import ExpansionJob, InjectionWorker, TypingInjector
+from matcher import DictionarySnapshot
+from templates import TemplateContext
+
+TEMPLATES = ["Ngày {date}, lúc {time}: ", "Kính gửi {cursor},\nTrân trọng.", "Trích: {clipboard}", "{date:%A} {cursor}"]
+
+
+def make_data(entries, template_ratio, seed=4):
+    rng = random.Random(seed)
+    data = make_replacement_data(entries)
+    for word in data:
+        if rng.random() < template_ratio:
+            data[word] = rng.choice(TEMPLATES) + word
+    return data
+
+
+def time_lookups(snapshot, words):
+    """
+    Return the average ns per word spent in template_for(), beyond reading the replacement.
+    """
+    clock = time.perf_counter_ns
+    replacement_data = snapshot.replacement_data
+    start = clock()
+    for word in words:
+        replacement_data[word]
+    baseline = clock() - start
+    start = clock()
+    for word in words:
+        snapshot.template_for(word, replacement_data[word])
+    return (clock() - start - baseline) / len(words)
+
+
+def check_injection():
+    keyboard = FakeKeyboard()
+    context = TemplateContext("%d/%m/%Y", "%H:%M", FakeClipboard("copied text"))
+    worker = InjectionWorker(TypingInjector(keyboard), template_context=context)
+    snapshot = DictionarySnapshot({"kg": "Kính gửi {cursor},\nTrân trọng.", "tr": "Trích: {clipboard}", "bn": "bệnh nhân"})
+    worker.start()
+    for word in ("kg", "tr", "bn"):
+        replacement = snapshot.template_for(word, snapshot.replacement_data[word])
+        worker.submit(ExpansionJob(word, replacement, "space", "", " ", time.perf_counter(), None))
+    worker.stop()
+    output = "".join(keyboard.output)
+    expected = ("<backspace><backspace><backspace>Kính gửi ,<enter>Trân trọng. " + "<left>" * 14
+                + "<backspace><backspace><backspace>Trích: copied text "
+                + "<backspace><backspace>ệnh nhân ")
+    assert output == expected, output
+    assert isinstance(snapshot.template_for("bn", "bệnh nhân"), str)
+
+    # Typed in capitals: the text is upper-cased, the date format is not
+    snapshot = DictionarySnapshot({"ng": "Ngày {date:%d/%m/%Y}", "hr*": "Giờ \\1 {time:%H:%M}"}, ignore_case=True)
+    for typed, expected in (("NG", "NGÀY " + time.strftime("%d/%m/%Y")), ("Ng", "Ngày " + time.strftime("%d/%m/%Y")),
+                            ("HRX", "GIỜ X " + time.strftime("%H:%M"))):
+        for key in typed:
+            snapshot.matcher.feed(key)
+        word, replacement, _ = snapshot.matcher.feed("space")
+        rendered = snapshot.template_for(snapshot.matcher.last_rule, replacement).render(context).text
+        assert rendered == expected, (typed, rendered, expected)
+    print("template injection checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--template-ratio", type=float, default=0.05)
+    parser.add_argument("--expansions", type=int, default=100000)
+    args = parser.parse_args()
+
+    check_injection()
+    data = make_data(args.entries, args.template_ratio)
+    start = time.perf_counter()
+    DictionarySnapshot(data)
+    build_ms = (time.perf_counter() - start) * 1000
+    plain_data = {word: replacement.replace("{", "(") for word, replacement in data.items()}
+    start = time.perf_counter()
+    snapshot = DictionarySnapshot(plain_data)
+    plain_build_ms = (time.perf_counter() - start) * 1000
+    snapshot = DictionarySnapshot(data)
+
+    rng = random.Random(5)
+    plain_words = [word for word in data if word not in snapshot.templates]
+    template_words = list(snapshot.templates)
+    plain_ns = time_lookups(snapshot, [rng.choice(plain_words) for _ in range(args.expansions)])
+    template_ns = time_lookups(snapshot, [rng.choice(template_words) for _ in range(args.expansions)])
+
+    context = TemplateContext(clipboard=FakeClipboard("copied text"))
+    clock = time.perf_counter_ns
+    start = clock()
+    for word in template_words * max(1, args.expansions // len(template_words)):
+        snapshot.templates[word].render(context)
+    render_ns = (clock() - start) / (len(template_words) * max(1, args.expansions // len(template_words)))
+
+    print(f"{len(data)} entries, {len(template_words)} templates")
+    print(f"snapshot build: {build_ms:.0f} ms, without placeholders {plain_build_ms:.0f} ms")
+    print(f"template_for(), plain entry:      {plain_ns:>7.0f} ns")
+    print(f"template_for(), template entry:   {template_ns:>7.0f} ns")
+    print(f"render on the injector thread:    {render_ns:>7.0f} ns")
+
+    # Plain entries only pay for one dictionary lookup per expansion, nothing per key
+    assert plain_ns < 1000, plain_ns
+
+    # Incremental updates keep the templates of the unchanged words
+    changed = dict(data)
+    word = template_words[0]
+    changed[word] = "plain now"
+    updated = DictionarySnapshot(changed, previous=snapshot, changed_words={word})
+    assert word not in updated.templates and len(updated.templates) == len(template_words) - 1
+
+
+if __name__ == "__main__":
+    main()
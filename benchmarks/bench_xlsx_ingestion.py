@@ -0,0 +1,84 @@
+"""
+Compare time and peak memory of the XLSX ingestion paths on synthetic sheets.
+
+  full      - the old path: temp file + openpyxl.load_workbook + iter_rows(min_row=2) reading .value
+  readonly  - openpyxl read_only workbook from memory with values_only rows
+  streaming - xlsx_reader.iter_xlsx_rows straight from the bytes
+
+Usage: python benchmarks/bench_xlsx_ingestion.py [--sizes 1000 10000 50000]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+from synthetic import make_replacement_data, make_workbook_bytes
+
+from xlsx_reader import iter_xlsx_rows
+
+SPECIAL_ROWS = [
+    ("BEFORE_REPLACEMENT", ""),
+    ("AFTER_REPLACEMENT", " "),
+    ("LINK_EDIT_FILE", "https://example.com/edit"),
+]
+
+
+def rows_full(data):
+    temp_file = os.path.join(tempfile.gettempdir(), "bench_replacement_data.xlsx")
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    workbook = openpyxl.load_workbook(temp_file)
+    rows = [(row[0].value, row[1].value) for row in workbook.active.iter_rows(min_row=2)]
+    os.remove(temp_file)
+    return rows
+
+
+def rows_readonly(data):
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    rows = [row[:2] for row in workbook.active.iter_rows(min_row=2, values_only=True)]
+    workbook.close()
+    return rows
+
+
+def rows_streaming(data):
+    return [row[:2] for row in iter_xlsx_rows(data, min_row=2)]
+
+
+def measure(reader, data):
+    """
+    Return (seconds, peak traced bytes, rows). Time and memory are measured in separate runs
+    because tracing allocations slows the reader down.
+    """
+    start = time.perf_counter()
+    rows = reader(data)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    reader(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'reader':>10} {'seconds':>9} {'peak MiB':>9} {'same rows':>10}")
+    for size in args.sizes:
+        data = make_workbook_bytes(make_replacement_data(size), SPECIAL_ROWS)
+        reference = None
+        for name, reader in (("full", rows_full), ("readonly", rows_readonly), ("streaming", rows_streaming)):
+            seconds, peak, rows = measure(reader, data)
+            if reference is None:
+                reference = rows
+            print(f"{size:>8} {name:>10} {seconds:>9.3f} {peak / 2**20:>9.1f} {str(rows == reference):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+
+# Make the modules next to main.py importable when a benchmark is run as a script
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_PATH not in sys.path:
+    sys.path.insert(0, REPO_PATH)
+
+FakeEvent = namedtuple("FakeEvent", "event_type name sequence time", defaults=(None,))
+
+
+class FakeKeyboard:
+    """
+    Stand-in for the `keyboard` module.
+
+    hook(callback, suppress) -> handle and unhook(handle) manage handlers, and emit() delivers one
+    event object to every registered handler, as `keyboard` does; a suppressing handler returning
+    a false value keeps the event from the application. press_and_release() and write() record the
+    synthetic output and can sleep `key_delay` seconds per key to model a slow target app.
+    `screen` is what the application receives, in order: the key downs let through and the synthetic output.
+    With `echo`, the synthetic keys also come back to the handlers as events, on a thread of their
+    own as the operating system does, interleaved with the events emitted meanwhile; wait_echo()
+    returns once they are delivered.
+    """
+
+    def __init__(self, key_delay=0.0, echo=False):
+        self.key_delay = key_delay
+        self.handlers = []
+        self.suppressing = set()  # Handlers registered with suppress=True
+        self.lock = threading.Lock()
+        self.emit_lock = threading.Lock()  # The handlers get one event at a time, as from one hook thread
+        self.keystrokes = 0  # Synthetic key presses sent (one per character written)
+        self.output = []
+        self.screen = []
+        self.echo_queue = None
+        if echo:
+            self.echo_queue = queue.Queue()
+            threading.Thread(target=self._echo, name="fake-os", daemon=True).start()
+
+    def hook(self, callback, suppress=False):
+        with self.lock:
+            self.handlers.append(callback)
+            if suppress:
+                self.suppressing.add(callback)
+        return callback
+
+    def unhook(self, handle):
+        with self.lock:
+            self.handlers.remove(handle)
+            self.suppressing.discard(handle)
+
+    def emit(self, event):
+        """
+        Deliver `event` to the handlers; returns False if a suppressing handler kept it from the application.
+        """
+        passed = self._deliver(event)
+        if passed and event.event_type == "down":
+            with self.lock:
+                self.screen.append(event.name if len(event.name) == 1 else f"<{event.name}>")
+        return passed
+
+    def _deliver(self, event):
+        with self.lock:
+            handlers = list(self.handlers)
+        passed = True
+        with self.emit_lock:
+            for handler in handlers:
+                if not handler(event) and handler in self.suppressing:
+                    passed = False
+        return passed
+
+    def press_and_release(self, key):
+        self._echo_keys(key.split("+") if len(key) > 1 else [key])
+        self._send(1)
+        self.output.append(f"<{key}>")
+        with self.lock:
+            self.screen.append(f"<{key}>")
+
+    def write(self, text):
+        for char in text:
+            self._echo_keys([{" ": "space", "\n": "enter", "\t": "tab"}.get(char, char)])
+        self._send(len(text))
+        self.output.append(text)
+        with self.lock:
+            self.screen.extend(text)
+
+    def wait_echo(self):
+        if self.echo_queue is not None:
+            self.echo_queue.join()
+
+    def _echo_keys(self, names):
+        """
+        Queue the events of one synthetic keystroke: the key downs of `names`, then their key ups.
+        """
+        if self.echo_queue is not None:
+            for name in names:
+                self.echo_queue.put(FakeEvent("down", name, None, time.time()))
+            for name in reversed(names):
+                self.echo_queue.put(FakeEvent("up", name, None, time.time()))
+
+    def _echo(self):
+        while True:
+            event = self.echo_queue.get()
+            self._deliver(event)  # Synthetic keys are on the screen already
+            self.echo_queue.task_done()
+
+    def _send(self, keys):
+        self.keystrokes += keys
+        if self.key_delay and keys:
+            time.sleep(self.key_delay * keys)
+
+
+class FakeClipboard:
+    """
+    Stand-in for pyperclip: paste() -> text and copy(text).
+    """
+
+    def __init__(self, text=""):
+        self.text = text
+        self.copies = 0
+
+    def paste(self):
+        return self.text
+
+    def copy(self, text):
+        self.copies += 1
+        self.text = text
+
+
+class FakeMouseListener:
+    """
+    Stand-in for pynput's mouse.Listener. Events are only delivered while it runs, and a callback
+    returning False stops it, as in pynput. `started` counts how often a listener was created, and
+    `started_on` holds the names of the threads that started them.
+    """
+    running = []  # Listeners currently running, so the event generator can reach them
+    started = 0
+    started_on = set()
+
+    def __init__(self, on_move=None, on_click=None):
+        self.on_move = on_move
+        self.on_click = on_click
+
+    def start(self):
+        FakeMouseListener.started += 1
+        FakeMouseListener.started_on.add(threading.current_thread().name)
+        FakeMouseListener.running.append(self)
+
+    def stop(self):
+        if self in FakeMouseListener.running:
+            FakeMouseListener.running.remove(self)
+
+    @classmethod
+    def move(cls, x, y):
+        for listener in list(cls.running):
+            if listener.on_move(x, y) is False:
+                listener.stop()
+
+    @classmethod
+    def click(cls, x, y, pressed=True):
+        for listener in list(cls.running):
+            if listener.on_click(x, y, "left", pressed) is False:
+                listener.stop()
+
+
+class FakeTkWidget:
+    """
+    Stand-in for a Tk label and its event loop: after(ms, func) / after_cancel(id) schedule callbacks,
+    config(text=...) records the redraws, and run_for() runs the due callbacks on the calling thread.
+    """
+
+    def __init__(self):
+        self.timers = {}
+        self.next_id = 0
+        self.texts = []
+        self.lock = threading.Lock()
+
+    def after(self, ms, func, *args):
+        with self.lock:
+            self.next_id += 1
+            self.timers[self.next_id] = (time.perf_counter() + ms / 1000, func, args)
+            return self.next_id
+
+    def after_cancel(self, timer_id):
+        with self.lock:
+            self.timers.pop(timer_id, None)
+
+    def config(self, text):
+        self.texts.append(text)
+
+    def run_for(self, seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            now = time.perf_counter()
+            with self.lock:
+                due = [(timer_id, timer) for timer_id, timer in self.timers.items() if timer[0] <= now]
+                for timer_id, _ in due:
+                    del self.timers[timer_id]
+            for _, (_, func, args) in due:
+                func(*args)
+            time.sleep(0.001)
+
+
+class FakeForegroundDetector:
+    """
+    Stand-in for the foreground window detectors: foreground() returns `app`, which the test sets,
+    and counts how often it was asked.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.calls = 0
+
+    def foreground(self):
+        self.calls += 1
+        return self.app
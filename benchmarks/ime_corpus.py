@@ -0,0 +1,265 @@
+"""
+Record synthetic Telex and VNI keyboard event streams for bench_key_decoder.py.
+
+A small IME model turns Vietnamese text into the events a keyboard hook sees: the keys typed by
+hand, and for every key the IME recomposes, its backspaces and the recomposed characters, sent
+within a fraction of a millisecond. It models both hook orders (the IME before our hook, so the
+key it swallows is never seen, or after it), precomposed and combining-mark ("Unicode tổ hợp")
+output, and a backend reporting unshifted key names. Words are also capitalised with Shift or
+Caps Lock, retyped after ctrl+backspace, or typed after moving the caret with the arrow keys.
+
+Each stream is a text file with one event per line, "<ms>\\t<down|up>\\t<key name>", and
+"#expect\\t<word>" lines before each trigger key, with the abbreviation that should fire or "-".
+
+Usage: python benchmarks/ime_corpus.py [--words 200] [--output-dir benchmarks/corpus]
+"""
+import argparse
+import os
+import random
+import unicodedata
+
+from synthetic import REPO_PATH
+
+ABBREVIATIONS = {
+    "bn": "bệnh nhân",
+    "bs": "bác sĩ",
+    "bsĩ": "bác sĩ điều trị",
+    "đt": "điện thoại",
+    "đtrị": "điều trị",
+    "ưt": "ưu tiên",
+    "ktr": "kiểm tra",
+    "HN": "Hà Nội",
+    "v.v": "vân vân",
+    "đ/c": "đồng chí",
+    "tiếng": "tiếng Việt",
+    "ngđ": "người đó",
+}
+
+WORDS = ["tôi", "không", "người", "được", "những", "việc", "của", "này", "cũng", "trường", "thuốc",
+         "ngày", "quả", "khỏe", "hoàn", "đến", "bệnh", "viện", "khám", "sáng", "mai", "chiều", "uống"]
+
+TELEX = {"marks": {"â": "a", "ê": "e", "ô": "o", "ă": "w", "ơ": "w", "ư": "w", "đ": "d"},
+         "tones": {"\u0301": "s", "\u0300": "f", "\u0309": "r", "\u0303": "x", "\u0323": "j"}}
+VNI = {"marks": {"â": "6", "ê": "6", "ô": "6", "ă": "8", "ơ": "7", "ư": "7", "đ": "9"},
+       "tones": {"\u0301": "1", "\u0300": "2", "\u0309": "3", "\u0303": "4", "\u0323": "5"}}
+
+VOWELS = "aăâeêioôơuưy"
+TONE_MARKS = "\u0301\u0300\u0309\u0303\u0323"
+MARKED = {"a": "âă", "e": "ê", "o": "ôơ", "u": "ư", "d": "đ"}  # Base letter: the letters its mark keys make
+KEY_INTERVAL = 0.09  # Seconds between keys typed by hand
+IME_INTERVAL = 0.0002  # Seconds between the keys an IME sends
+
+
+def split_tone(char):
+    """
+    Return (letter without tone, tone mark or "").
+    """
+    decomposed = unicodedata.normalize("NFD", char)
+    tone = "".join(mark for mark in decomposed if mark in TONE_MARKS)
+    return unicodedata.normalize("NFC", "".join(mark for mark in decomposed if mark not in TONE_MARKS)), tone
+
+
+def base_letter(char):
+    return unicodedata.normalize("NFD", char)[0] if char not in "đĐ" else "d" if char == "đ" else "D"
+
+
+def raw_keys(word, method):
+    """
+    Return the keys typed for `word` with the input method: each letter with its mark key, the tone key last.
+    """
+    keys = []
+    tone_key = None
+    for char in word:
+        letter, tone = split_tone(char)
+        if tone:
+            tone_key = method["tones"][tone]
+        keys.append(base_letter(letter))
+        mark = method["marks"].get(letter.lower())
+        if mark is not None:
+            keys.append(mark.upper() if letter.isupper() and mark.isalpha() else mark)
+    if tone_key is not None:
+        keys.append(tone_key)
+    return keys
+
+
+def place_tone(letters, tone):
+    """
+    Return the letters with `tone` on the vowel that carries it.
+    """
+    if not tone:
+        return "".join(letters)
+    lowered = "".join(letters).lower()
+    start = 2 if lowered.startswith(("qu", "gi")) and len(lowered) > 2 and lowered[2] in VOWELS else 0
+    vowels = [index for index in range(start, len(letters)) if lowered[index] in VOWELS]
+    if not vowels:
+        return "".join(letters)
+    cluster = [index for index in vowels if index - vowels[0] == vowels.index(index)]
+    marked = [index for index in cluster if lowered[index] in "ăâêôơư"]
+    if marked:
+        target = marked[-1]
+    elif cluster[-1] < len(letters) - 1 or len(cluster) == 1:
+        target = cluster[-1]
+    else:
+        target = cluster[-2]
+    letters = list(letters)
+    letters[target] = unicodedata.normalize("NFC", letters[target] + tone)
+    return "".join(letters)
+
+
+def compose(keys, method):
+    """
+    What the IME shows for the keys typed so far in one word.
+    """
+    tone_keys = {key: tone for tone, key in method["tones"].items()}
+    letters = []
+    tone = ""
+    for key in keys:
+        lowered = key.lower()
+        previous = letters[-1] if letters else ""
+        made = [marked for marked in MARKED.get(previous.lower(), "") if method["marks"][marked] == lowered]
+        if made:
+            letters[-1] = made[0].upper() if previous.isupper() else made[0]
+        elif lowered in tone_keys and any(letter.lower() in VOWELS for letter in letters):
+            tone = tone_keys[lowered]
+        else:
+            letters.append(key)
+    return place_tone(letters, tone)
+
+
+class Recorder:
+    """
+    Builds one event stream: the keys a hook sees while the IME model types text.
+    """
+
+    def __init__(self, method, ime_first, composite, rng):
+        self.method = method
+        self.ime_first = ime_first  # The IME hook runs first: the keys it swallows are never seen
+        self.composite = composite  # The IME types combining marks instead of precomposed characters
+        self.rng = rng
+        self.time = 0.0
+        self.lines = []
+
+    def event(self, event_type, name, interval):
+        self.time += interval
+        self.lines.append(f"{self.time * 1000:.3f}\t{event_type}\t{name}")
+
+    def press(self, name, interval=None):
+        self.event("down", name, KEY_INTERVAL * self.rng.uniform(0.6, 1.4) if interval is None else interval)
+        self.event("up", name, IME_INTERVAL if interval is not None else 0.03)
+
+    def send(self, text):
+        """
+        The IME types `text`: one key per code point, or per combining mark in composite output.
+        """
+        for char in text:
+            for code_point in (unicodedata.normalize("NFD", char) if self.composite else char):
+                self.press(code_point, IME_INTERVAL)
+
+    def type_word(self, word, caps_lock=False):
+        """
+        Type `word` by hand through the IME, then check the screen shows it.
+        """
+        keys = raw_keys(word.lower() if caps_lock else word, self.method)
+        typed = []
+        shown = ""
+        for key in keys:
+            shifted = key.isupper()
+            if shifted:
+                self.event("down", "shift", KEY_INTERVAL / 3)
+            typed.append(key.upper() if caps_lock else key)
+            composed = compose(typed, self.method)
+            name = key.lower()  # The backend reports the key, not the character shown
+            if composed == shown + typed[-1]:
+                self.press(name)
+            else:
+                # The IME swallows the key and answers its key down; a hook after it never sees the key
+                self.time += KEY_INTERVAL
+                if not self.ime_first:
+                    self.event("down", name, 0)
+                common = 0
+                while common < min(len(shown), len(composed)) and shown[common] == composed[common]:
+                    common += 1
+                for _ in range(len(shown) - common):
+                    self.press("backspace", IME_INTERVAL)
+                self.send(composed[common:])
+                if not self.ime_first:
+                    self.event("up", name, 0.03)
+            if shifted:
+                self.event("up", "shift", 0.01)
+            shown = composed
+        assert shown == word, (word, shown)
+
+    def trigger(self, expected):
+        self.lines.append(f"#expect\t{expected or '-'}")
+        self.press("space")
+
+
+def record(method, words, seed, ime_first, composite):
+    """
+    Return the lines of one stream typing `words` words, about a third of them abbreviations.
+    """
+    rng = random.Random(seed)
+    recorder = Recorder(method, ime_first, composite, rng)
+    abbreviations = list(ABBREVIATIONS)
+    for _ in range(words):
+        if rng.random() < 0.35:
+            word = rng.choice(abbreviations)
+            expected = word
+        else:
+            word = rng.choice(WORDS)
+            expected = None
+        scenario = rng.random()
+        if scenario < 0.1 and word.islower() and any(char.isalpha() for char in word):
+            # Caps Lock on: the abbreviation typed in capitals is not in the dictionary
+            recorder.press("caps lock")
+            recorder.type_word(word.upper(), caps_lock=True)
+            recorder.press("caps lock")
+            expected = None
+        elif scenario < 0.2 and word[0].isalpha():
+            recorder.type_word(word[0].upper() + word[1:])  # Capitalised with Shift
+            expected = None if expected != word[0].upper() + word[1:] else expected
+        elif scenario < 0.3:
+            # A wrong word deleted with ctrl+backspace, then the right one
+            recorder.type_word(rng.choice(WORDS))
+            recorder.event("down", "ctrl", KEY_INTERVAL)
+            recorder.press("backspace")
+            recorder.event("up", "ctrl", 0.02)
+            recorder.type_word(word)
+        elif scenario < 0.4:
+            # A few letters, then the caret moves to another line where the word is typed
+            recorder.type_word(rng.choice(WORDS)[:2])
+            recorder.press(rng.choice(["down", "up", "end"]))
+            recorder.type_word(word)
+        elif scenario < 0.5:
+            # A stray key deleted by hand before the trigger
+            recorder.type_word(word)
+            recorder.press(rng.choice("qzk"))
+            recorder.press("backspace")
+        else:
+            recorder.type_word(word)
+        recorder.trigger(expected)
+    return recorder.lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--output-dir", default=os.path.join(REPO_PATH, "benchmarks", "corpus"))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for seed, (name, method, ime_first, composite) in enumerate([
+        ("telex_ime_first", TELEX, True, False),
+        ("telex_hook_first", TELEX, False, False),
+        ("vni_ime_first", VNI, True, False),
+        ("vni_composite_hook_first", VNI, False, True),
+    ]):
+        lines = record(method, args.words, seed, ime_first, composite)
+        path = os.path.join(args.output_dir, f"{name}.events")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"{path}: {len(lines)} lines")
+
+
+if __name__ == "__main__":
+    main()
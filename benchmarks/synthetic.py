@@ -0,0 +1,86 @@
+import os
+import random
+import string
+import sys
+
+# Make the modules next to main.py importable when a benchmark is run as a script
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_PATH not in sys.path:
+    sys.path.insert(0, REPO_PATH)
+
+ALPHABET = string.ascii_lowercase + string.digits
+
+
+def make_replacement_data(size, seed=0):
+    """
+    Build a replacement dictionary with `size` random abbreviations of 2 to 8 characters.
+    """
+    rng = random.Random(seed)
+    replacement_data = {}
+    while len(replacement_data) < size:
+        word = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 8)))
+        replacement_data[word] = f"Replacement for {word}\nsecond line"
+    return replacement_data
+
+
+def make_key_stream(replacement_data, words=2000, hit_ratio=0.3, seed=1):
+    """
+    Build a list of keyboard key names that types `words` words separated by spaces.
+    About `hit_ratio` of the words are abbreviations, the rest is ordinary text with some typos.
+    """
+    rng = random.Random(seed)
+    abbreviations = list(replacement_data)
+    keys = []
+    for _ in range(words):
+        if rng.random() < hit_ratio:
+            word = rng.choice(abbreviations)
+        else:
+            word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 10)))
+        for char in word:
+            keys.append(char)
+            if rng.random() < 0.02:  # Typo corrected with backspace
+                keys.append(rng.choice(string.ascii_lowercase))
+                keys.append('backspace')
+        keys.append('space')
+    return keys
+
+
+def load_key_stream(file_path):
+    """
+    Load a recorded keystroke stream, one keyboard key name per line.
+    """
+    with open(file_path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.rstrip('\n')]
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    """
+    Return the given percentiles of a list of numbers as a dict, plus the maximum.
+    """
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(len(ordered) * point / 100))
+        result[f"p{point:g}"] = ordered[index]
+    result["max"] = ordered[-1]
+    return result
+
+
+def make_workbook_bytes(replacement_data, special_rows=()):
+    """
+    Build an XLSX file in memory laid out like the shared sheet: a header row,
+    the special rows, then one row per replacement with escaped newlines.
+    """
+    import io
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Word", "Replacement"])
+    for row in special_rows:
+        sheet.append(list(row))
+    for word, replacement in replacement_data.items():
+        sheet.append([word, replacement.replace('\n', '\\n')])
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
@@ -0,0 +1,259 @@
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import tempfile
+import threading
+
+DEFAULT_CONTROL_PORT = 47821  # Used on platforms without Unix sockets, on 127.0.0.1 only
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".text-replacer-token")  # In the user's own profile
+
+
+def default_control_address():
+    """
+    The socket path of this user's engine, or ("127.0.0.1", DEFAULT_CONTROL_PORT) where there are no Unix sockets.
+    """
+    if hasattr(socket, "AF_UNIX") and os.name != "nt":
+        return os.path.join(tempfile.gettempdir(), f"text-replacer-{os.getuid()}.sock")
+    return ("127.0.0.1", DEFAULT_CONTROL_PORT)
+
+
+def parse_control_address(value):
+    """
+    Parse the control_socket setting: a socket path, or "host:port" for TCP. Empty means the default.
+    """
+    if not value:
+        return default_control_address()
+    host, separator, port = value.rpartition(":")
+    if separator and port.isdigit() and os.sep not in value:
+        return (host or "127.0.0.1", int(port))
+    return value
+
+
+def read_token(path=DEFAULT_TOKEN_PATH):
+    """
+    Return the control token stored in `path`. Raises OSError if there is none, or if the file
+    belongs to another user or other users may read it.
+    """
+    with open(path, encoding="ascii") as f:
+        if os.name != "nt":  # On Windows the profile directory is private to its user
+            info = os.fstat(f.fileno())
+            if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                raise PermissionError(f"{path} must belong to this user and be readable by nobody else")
+        token = f.read().strip()
+    if not token:
+        raise OSError(f"{path} holds no token")
+    return token
+
+
+def create_token(path=DEFAULT_TOKEN_PATH):
+    """
+    Return the control token stored in `path`, writing a new random one readable by the owner only if there is none.
+    """
+    try:
+        return read_token(path)
+    except FileNotFoundError:
+        pass
+    token = secrets.token_hex(32)
+    temp_file = path + ".tmp"
+    fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        if hasattr(os, "fchmod"):
+            os.fchmod(f.fileno(), 0o600)  # An older temporary file keeps its permissions
+        f.write(token)
+    os.replace(temp_file, path)
+    return token
+
+
+def _accepts_connections(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class ControlError(Exception):
+    """
+    The engine answered a control request with an error.
+    """
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    One client connection: a JSON request per line, answered by a JSON response per line, until the client closes it.
+    Each request carries the server's token in its "token" field. The connection is closed after the
+    first line that is not such a request, so nothing else that can reach the socket, such as a web
+    page posting to the TCP port, gets a command through.
+    """
+
+    def setup(self):
+        super().setup()
+        if self.server.address_family != getattr(socket, "AF_UNIX", None):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self.respond({"ok": False, "error": f"Invalid JSON: {e}"})
+                return
+            token = request.pop("token", None) if isinstance(request, dict) else None
+            if not isinstance(token, str) or not hmac.compare_digest(token, self.server.token):
+                self.respond({"ok": False, "error": "Missing or wrong token"})
+                return
+            self.respond(self.server.handler(request))
+
+    def respond(self, response):
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class ControlServer:
+    """
+    Serves `handler(request) -> response` (engine.handle_command) on a local socket, with newline
+    delimited JSON. Each connection gets its own thread and stays open, so a client pays the
+    connection cost once and every request after that is a round trip on the loopback.
+
+    `address` is a socket path, created with owner-only permissions, or a (host, port) tuple.
+    Requests must carry the token stored in `token_path`, created on start() if there is none;
+    only the user who can read that file can use the API, also over TCP.
+    """
+
+    def __init__(self, handler, address=None, token_path=DEFAULT_TOKEN_PATH):
+        self.handler = handler
+        self.address = address or default_control_address()
+        self.token_path = token_path
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        token = create_token(self.token_path)
+        if isinstance(self.address, tuple):
+            server = _TCPServer(self.address, _RequestHandler)
+        else:
+            if os.path.exists(self.address):
+                if _accepts_connections(self.address):
+                    raise OSError(f"Another engine is listening on {self.address}")
+                os.remove(self.address)  # Left behind by an engine that did not stop cleanly
+            umask = os.umask(0o177)
+            try:
+                server = _UnixServer(self.address, _RequestHandler)
+            finally:
+                os.umask(umask)
+        server.handler = self.handler
+        server.token = token
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name="control-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Control API listening on {self.address}")
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(1)
+        self._server = None
+        self._thread = None
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class ControlClient:
+    """
+    Client of a ControlServer. The connection is opened on the first call and kept; after a
+    connection error the next call reconnects. Not thread-safe: use one client per thread.
+    The token is read from `token_path` when connecting.
+    """
+
+    def __init__(self, address=None, timeout=5, token_path=DEFAULT_TOKEN_PATH):
+        self.address = address or default_control_address()
+        self.timeout = timeout
+        self.token_path = token_path
+        self._token = None
+        self._socket = None
+        self._file = None
+
+    def connect(self):
+        if self._socket is not None:
+            return
+        self._token = read_token(self.token_path)
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address, self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+        self._socket = sock
+        self._file = sock.makefile("rwb")
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+            self._file = None
+
+    def call(self, command, **arguments):
+        """
+        Send one request and return its result. Raises ControlError if the engine reports an error,
+        OSError if it cannot be reached.
+        """
+        self.connect()
+        try:
+            self._file.write(json.dumps({"command": command, **arguments, "token": self._token}).encode("utf-8") + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("The engine closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ControlError(response.get("error"))
+        return response.get("result")
+
+
+class LocalClient:
+    """
+    Same interface as ControlClient for an engine running in this process: calls `handler` directly.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def call(self, command, **arguments):
+        response = self.handler({"command": command, **arguments})
+        if not response.get("ok"):
+            raise ControlError(response.get("error"))
+        return response.get("result")
+
+    def close(self):
+        pass
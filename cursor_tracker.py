@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+
+DEFAULT_MOVE_THRESHOLD = 10  # Pixels the pointer may move before the caret is assumed to have moved
+DEFAULT_SAMPLE_INTERVAL = 0.02  # Seconds; motion events closer together than this are skipped
+DEFAULT_IDLE_TIMEOUT = 1.0  # Seconds after which an unarmed mouse listener stops itself
+
+# Keys that usually move the focus to another window or field
+FOCUS_CHANGE_KEYS = frozenset({"alt", "alt gr", "windows", "left windows", "right windows", "cmd", "esc"})
+
+
+class CursorInvalidator:
+    """
+    Tells the key handler when the caret may have left the word being typed.
+
+    The mouse is only watched while the handler holds typed characters (arm() / disarm()).
+    arm() runs in the keyboard hook, so it only wakes a thread of our own, started by start(), which
+    starts the listener; without it nothing is watched. Motion events are sampled at most every
+    `sample_interval` seconds and compared with the position at the start of the word; a move beyond
+    `threshold` pixels or any click marks the typed word as invalid. The listener stops itself once
+    it has been unarmed for `idle_timeout` seconds, and pause() stops it right away. `on_invalidate`
+    is called on the listener thread when the word is invalidated, for what cannot wait until the next key.
+
+    `listener_factory` is pynput's mouse.Listener or anything taking on_move/on_click callbacks
+    with start() and stop(); a callback returning False stops the listener, as in pynput.
+    """
+
+    def __init__(self, listener_factory, threshold=DEFAULT_MOVE_THRESHOLD, sample_interval=DEFAULT_SAMPLE_INTERVAL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, on_invalidate=None):
+        self.listener_factory = listener_factory
+        self.on_invalidate = on_invalidate
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.idle_timeout = idle_timeout
+        self.armed = False
+        self.paused = False
+        self.invalidated = False
+        self._listener = None
+        self._anchor = None
+        self._last_sample = 0.0
+        self._disarmed_at = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()  # Set by arm() for the thread that starts the listener
+        self._thread = None
+
+    def start(self):
+        """
+        Start the thread that starts the mouse listener when armed.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mouse-watch", daemon=True)
+            self._thread.start()
+
+    def arm(self):
+        """
+        Start watching the mouse; called by the key handler while it holds typed characters.
+        """
+        if self.armed or self.paused:
+            return
+        self._anchor = None
+        self.armed = True
+        self._wake.set()  # Once per word; the listener may be stopping itself just now
+
+    def disarm(self):
+        if self.armed:
+            self.armed = False
+            self._disarmed_at = time.monotonic()
+
+    def consume_invalidation(self):
+        """
+        Return True once after the caret may have moved, so the handler can forget the typed word.
+        """
+        if self.invalidated:
+            self.invalidated = False
+            return True
+        return False
+
+    def invalidate(self):
+        self.invalidated = True
+        self.disarm()
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    def pause(self):
+        """
+        Stop watching the mouse until resume().
+        """
+        self.paused = True
+        self.disarm()
+        self._stop_listener()
+
+    def resume(self):
+        self.paused = False
+
+    def stop(self):
+        """
+        Stop the listener and the thread started by start().
+        """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake.set()
+            thread.join(1)
+        self._stop_listener()
+
+    def _stop_listener(self):
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+
+    def _run(self):
+        current = threading.current_thread()
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._thread is not current:
+                return
+            with self._lock:
+                if not self.armed or self.paused or self._listener is not None:
+                    continue
+                try:
+                    self._listener = self.listener_factory(on_move=self._on_move, on_click=self._on_click)
+                    self._listener.start()
+                except Exception as e:
+                    self._listener = None
+                    logging.error(f"Could not start the mouse listener, the mouse is not watched: {e}")
+                    return
+
+    def _idle(self):
+        """
+        Called from the listener while unarmed. Returns False to stop the listener after the idle timeout.
+        """
+        if time.monotonic() - self._disarmed_at <= self.idle_timeout:
+            return None
+        with self._lock:
+            if not self.armed and time.monotonic() - self._disarmed_at > self.idle_timeout:
+                self._listener = None
+                return False
+        return None
+
+    def _on_move(self, x, y):
+        if not self.armed:
+            return self._idle()
+        now = time.monotonic()
+        if now - self._last_sample < self.sample_interval:  # Coalesce bursts of motion events
+            return None
+        self._last_sample = now
+        anchor = self._anchor
+        if anchor is None:
+            self._anchor = (x, y)
+        elif abs(x - anchor[0]) > self.threshold or abs(y - anchor[1]) > self.threshold:
+            self.invalidate()
+        return None
+
+    def _on_click(self, x, y, button, pressed):
+        if not self.armed:
+            return self._idle()
+        if pressed:
+            self.invalidate()
+        return None
@@ -0,0 +1,47 @@
+import argparse
+import logging
+import signal
+import threading
+
+import engine
+from control import ControlServer, parse_control_address
+
+
+def main():
+    """
+    Run the engine without the window, controlled through the local socket (see control.py):
+    python daemon.py [--socket PATH | --socket HOST:PORT]. Stops on SIGINT/SIGTERM or the "shutdown" command.
+    Clients send the token the server keeps in control.DEFAULT_TOKEN_PATH with every request.
+    """
+    parser = argparse.ArgumentParser(description="Text replacer without the window, controlled through a local socket.")
+    parser.add_argument("--socket", default=engine.CONTROL_SOCKET,
+                        help="socket path, or host:port for TCP (default: the control_socket setting)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(engine.LOG_LEVEL)
+
+    stop_event = threading.Event()
+
+    def handle_command(request):
+        if isinstance(request, dict) and request.get("command") == "shutdown":
+            stop_event.set()
+            return {"ok": True, "result": None}
+        return engine.handle_command(request)
+
+    server = ControlServer(handle_command, parse_control_address(args.socket))
+    server.start()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: stop_event.set())
+    try:
+        engine.start()
+        while not stop_event.wait(1):  # A timeout keeps the main thread responsive to signals on Windows
+            pass
+    finally:
+        logging.info("Stopping the engine.")
+        server.stop()
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+# Compiled on-disk cache of the parsed replacement dictionary.
+#
+# Layout: a fixed header followed by a marshal payload.
+#   magic (4 bytes) | format version (uint16) | marshal version (uint16) | SHA-256 of the source workbook (32 bytes)
+# The payload is a tuple (sheet_url, replacement_data, entry_options, settings), where entry_options
+# holds the per-entry columns of the sheet, e.g. {"instant_words": [...], "injection_modes": {...}}, and
+# settings the cell text of the sheet's special rows, without the settings.ini values.
+# marshal loads a dictionary of tens of thousands of entries in a few milliseconds, straight from the mapped file.
+
+CACHE_MAGIC = b"TRDC"
+CACHE_FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sHH32s")
+
+CachedDictionary = namedtuple("CachedDictionary", "source_hash sheet_url replacement_data entry_options settings")
+
+
+def content_hash(data):
+    """
+    Return the SHA-256 hex digest used as the cache key of a source workbook.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def save_cache(file_path, source_hash, sheet_url, replacement_data, entry_options, settings):
+    """
+    Write the compiled dictionary to `file_path`. The file is replaced atomically.
+    `entry_options` and `settings` must only contain marshal-able values (str, int, list, dict...).
+    """
+    payload = marshal.dumps((sheet_url, dict(replacement_data), dict(entry_options), dict(settings)))
+    header = HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, marshal.version, bytes.fromhex(source_hash))
+    temp_file = file_path + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(temp_file, file_path)
+
+
+def load_cache(file_path):
+    """
+    Load the compiled dictionary from `file_path`.
+    Returns a CachedDictionary, or None if there is no usable cache (missing, corrupt or another version).
+    """
+    try:
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if len(mapped) < HEADER.size:
+                return None
+            magic, format_version, marshal_version, source_hash = HEADER.unpack_from(mapped)
+            if magic != CACHE_MAGIC or format_version != CACHE_FORMAT_VERSION or marshal_version != marshal.version:
+                logging.info("Replacement data cache has another format version, ignoring it.")
+                return None
+            with memoryview(mapped)[HEADER.size:] as payload:
+                sheet_url, replacement_data, entry_options, settings = marshal.loads(payload)
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        logging.warning(f"Could not load replacement data cache: {e}")
+        return None
+    return CachedDictionary(source_hash.hex(), sheet_url, replacement_data, entry_options, settings)
@@ -0,0 +1,950 @@
+import configparser
+import functools
+import importlib
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from matcher import DictionarySnapshot, EMPTY_SNAPSHOT, DEFAULT_TRIGGER_KEYS
+from xlsx_reader import iter_xlsx_rows, XlsxFormatError
+from dictionary_cache import load_cache, save_cache
+from backup_writer import BackupWriter
+from sheet_fetcher import SheetFetcher, SheetFetchError
+from keyboard_listener import KeyboardListener
+from cursor_tracker import CursorInvalidator, FOCUS_CHANGE_KEYS
+from key_decoder import KeyDecoder, RESET, KEY_DOWN, CTRL_KEYS, ALT_KEYS
+from key_holder import KeyHolder, DEFAULT_HOLD_TIMEOUT
+from injector import (ExpansionJob, InjectionWorker, TypingInjector, PasteInjector, AutoInjector, SyntheticKeys,
+                      TrackedBackend, MODE_TYPE, MODE_PASTE,
+                      DEFAULT_INJECTION_QUEUE_SIZE, DEFAULT_PASTE_THRESHOLD, DEFAULT_PASTE_HOTKEY, DEFAULT_PASTE_RESTORE_DELAY,
+                      TRIGGER_TEXT, typed_text)
+from sync_scheduler import SyncScheduler, DEFAULT_SYNC_INTERVAL, DEFAULT_SYNC_JITTER, DEFAULT_SYNC_MAX_BACKOFF
+from layers import LayeredDictionary, DictionaryLayer, BASE_LAYER, parse_layer_sheets, source_key
+from app_profiles import (ForegroundWatcher, ProfileSelector, create_foreground_detector, parse_profile_sheets,
+                          DEFAULT_PROFILE, DEFAULT_PROFILE_SAMPLE_INTERVAL)
+from metrics import MetricsRegistry, MetricsExporter, DEFAULT_METRICS_EXPORT_INTERVAL, DEFAULT_METRICS_EXPORT_PATH
+from startup_timing import StartupTimer
+from usage_store import UsageRecorder, DEFAULT_USAGE_FLUSH_INTERVAL, DEFAULT_PREWARM_ENTRIES
+from templates import TemplateContext, render_job, DEFAULT_DATE_FORMAT, DEFAULT_TIME_FORMAT
+
+# Constants
+SETTINGS_PATH = "settings.ini"
+BACKUP_XLSX_PATH = "backup_replacement_data.xlsx"
+CACHE_PATH = "replacement_data.cache"  # Compiled dictionary loaded at startup before the network refresh
+USAGE_PATH = "replacement_usage.dat"  # How often each entry expanded, for the usage report and the startup prewarm
+FETCH_STATE_PATH = "sheet_fetch_state.json"  # ETag/Last-Modified of the last download, for conditional requests
+DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQKz1tiROR-S8zLK6YkrR5OPsvsuJAEVi1uC1ecTKk5-MLC-g6_jzIvSwAUNdnN5kyuIzbvU2DkmH1g/pub?output=xlsx"
+DEFAULT_BEFORE_REPLACEMENT = ""
+DEFAULT_AFTER_REPLACEMENT = " "
+LINK_EDIT_FILE = "https://docs.google.com/spreadsheets/d/16uVFfVMKR7jVXA70g4BCo8KAE7iZVYnJT48oTpD1Z-4/edit?gid=0#gid=0"
+SPECIAL_ROWS = ("BEFORE_REPLACEMENT", "AFTER_REPLACEMENT", "TRIGGER_KEYS", "IGNORE_CASE", "LINK_EDIT_FILE")  # Settings rows of the sheet
+MODIFIER_KEYS = CTRL_KEYS | ALT_KEYS | {"alt gr"}  # Never held back or sent again by the suppressing hook mode
+QUEUED_KEYS = frozenset({"space", "enter", "tab", "backspace"})  # Named keys queued behind an expansion, with the characters
+
+# One sheet as read by read_replacement_rows(); `settings` holds the values of its special rows
+ParsedSheet = namedtuple("ParsedSheet", "replacement_data instant_words injection_modes settings")
+
+# Global variables
+is_paused = False
+active_snapshot = EMPTY_SNAPSHOT  # Dictionary used by the key handler: the active profile's, replaced as a whole
+INSTANT_WORDS = set()  # Words that are replaced as soon as they are typed, without a trigger key
+INJECTION_MODES = {}  # Per-word "type"/"paste" override from the sheet's Mode column
+dictionary_layers = LayeredDictionary()  # The base sheet and the layer_sheets overrides, merged by priority
+sheet_fetcher = SheetFetcher(FETCH_STATE_PATH)  # Keeps one pooled HTTP session for all sheet downloads
+metrics = MetricsRegistry()  # Counters and timings shown in the metrics panel and exported to a file
+backup_writer = BackupWriter(BACKUP_XLSX_PATH, metrics.histogram("backup_save"))  # Writes the local backup off the sync thread
+startup_timer = StartupTimer()  # Replaced by the window's timer, which started before the imports
+last_sync = {"count": 0, "changed": False, "error": None, "manual": False, "time": None}  # Outcome of the last sync
+keyboard = None  # The keyboard backend, the `keyboard` module unless start() is given another one
+
+# Load settings from .ini file
+config = configparser.ConfigParser()
+config.read(SETTINGS_PATH)
+
+# Get settings or use defaults
+SHEET_URL = config.get('Settings', 'sheet_url', fallback=DEFAULT_SHEET_URL)
+BEFORE_REPLACEMENT = config.get('Settings', 'before_replacement', fallback=DEFAULT_BEFORE_REPLACEMENT)
+AFTER_REPLACEMENT = config.get('Settings', 'after_replacement', fallback=DEFAULT_AFTER_REPLACEMENT)
+TRIGGER_KEYS = config.get('Settings', 'trigger_keys', fallback=DEFAULT_TRIGGER_KEYS)
+IGNORE_CASE = config.getboolean('Settings', 'ignore_case', fallback=False)  # Match words typed with another case
+SYNC_INTERVAL = config.getfloat('Settings', 'sync_interval', fallback=DEFAULT_SYNC_INTERVAL)
+SYNC_JITTER = config.getfloat('Settings', 'sync_jitter', fallback=DEFAULT_SYNC_JITTER)
+SYNC_MAX_BACKOFF = config.getfloat('Settings', 'sync_max_backoff', fallback=DEFAULT_SYNC_MAX_BACKOFF)
+INJECTION_QUEUE_SIZE = config.getint('Settings', 'injection_queue_size', fallback=DEFAULT_INJECTION_QUEUE_SIZE)
+PASTE_THRESHOLD = config.getint('Settings', 'paste_threshold', fallback=DEFAULT_PASTE_THRESHOLD)
+PASTE_HOTKEY = config.get('Settings', 'paste_hotkey', fallback=DEFAULT_PASTE_HOTKEY)
+PASTE_RESTORE_DELAY = config.getfloat('Settings', 'paste_restore_delay', fallback=DEFAULT_PASTE_RESTORE_DELAY)
+DATE_FORMAT = config.get('Settings', 'date_format', fallback=DEFAULT_DATE_FORMAT, raw=True)  # Of {date} in replacements
+TIME_FORMAT = config.get('Settings', 'time_format', fallback=DEFAULT_TIME_FORMAT, raw=True)  # Of {time} in replacements
+LAYER_SOURCES = parse_layer_sheets(config.get('Settings', 'layer_sheets', fallback=""))  # Sheets overriding the base sheet
+PROFILE_SOURCES = parse_profile_sheets(config.get('Settings', 'profile_sheets', fallback=""))  # Sheets of each application profile
+PROFILE_SAMPLE_INTERVAL = config.getfloat('Settings', 'profile_sample_interval', fallback=DEFAULT_PROFILE_SAMPLE_INTERVAL)
+
+# Every profile merges the base sheet and layer_sheets with its own sheets into a precompiled snapshot;
+# switching the profile only swaps active_snapshot
+profile_layers = {DEFAULT_PROFILE: dictionary_layers}
+profile_layers.update((pattern, LayeredDictionary()) for pattern in PROFILE_SOURCES)
+profile_snapshots = {profile: EMPTY_SNAPSHOT for profile in profile_layers}
+cold_words = {}  # Profile -> words left out of its snapshot by a prewarmed publish, until index_cold_words()
+active_profile = DEFAULT_PROFILE
+profile_lock = threading.Lock()  # Serialises the profile switches and the publishing of new snapshots
+METRICS_EXPORT_INTERVAL = config.getfloat('Settings', 'metrics_export_interval', fallback=DEFAULT_METRICS_EXPORT_INTERVAL)
+METRICS_EXPORT_PATH = config.get('Settings', 'metrics_export_path', fallback=DEFAULT_METRICS_EXPORT_PATH)
+LOG_LEVEL = config.get('Settings', 'log_level', fallback="INFO").upper()  # WARNING skips the per-expansion lines
+CONTROL_SOCKET = config.get('Settings', 'control_socket', fallback="")  # Socket path or host:port of the control API
+SUPPRESS_KEYS = config.getboolean('Settings', 'suppress_keys', fallback=False)  # Hold back the keys of a word that may expand
+HOLD_TIMEOUT = config.getfloat('Settings', 'hold_timeout', fallback=DEFAULT_HOLD_TIMEOUT)  # Seconds before held keys are sent on
+
+# The values the special rows of the base sheet override: settings.ini or the defaults
+INI_SETTINGS = {
+    "BEFORE_REPLACEMENT": BEFORE_REPLACEMENT,
+    "AFTER_REPLACEMENT": AFTER_REPLACEMENT,
+    "TRIGGER_KEYS": TRIGGER_KEYS,
+    "IGNORE_CASE": IGNORE_CASE,
+    "LINK_EDIT_FILE": LINK_EDIT_FILE,
+}
+SHEET_SETTINGS = {}  # The special rows of the base sheet as they were read, stored in the cache and the backup
+TRACK_USAGE = config.getboolean('Settings', 'track_usage', fallback=True)  # Count the expansions of each entry
+USAGE_FLUSH_INTERVAL = config.getfloat('Settings', 'usage_flush_interval', fallback=DEFAULT_USAGE_FLUSH_INTERVAL)
+PREWARM_ENTRIES = config.getint('Settings', 'prewarm_entries', fallback=DEFAULT_PREWARM_ENTRIES)  # 0 indexes all entries at once
+
+def value_to_string(value):
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        else:
+            return str(value)
+    elif value is None:
+        return ''
+    else:
+        return str(value)
+
+def parse_xlsx_for_replacements(workbook):
+    """
+    Process an openpyxl workbook to extract replacement data.
+    """
+    sheet = workbook.active
+    return parse_rows_for_replacements(sheet.iter_rows(min_row=2, values_only=True))
+
+def parse_xlsx_bytes_for_replacements(data):
+    """
+    Process the content of an XLSX file to extract replacement data and the settings of its special rows.
+    """
+    return apply_parsed_sheet(read_xlsx_bytes(data))
+
+def read_xlsx_bytes(data, sheet_name=None):
+    """
+    Read the content of an XLSX file (the active sheet, or the sheet named `sheet_name`) into a ParsedSheet.
+    The rows are streamed straight from the bytes; openpyxl is only used if the streaming reader fails.
+    """
+    try:
+        return read_replacement_rows(iter_xlsx_rows(data, min_row=2, width=4, sheet_name=sheet_name))
+    except XlsxFormatError as e:
+        logging.warning(f"Streaming XLSX reader failed ({e}), falling back to openpyxl.")
+        import openpyxl
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.active
+            return read_replacement_rows(sheet.iter_rows(min_row=2, values_only=True))
+        finally:
+            workbook.close()
+
+def parse_rows_for_replacements(rows):
+    """
+    Process the rows of the sheet (tuples of cell values, without the header row) to extract
+    replacement data, and apply its BEFORE_REPLACEMENT, AFTER_REPLACEMENT, TRIGGER_KEYS, IGNORE_CASE and LINK_EDIT_FILE rows.
+    """
+    return apply_parsed_sheet(read_replacement_rows(rows))
+
+def read_replacement_rows(rows):
+    """
+    Read the rows of a sheet (tuples of cell values, without the header row) into a ParsedSheet,
+    without changing any setting. The special rows BEFORE_REPLACEMENT, AFTER_REPLACEMENT,
+    TRIGGER_KEYS, IGNORE_CASE and LINK_EDIT_FILE go to its `settings`.
+    An optional third column set to "instant" replaces the word without waiting for a trigger key,
+    and an optional fourth column set to "type" or "paste" forces how the replacement is injected.
+    """
+    replacement_data = {}
+    instant_words = set()
+    injection_modes = {}
+    settings = {}
+
+    for row in rows:
+        if len(row) >= 2:
+            word = value_to_string(row[0]).strip()
+            replacement = value_to_string(row[1])
+
+            # Check for special cases: BEFORE_REPLACEMENT, AFTER_REPLACEMENT, TRIGGER_KEYS, IGNORE_CASE and LINK_EDIT_FILE
+            if word in SPECIAL_ROWS:
+                settings[word] = replacement
+                continue
+
+            if word and replacement is not None:
+                # Replace escaped newlines (\\n) with actual newlines (\n)
+                replacement = replacement.replace('\\n', '\n')
+                replacement_data[word] = replacement
+                if len(row) >= 3 and value_to_string(row[2]).strip().lower() == "instant":
+                    instant_words.add(word)
+                if len(row) >= 4:
+                    mode = value_to_string(row[3]).strip().lower()
+                    if mode in (MODE_TYPE, MODE_PASTE):
+                        injection_modes[word] = mode
+
+    return ParsedSheet(replacement_data, instant_words, injection_modes, settings)
+
+def apply_parsed_sheet(parsed):
+    """
+    Use a sheet read by read_replacement_rows() as the base sheet: apply the settings of its special rows
+    and keep its per-entry options. Returns its replacement data.
+    """
+    global INSTANT_WORDS, INJECTION_MODES  # Use global variables
+
+    apply_sheet_settings(parsed.settings)
+    INSTANT_WORDS = parsed.instant_words
+    INJECTION_MODES = parsed.injection_modes
+    return parsed.replacement_data
+
+def apply_sheet_settings(settings):
+    """
+    Apply the special rows of the base sheet, {row name: cell text}, over the settings.ini values.
+    A row missing from the sheet falls back to settings.ini, so a change there takes effect.
+    """
+    global BEFORE_REPLACEMENT, AFTER_REPLACEMENT, TRIGGER_KEYS, IGNORE_CASE, LINK_EDIT_FILE, SHEET_SETTINGS
+
+    SHEET_SETTINGS = dict(settings)
+    BEFORE_REPLACEMENT = settings.get("BEFORE_REPLACEMENT", INI_SETTINGS["BEFORE_REPLACEMENT"])
+    AFTER_REPLACEMENT = settings.get("AFTER_REPLACEMENT", INI_SETTINGS["AFTER_REPLACEMENT"])
+    TRIGGER_KEYS = settings.get("TRIGGER_KEYS", INI_SETTINGS["TRIGGER_KEYS"])
+    IGNORE_CASE = INI_SETTINGS["IGNORE_CASE"]
+    if "IGNORE_CASE" in settings:
+        IGNORE_CASE = settings["IGNORE_CASE"].strip().lower() in ("1", "true", "yes", "x")
+    LINK_EDIT_FILE = settings.get("LINK_EDIT_FILE", INI_SETTINGS["LINK_EDIT_FILE"])
+    applied = current_settings()
+    for name in settings:
+        logging.info(f"Set {name} to: '{applied[name]}'")
+
+def load_xlsx_from_file(file_path):
+    """
+    Load replacement data from a local XLSX file. Its settings are only applied when it has replacements.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            parsed = read_xlsx_bytes(f.read())  # Process the workbook data
+    except Exception as e:
+        logging.error(f"Error loading replacement data from local backup: {e}")
+        return {}
+    if not parsed.replacement_data:
+        return {}
+    return apply_parsed_sheet(parsed)
+
+def save_xlsx_to_file(replacement_data, file_path, settings=None, entry_options=None):
+    """
+    Save replacement data to a local XLSX file, including the special rows BEFORE_REPLACEMENT,
+    AFTER_REPLACEMENT, TRIGGER_KEYS, IGNORE_CASE and LINK_EDIT_FILE found in the sheet.
+    `settings` and `entry_options` default to SHEET_SETTINGS and current_entry_options().
+    The rows are streamed to the file by a write-only workbook instead of being kept as cells.
+    """
+    import openpyxl
+
+    settings = SHEET_SETTINGS if settings is None else settings
+    entry_options = entry_options or current_entry_options()
+    instant_words = set(entry_options["instant_words"])
+    injection_modes = entry_options["injection_modes"]
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    # Insert the header row
+    sheet.append(["Word", "Replacement", "Trigger", "Mode"])
+
+    # Insert the special rows of the sheet; the others keep following settings.ini
+    for name in SPECIAL_ROWS:
+        if name in settings:
+            value = settings[name]
+            if name == "AFTER_REPLACEMENT":
+                value = value.replace(' ', '\u00A0')
+            sheet.append([name, value])
+
+    # Insert the replacement data
+    for word, replacement in replacement_data.items():
+        row = [word, replacement, "instant" if word in instant_words else None, injection_modes.get(word)]
+        while row[-1] is None:  # Leave the optional columns empty
+            row.pop()
+        sheet.append(row)
+
+    workbook.save(file_path)
+
+def current_settings():
+    """
+    Return the settings in effect: the special rows of the sheet over settings.ini.
+    """
+    return {
+        "BEFORE_REPLACEMENT": BEFORE_REPLACEMENT,
+        "AFTER_REPLACEMENT": AFTER_REPLACEMENT,
+        "TRIGGER_KEYS": TRIGGER_KEYS,
+        "IGNORE_CASE": IGNORE_CASE,
+        "LINK_EDIT_FILE": LINK_EDIT_FILE,
+    }
+
+def current_entry_options():
+    """
+    Return the per-entry columns of the sheet, to store them in the cache.
+    """
+    return {
+        "instant_words": sorted(INSTANT_WORDS),
+        "injection_modes": dict(INJECTION_MODES),
+    }
+
+def load_cached_replacement_data(xlsx_url, hot_words=None):
+    """
+    Load the replacement data and its settings from the compiled cache, if it was built from the same URL.
+    With `hot_words`, only those entries are indexed now (see publish_layer).
+    """
+    global INSTANT_WORDS, INJECTION_MODES
+
+    with metrics.histogram("cache_load").time():
+        cached = load_cache(CACHE_PATH)
+    if cached is None or cached.sheet_url != xlsx_url or not cached.replacement_data:
+        return {}
+
+    apply_sheet_settings(cached.settings)
+    INSTANT_WORDS = set(cached.entry_options.get("instant_words", ()))
+    INJECTION_MODES = cached.entry_options.get("injection_modes", {})
+    publish_replacement_data(cached.replacement_data, cached.source_hash, hot_words)
+    logging.info(f"Loaded {len(cached.replacement_data)} replacements from the cache.")
+    load_cached_layers(hot_words)
+    return profile_snapshots[DEFAULT_PROFILE].replacement_data
+
+def layer_cache_path(source):
+    return f"replacement_data.{source.name}.cache"
+
+def layer_sources():
+    """
+    Yield (source, profile) for the layer_sheets, whose profile is None as they belong to every profile,
+    then for the sheets of each application profile.
+    """
+    for source in LAYER_SOURCES:
+        yield source, None
+    for pattern, sources in PROFILE_SOURCES.items():
+        for source in sources:
+            yield source, pattern
+
+def load_cached_layers(hot_words=None):
+    """
+    Publish the layer and profile sheets found in their caches, on top of the base sheet.
+    """
+    for source, profile in layer_sources():
+        cached = load_cache(layer_cache_path(source))
+        if cached is None or cached.sheet_url != source_key(source):
+            continue
+        publish_layer(DictionaryLayer(source.name, source.priority, cached.replacement_data,
+                                      frozenset(cached.entry_options.get("instant_words", ())),
+                                      cached.entry_options.get("injection_modes", {}), cached.source_hash, cached.sheet_url),
+                      profile, hot_words)
+        logging.info(f"Loaded {len(cached.replacement_data)} replacements of {source.name} from the cache.")
+
+def publish_replacement_data(replacement_data, source_hash=None, hot_words=None):
+    """
+    Make the replacement data the base layer of the dictionary and publish the merged result.
+    Safe to call from any thread: the running keyboard hook picks it up on the next key.
+    """
+    return publish_layer(DictionaryLayer(BASE_LAYER, 0, replacement_data, frozenset(INSTANT_WORDS),
+                                         dict(INJECTION_MODES), source_hash, SHEET_URL), hot_words=hot_words)
+
+def compile_snapshot(layered, replacement_data, base, previous=None, changed_words=None):
+    """
+    Compile the entries `replacement_data` of the layered dictionary `layered` into a snapshot,
+    derived from `previous` when only `changed_words` differ from it.
+    """
+    return DictionarySnapshot(replacement_data, TRIGGER_KEYS, layered.instant_words,
+                              base.source_hash if base is not None else None,
+                              injection_modes=layered.injection_modes, previous=previous,
+                              changed_words=changed_words, ignore_case=IGNORE_CASE)
+
+def publish_layer(layer, profile=None, hot_words=None):
+    """
+    Merge one layer into the layered dictionary of `profile` (of every profile if None), then compile
+    and publish new snapshots. Only the words whose merged entry changed are re-indexed in the
+    matcher, unless most of them did.
+    With `hot_words`, the most used words at startup, the snapshots only index the entries among
+    them; index_cold_words() adds the others once the keyboard hook is running.
+    """
+    global active_snapshot
+    base = dictionary_layers.layers.get(BASE_LAYER) if layer.name != BASE_LAYER else layer
+    with metrics.histogram("dictionary_compile", shared=True).time(), profile_lock:
+        for name in ([profile] if profile is not None else list(profile_layers)):
+            layered = profile_layers[name]
+            changed_words = layered.set_layer(layer) | cold_words.pop(name, set())
+            previous = profile_snapshots[name]
+            merged = layered.replacement_data
+            if hot_words is not None:
+                hot = {word: merged[word] for word in hot_words if word in merged}
+                if len(hot) < len(merged):
+                    cold_words[name] = merged.keys() - hot.keys()
+                    profile_snapshots[name] = compile_snapshot(layered, hot, base)
+                    continue
+            incremental = previous.replacement_data and len(changed_words) < len(merged) // 2
+            profile_snapshots[name] = compile_snapshot(layered, merged, base, previous if incremental else None,
+                                                       changed_words)
+        active_snapshot = profile_snapshots[active_profile]
+    metrics.gauge("dictionary_size").set(len(dictionary_layers.replacement_data))
+    return active_snapshot
+
+def index_cold_words():
+    """
+    Add the entries left out by a publish with hot_words to the published snapshots. Runs on the
+    dictionary-load thread, after the most used entries; a sync publishing in the meantime indexes them itself.
+    """
+    global active_snapshot
+    base = dictionary_layers.layers.get(BASE_LAYER)
+    start = time.perf_counter()
+    with metrics.histogram("cold_index", shared=True).time(), profile_lock:
+        count = 0
+        for name in list(cold_words):
+            layered = profile_layers[name]
+            words = cold_words.pop(name)
+            profile_snapshots[name] = compile_snapshot(layered, layered.replacement_data, base, profile_snapshots[name],
+                                                       words)
+            count += len(words)
+        active_snapshot = profile_snapshots[active_profile]
+    if count:
+        logging.info(f"Indexed {count} less used replacements in {(time.perf_counter() - start) * 1000:.0f} ms.")
+
+def switch_profile(app):
+    """
+    Called by the foreground watcher when another application gets the focus. Makes the snapshot
+    of its profile the one used by the key handler; a pointer swap, nothing is compiled here.
+    """
+    global active_profile, active_snapshot
+    profile = profile_selector.profile_for(app)
+    if profile == active_profile:
+        return
+    with profile_lock:
+        active_profile = profile
+        active_snapshot = profile_snapshots[profile]
+    metrics.counter("profile_switches").add()
+    logging.info(f"Profile '{profile}' active for {app.process if app else 'no window'}.")
+
+def replace_word(word, replacement, trigger="space", rule=None, held=False):
+    """
+    Queue the replacement of the typed word; the injector thread deletes it and types the replacement.
+    `trigger` is the trigger key name, None for instant words, where no trigger key has to be deleted.
+    `rule` is the sheet word that matched, when it differs from the typed word (other case, pattern rule).
+    `held` is set when the word and the trigger were held back by the suppressing hook mode: nothing is deleted.
+    Replacements with placeholders are queued as their precompiled template, rendered by the injector thread.
+    """
+    snapshot = active_snapshot
+    rule = rule or word
+    injection_worker.submit(ExpansionJob(word, snapshot.template_for(rule, replacement), trigger, BEFORE_REPLACEMENT,
+                                         AFTER_REPLACEMENT, time.perf_counter(), snapshot.injection_modes.get(rule),
+                                         held=held))
+
+def output_backend():
+    """
+    The keyboard backend for the keys we send, announcing them to `synthetic_keys` so the key handler ignores them.
+    """
+    return TrackedBackend(keyboard, synthetic_keys, text_keys=sys.platform != "win32")
+
+def create_injector():
+    """
+    Build the injector. Everything is typed until enable_paste_injection() adds the clipboard paste injector.
+    """
+    return AutoInjector(TypingInjector(output_backend()), None, PASTE_THRESHOLD)
+
+def enable_paste_injection():
+    """
+    Paste long expansions through the clipboard from now on, when pyperclip is available.
+    """
+    try:
+        import pyperclip
+    except ImportError:
+        logging.warning("pyperclip is not installed, expansions will always be typed.")
+        return
+    injection_worker.injector.paste_injector = PasteInjector(output_backend(), pyperclip, PASTE_HOTKEY, PASTE_RESTORE_DELAY)
+    injection_worker.template_context.clipboard = pyperclip  # For {clipboard} in replacements
+
+def release_held_keys():
+    """
+    Send the keys held back by the suppressing hook mode on, when a click or a mouse move
+    invalidates the typed word: they belong where the caret was.
+    """
+    if key_holder is not None:
+        key_holder.release()
+
+def create_mouse_listener(**callbacks):
+    """
+    Create a pynput mouse listener; pynput is imported on first use instead of at startup.
+    """
+    from pynput import mouse
+    return mouse.Listener(**callbacks)
+
+def preload_modules():
+    """
+    Import the modules needed later in the background once the hook is running, so the
+    first typed word does not wait for pynput inside the hook callback.
+    """
+    start = time.perf_counter()
+    enable_paste_injection()
+    try:
+        importlib.import_module("pynput.mouse")
+    except ImportError as e:
+        logging.error(f"Could not load the mouse listener: {e}")
+    logging.info(f"Background modules loaded in {(time.perf_counter() - start) * 1000:.0f} ms.")
+
+def on_key_event():
+    """
+    Callback function to handle key events and detect words ended by a trigger key.
+    The matcher of the active snapshot is looked up on every key, so reloads apply immediately.
+    The callback returns False for a key to keep from the application: a key typed while an expansion
+    is being sent, which is queued behind it, and in the suppressing hook mode a key held back.
+    """
+    # Looked up once, so recording a metric costs an attribute update in the callback
+    key_events = metrics.counter("key_events")
+    matches = metrics.counter("matches")
+    lookup_stats = metrics.histogram("lookup")
+
+    last_snapshot = None
+    decoder = KeyDecoder()  # Raw events to NFC characters, following the IME, Shift and Caps Lock
+
+    def hold_key(key, matcher, typed_before):
+        """
+        Suppressing hook mode: decide whether the key just fed to the matcher is held back.
+        Returns True to keep the key from the application for now.
+        """
+        if key == 'backspace':  # Deletes a held key, which never reached the application
+            return key_holder.pop(typed_before) or key_holder.release(key)
+        if len(key) == 1 and matcher.can_complete and key_holder.hold(key, typed_before):
+            return True
+        return key_holder.release(key)  # The word cannot expand: send the held keys on, then this one
+
+    def handle_key(event):
+        nonlocal last_snapshot
+
+        if synthetic_keys.consume(event.event_type, event.name):  # Sent by the injector thread
+            return True
+
+        # Decoded even while paused, so the Shift, Ctrl and Caps Lock state stays right
+        keys = decoder.decode(event.event_type, event.name, event.time)
+        # A modifier, or a key pressed with Ctrl, Alt or the Windows key held, is a shortcut: it reaches
+        # the application as it is, never held back or sent again, and the held keys are sent on ahead of it
+        shortcut = event.event_type == KEY_DOWN and (decoder.ctrl or decoder.alt or event.name in MODIFIER_KEYS)
+        if shortcut and key_holder is not None:
+            key_holder.release()
+        if is_paused or not keys:  # If paused, ignore all keyboard events
+            return True
+
+        start = time.perf_counter()
+        key_events.add()
+        snapshot = active_snapshot
+        matcher = snapshot.matcher  # Trie based matcher that keeps track of the typed characters
+        if snapshot is not last_snapshot:  # Another profile or a reload: start from an empty word
+            matcher.reset()
+            if key_holder is not None:
+                key_holder.release()
+            last_snapshot = snapshot
+
+        # Reset the matcher if the mouse moved significantly, was clicked or the focus may change.
+        # The held keys were sent on by the invalidation itself, see release_held_keys()
+        if cursor_invalidator.consume_invalidation() or event.name in FOCUS_CHANGE_KEYS:
+            matcher.reset()
+
+        # Keys typed while an expansion is being sent are queued behind it instead of reaching the
+        # application in the middle of it, where its backspaces could delete them
+        queue_keys = injection_worker.busy and not shortcut
+        suppress = False
+        for key in keys:  # Usually one; an IME composing a mark sends a backspace and the composed character
+            if key is RESET:  # The caret moved or a shortcut was used
+                matcher.reset()
+                if key_holder is not None and not shortcut:
+                    # A caret key is sent on after the held keys, so they are typed where the caret was
+                    suppress = key_holder.release(event.name) or suppress
+                continue
+            typed_before = matcher.typed_length
+            lookup_start = time.perf_counter()
+            match = matcher.feed(key)  # Advance one state, returns the match on a trigger key
+            lookup_stats.add(time.perf_counter() - lookup_start)
+            if match:
+                matches.add()
+                if TRACK_USAGE:
+                    usage_recorder.record(matcher.last_rule or match[0])
+                # In the suppressing mode a word held back entirely never reached the application:
+                # the trigger is suppressed as well and nothing has to be deleted
+                held = key_holder is not None and key_holder.take(typed_before)
+                if queue_keys and not held:  # The trigger reaches the application before the expansion deletes it
+                    injection_worker.release([key], output_backend())
+                replace_word(*match, matcher.last_rule, held=held)
+                suppress = held or queue_keys
+            elif key_holder is not None and not shortcut:
+                suppress = hold_key(key, matcher, typed_before)
+        if queue_keys and not suppress and (len(event.name) == 1 or event.name in QUEUED_KEYS):
+            injection_worker.release([event.name], output_backend())
+            suppress = True
+        if matcher.typed_length:
+            cursor_invalidator.arm()
+        else:
+            cursor_invalidator.disarm()
+        injection_worker.callback_stats.add(time.perf_counter() - start)
+        return not suppress
+
+    return handle_key
+
+def sync_replacement_data(xlsx_url):
+    """
+    Download the base sheet and publish a new snapshot if its content changed.
+    Returns True when new data was published. Raises on download or parse errors.
+    """
+    base = dictionary_layers.layers.get(BASE_LAYER)
+    known_hash = base.source_hash if base is not None and base.replacement_data else None
+    # Conditional download, skipped by the server or by the content hash when nothing changed
+    with metrics.histogram("sheet_download", shared=True).time():
+        result = sheet_fetcher.fetch(xlsx_url, known_hash)
+    if not result.changed and known_hash:
+        logging.info("Replacement data unchanged since the last load.")
+        if not os.path.exists(BACKUP_XLSX_PATH):
+            if result.content is not None:
+                backup_writer.save(result.content, result.content_hash)
+            else:  # Not downloaded again: write the loaded data, with the settings as they are now
+                backup_writer.save_with(functools.partial(save_xlsx_to_file, base.replacement_data,
+                                                          settings=dict(SHEET_SETTINGS),
+                                                          entry_options=current_entry_options()), known_hash)
+        return False
+
+    # Parse the downloaded XLSX straight from memory; its settings only apply once it is known to be usable
+    with metrics.histogram("sheet_parse", shared=True).time():
+        parsed = read_xlsx_bytes(result.content)
+    if not parsed.replacement_data:
+        raise ValueError("The sheet contains no replacement data")
+    replacement_data = apply_parsed_sheet(parsed)
+
+    # Save the compiled cache, and the downloaded workbook as the local backup on its own thread
+    with metrics.histogram("cache_save", shared=True).time():
+        save_cache(CACHE_PATH, result.content_hash, xlsx_url, replacement_data, current_entry_options(), SHEET_SETTINGS)
+    backup_writer.save(result.content, result.content_hash)
+    publish_replacement_data(replacement_data, result.content_hash)
+    logging.info("Replacement data loaded from the internet and saved to cache; local backup queued.")
+    return True
+
+def load_replacement_data(xlsx_url):
+    """
+    Load replacement data from an XLSX file hosted online or, when nothing is loaded yet, from a local backup.
+    Runs on the sync thread. Returns True when new data was published.
+    """
+    try:
+        # Try to download the XLSX from the internet
+        return sync_replacement_data(xlsx_url)
+
+    except SheetFetchError as e:
+        logging.error(f"Error downloading data: {e}")
+        if BASE_LAYER in dictionary_layers.layers:
+            logging.info("Keeping the replacement data already loaded.")
+            raise
+        logging.info("Attempting to load replacement data from local backup...")
+
+        # If the download fails, try loading from the local backup file
+        if not os.path.exists(BACKUP_XLSX_PATH):
+            logging.error("No local backup file found.")
+            raise
+        with metrics.histogram("backup_load").time():
+            replacement_data = load_xlsx_from_file(BACKUP_XLSX_PATH)
+        if not replacement_data:
+            raise
+        publish_replacement_data(replacement_data)
+        return True
+
+def sync_layer(source, profile=None):
+    """
+    Download one of the layer_sheets (or the sheet of an application profile) and publish it if its
+    content changed. Only this sheet is parsed, and only the entries that differ are re-indexed.
+    Returns True when new data was published. Raises on download or parse errors.
+    """
+    key = source_key(source)
+    layer = profile_layers[profile or DEFAULT_PROFILE].layers.get(source.name)
+    known_hash = layer.source_hash if layer is not None and layer.source == key else None
+    with metrics.histogram("sheet_download", shared=True).time():
+        result = sheet_fetcher.fetch(source.url, known_hash)
+    if not result.changed and known_hash:
+        return False
+
+    with metrics.histogram("sheet_parse", shared=True).time():
+        parsed = read_xlsx_bytes(result.content, source.sheet)
+    entry_options = {"instant_words": sorted(parsed.instant_words), "injection_modes": parsed.injection_modes}
+    with metrics.histogram("cache_save", shared=True).time():
+        save_cache(layer_cache_path(source), result.content_hash, key, parsed.replacement_data, entry_options, {})
+    publish_layer(DictionaryLayer(source.name, source.priority, parsed.replacement_data, frozenset(parsed.instant_words),
+                                  parsed.injection_modes, result.content_hash, key), profile)
+    logging.info(f"Layer {source.name}: {len(parsed.replacement_data)} replacements loaded from the internet.")
+    return True
+
+def sync_all_sheets(xlsx_url):
+    """
+    Sync the base sheet, then every layer. A layer that fails keeps its previous data;
+    an error of the base sheet is raised once the layers are done, so the scheduler backs off.
+    """
+    base_error = None
+    try:
+        changed = load_replacement_data(xlsx_url)
+    except Exception as e:
+        base_error = e
+        changed = False
+    for source, profile in layer_sources():
+        try:
+            changed = sync_layer(source, profile) or changed
+        except (SheetFetchError, XlsxFormatError, ValueError, KeyError) as e:
+            logging.error(f"Could not sync {source.name}: {e}")
+    if base_error is not None:
+        raise base_error
+    return changed
+
+def start_keyboard_listener():
+    """
+    Starts the keyboard hook, or replaces it with a fresh one if it is already running.
+    """
+    if keyboard_listener.running:
+        keyboard_listener.restart()
+    else:
+        keyboard_listener.start()
+
+def stop_keyboard_hook():
+    """
+    Remove the keyboard hook and wait for its thread to finish.
+    """
+    keyboard_listener.stop()
+    keyboard_listener.join(timeout=1)
+
+def on_sync_result(changed, error, elapsed, manual):
+    """
+    Called on the sync thread after each sync; records the outcome for the status command.
+    """
+    metrics.histogram("sheet_sync").add(elapsed)
+    if error is not None:
+        metrics.counter("sheet_sync_failures").add()
+    if changed and startup_timer.mark("dictionary ready"):  # First data of a start without cache
+        logging.info(startup_timer.report())
+    last_sync.update(count=last_sync["count"] + 1, changed=changed, error=str(error) if error is not None else None,
+                     manual=manual, time=time.time())
+
+def load_dictionary():
+    """
+    Load the compiled cache once the keyboard hook is running: the most used entries are indexed
+    first, then the others. Runs on its own thread; the syncs wait for it, so the cache is never
+    published over newer data.
+    """
+    try:
+        hot_words = usage_recorder.hot_words(PREWARM_ENTRIES) if TRACK_USAGE and PREWARM_ENTRIES else None
+        if load_cached_replacement_data(SHEET_URL, hot_words or None):
+            if startup_timer.mark("dictionary ready"):
+                logging.info(startup_timer.report())
+        else:
+            logging.info("No cached replacement data, waiting for the first download.")
+    finally:
+        cache_loaded.set()
+    index_cold_words()
+
+def scheduled_sync():
+    cache_loaded.wait()
+    return sync_all_sheets(SHEET_URL)
+
+cache_loaded = threading.Event()  # Set by load_dictionary() once the cache is published
+
+# Sync the sheets in the background every SYNC_INTERVAL seconds
+sync_scheduler = SyncScheduler(scheduled_sync, SYNC_INTERVAL, SYNC_JITTER,
+                               SYNC_MAX_BACKOFF, on_result=on_sync_result)
+
+# Switch the profile when another application gets the focus, if there are profiles and a detector for this platform
+profile_selector = ProfileSelector(PROFILE_SOURCES)
+foreground_watcher = None
+
+# Watches mouse moves and clicks only while a word is being typed
+cursor_invalidator = CursorInvalidator(create_mouse_listener, on_invalidate=release_held_keys)
+
+# Write a metrics snapshot every METRICS_EXPORT_INTERVAL seconds
+metrics_exporter = MetricsExporter(metrics, METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL)
+
+# Count the expansions of each entry, written every USAGE_FLUSH_INTERVAL seconds
+usage_recorder = UsageRecorder(USAGE_PATH, USAGE_FLUSH_INTERVAL, metrics)
+
+# The keys sent by the injector thread, which come back through the keyboard hook
+synthetic_keys = SyntheticKeys()
+
+# Created by start(), once the keyboard backend is known
+injection_worker = None  # Types the expansions on its own thread so the keyboard hook callback returns right away
+keyboard_listener = None  # Owns the keyboard hook; handle_key reads the active snapshot so the hook survives reloads
+key_holder = None  # Keys held back from the application, only in the suppressing hook mode
+
+def start(keyboard_backend=None, timer=None):
+    """
+    Start the engine: start the keyboard hook, then load the compiled cache, the background sync and
+    the other threads. `keyboard_backend` defaults to the `keyboard` module; `timer` is the caller's
+    StartupTimer, so its report covers the time spent before the engine was started.
+    The hook starts with no replacements and never waits for the dictionary: load_dictionary()
+    publishes the compiled cache on its own thread when it is usable, otherwise the first sync (or
+    the local backup, if the sheet cannot be downloaded) fills them in. The download and parsing
+    always run on the sync thread.
+    """
+    global keyboard, injection_worker, keyboard_listener, key_holder, startup_timer, foreground_watcher
+    if keyboard_backend is None:
+        import keyboard as keyboard_backend
+    keyboard = keyboard_backend
+    if timer is not None:
+        startup_timer = timer
+
+    injection_worker = InjectionWorker(create_injector(), INJECTION_QUEUE_SIZE, metrics, TemplateContext(DATE_FORMAT, TIME_FORMAT))
+    injection_worker.start()
+    if SUPPRESS_KEYS:
+        key_holder = KeyHolder(lambda keys: injection_worker.release(keys, output_backend()), HOLD_TIMEOUT, metrics)
+    # Always suppressing, so the keys typed during an expansion can be queued behind it; where the backend
+    # cannot keep keys from the application (the keyboard module on Linux) they still reach it right away
+    keyboard_listener = KeyboardListener(keyboard, on_key_event(), suppress=True)
+
+    cursor_invalidator.start()
+    start_keyboard_listener()
+    startup_timer.mark("hook ready")
+    threading.Thread(target=load_dictionary, name="dictionary-load", daemon=True).start()
+    if TRACK_USAGE:
+        usage_recorder.start()
+    sync_scheduler.start(first_delay=0)
+    threading.Thread(target=preload_modules, name="preload", daemon=True).start()
+
+    if PROFILE_SOURCES:
+        foreground_detector = create_foreground_detector()
+        if foreground_detector is not None:
+            foreground_watcher = ForegroundWatcher(foreground_detector, switch_profile, PROFILE_SAMPLE_INTERVAL)
+            foreground_watcher.start()
+        else:
+            logging.warning("Application profiles need Windows or an X11 session, only the default profile is used.")
+    metrics_exporter.start()
+    logging.info(startup_timer.report())
+
+def stop():
+    """
+    Stop every thread started by start(): the hook first, then the sync, the injector and the rest.
+    """
+    if keyboard_listener is not None:
+        stop_keyboard_hook()
+    if key_holder is not None:
+        key_holder.stop()  # Sends the held keys on before the injector stops
+    sync_scheduler.stop(1)
+    if injection_worker is not None:
+        injection_worker.stop(1)
+    cursor_invalidator.stop()
+    if foreground_watcher is not None:
+        foreground_watcher.stop(1)
+    sheet_fetcher.close()
+    backup_writer.stop(5)  # A backup being written is finished; the previous one stays valid if it is not
+    usage_recorder.stop(1)  # Writes the counts recorded since the last flush
+    metrics_exporter.stop(1)
+
+def pause():
+    """
+    Ignore all keys until resume(); no mouse listener runs while paused.
+    """
+    global is_paused
+    is_paused = True
+    if key_holder is not None:
+        key_holder.release()
+    cursor_invalidator.pause()
+    logging.info("Program paused.")
+    return {"paused": True}
+
+def resume():
+    global is_paused
+    is_paused = False
+    cursor_invalidator.resume()
+    logging.info("Program resumed.")
+    return {"paused": False}
+
+def reload(url=None):
+    """
+    Download the sheets now, from `url` if given (the base sheet's new address). The sync thread does the
+    work; status() reports its outcome as the last sync with `manual` set.
+    """
+    global SHEET_URL
+    if url:
+        SHEET_URL = url
+    logging.info("Reloading XLSX file from the internet...")
+    sync_scheduler.sync_now()
+    return {"sheet_url": SHEET_URL}
+
+def status():
+    """
+    What a client shows: pause state, the sheet settings, the dictionary size and the last sync.
+    """
+    return {
+        "paused": is_paused,
+        "profile": active_profile,
+        "entries": len(active_snapshot.replacement_data),
+        "sheet_url": SHEET_URL,
+        "settings": current_settings(),
+        "sync": dict(last_sync),
+    }
+
+def stats():
+    """
+    The metrics snapshot (see metrics.MetricsRegistry.snapshot) with the status.
+    """
+    return {"metrics": metrics.snapshot(), **status()}
+
+def usage_report(limit=20):
+    """
+    Usage of the base sheet and layer entries: the `limit` most used and those never used (see UsageRecorder.report).
+    """
+    return usage_recorder.report(dictionary_layers.replacement_data, limit)
+
+def test_expand(text):
+    """
+    Run `text` through the active dictionary as if it were typed, without sending any key.
+    Spaces, newlines and tabs are typed as the space, enter and tab keys. Returns the expansions
+    and the text they would leave in the target application. Uses its own matcher over the shared
+    trie, so the hook's matcher state is not touched.
+    """
+    snapshot = active_snapshot
+    matcher = snapshot.matcher.updated(snapshot.replacement_data, (), snapshot.matcher.instant_words)
+    context = injection_worker.template_context if injection_worker is not None else TemplateContext(DATE_FORMAT, TIME_FORMAT)
+    key_names = {char: name for name, char in TRIGGER_TEXT.items()}
+    expansions = []
+    output = ""
+    for char in text:
+        output += char
+        match = matcher.feed(key_names.get(char, char))
+        if not match:
+            continue
+        word, replacement, trigger = match
+        rule = matcher.last_rule or word
+        job = ExpansionJob(word, snapshot.template_for(rule, replacement), trigger, BEFORE_REPLACEMENT, AFTER_REPLACEMENT,
+                           time.perf_counter(), snapshot.injection_modes.get(rule))
+        if job.replacement.__class__ is not str:
+            job = render_job(job, context)
+        output = output[:len(output) - len(typed_text(job))] + job.before + job.replacement + job.after
+        expansions.append({"word": word, "rule": rule, "replacement": job.replacement, "trigger": trigger})
+    return {"expansions": expansions, "output": output}
+
+# The control API: command name -> function, called with the other fields of the request as arguments
+COMMANDS = {
+    "pause": pause,
+    "resume": resume,
+    "reload": reload,
+    "status": status,
+    "stats": stats,
+    "expand": test_expand,
+    "usage": usage_report,
+}
+
+def handle_command(request):
+    """
+    Run one control request, {"command": name, ...arguments}, and return the JSON-ready response:
+    {"ok": true, "result": ...} or {"ok": false, "error": message}.
+    """
+    if not isinstance(request, dict):
+        return {"ok": False, "error": "The request must be a JSON object"}
+    arguments = dict(request)
+    command = COMMANDS.get(arguments.pop("command", None))
+    if command is None:
+        return {"ok": False, "error": f"Unknown command {request.get('command')!r}, expected one of {', '.join(COMMANDS)}"}
+    try:
+        return {"ok": True, "result": command(**arguments)}
+    except Exception as e:
+        logging.error(f"Control command {request.get('command')} failed: {e}")
+        return {"ok": False, "error": str(e)}
@@ -0,0 +1,387 @@
+import collections
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from metrics import MetricsRegistry
+from templates import TemplateContext, render_job
+
+logger = logging.getLogger()  # Root logger, looked up once for the per-expansion log line
+
+DEFAULT_INJECTION_QUEUE_SIZE = 16
+DEFAULT_PASTE_THRESHOLD = 200  # Expansions at least this long are pasted, 0 always types
+DEFAULT_PASTE_HOTKEY = "ctrl+v"
+DEFAULT_PASTE_RESTORE_DELAY = 0.15  # Seconds the target app gets to read the clipboard before it is restored
+DEFAULT_SYNTHETIC_TIMEOUT = 0.5  # Seconds after which a synthetic key the hook never saw is forgotten
+
+# Values of the optional "Mode" column of the sheet
+MODE_TYPE = "type"
+MODE_PASTE = "paste"
+
+# Characters typed by the named trigger keys; single character keys type themselves
+TRIGGER_TEXT = {"space": " ", "enter": "\n", "tab": "\t"}
+WHITESPACE_KEY_NAMES = {text: name for name, text in TRIGGER_TEXT.items()}
+
+# One expansion to perform. `trigger` is the trigger key name, None for instant words.
+# `before` and `after` are the BEFORE_/AFTER_REPLACEMENT values at match time,
+# `mode` is the per-entry override (MODE_TYPE, MODE_PASTE) or None to choose by length.
+# `replacement` is a string, or a templates.Template that the worker renders before injecting it;
+# `caret` is then the number of characters the caret moves back to reach {cursor}.
+# `held` is set when the word and the trigger were held back from the application, so nothing is deleted.
+ExpansionJob = namedtuple("ExpansionJob", "word replacement trigger before after queued_at mode caret held",
+                          defaults=(0, False))
+
+# Keys held back from the application, sent on unchanged: characters, or key names such as "space"
+ReleasedKeys = namedtuple("ReleasedKeys", "keys backend queued_at")
+
+# Keys to send for an expansion: `backspaces` deletions, then `text` typed or pasted
+EditPlan = namedtuple("EditPlan", "backspaces text")
+
+
+def typed_text(job):
+    """
+    Return what the user typed for the expansion: the word followed by the trigger key's character.
+    Empty when they were held back and never reached the application.
+    """
+    if job.held:
+        return ""
+    if job.trigger is None:
+        return job.word
+    return job.word + TRIGGER_TEXT.get(job.trigger, job.trigger if len(job.trigger) == 1 else "")
+
+
+def plan_edit(job):
+    """
+    Compute the smallest edit turning the typed text into the expansion.
+
+    Only the part after the longest common prefix is deleted and retyped, e.g. typing "bn "
+    for "bnh nhân " sends one backspace and "h nhân " instead of three backspaces and the whole text.
+    """
+    typed = typed_text(job)
+    output = job.before + job.replacement + job.after
+    common = 0
+    limit = min(len(typed), len(output))
+    while common < limit and typed[common] == output[common]:
+        common += 1
+    return EditPlan(len(typed) - common, output[common:])
+
+
+def naive_keystrokes(job):
+    """
+    Number of keystrokes needed to delete everything that was typed and retype the whole expansion.
+    """
+    return len(typed_text(job)) + len(job.before) + len(job.replacement) + len(job.after) + job.caret
+
+
+def replay_keys(backend, keys):
+    """
+    Send keys held back from the application: characters are written, named keys pressed. Returns the keystrokes sent.
+    """
+    text = []
+    for key in keys:
+        if len(key) == 1:
+            text.append(key)
+            continue
+        if text:
+            backend.write("".join(text))
+            text = []
+        backend.press_and_release(key)
+    if text:
+        backend.write("".join(text))
+    return len(keys)
+
+
+class SyntheticKeys:
+    """
+    The keys sent by the injector thread, which the keyboard hook receives like the user's own keys.
+
+    TrackedBackend calls expect() with the names of the keys it is about to send, a whole text at
+    once. The key handler calls consume(event_type, name) for every event and ignores the events it
+    returns True for: a key down matching the next expected name, and the key up that follows.
+    The hook gets our keys in the order they were sent, so only the next one is compared: a key the
+    user types meanwhile is ours only if it is that very key, even when it shows up later in the text.
+    Extra events, such as the Shift of a capital, are let through. When none of the expected keys has
+    come back for `timeout` seconds they are all forgotten: a backend may send a character without a
+    key event the hook sees, such as the Unicode input Windows uses for letters missing from the
+    layout. Names are compared case-insensitively, since a written capital may show up as its key.
+    """
+
+    def __init__(self, timeout=DEFAULT_SYNTHETIC_TIMEOUT):
+        self.timeout = timeout
+        self._expected = collections.deque()  # Names of the key downs to come, in order
+        self._deadline = 0.0  # time.perf_counter() after which the expected keys are forgotten
+        self._key_ups = collections.deque()  # (deadline, name) of our key downs whose key up is still to come
+        self._lock = threading.Lock()
+
+    def expect(self, names):
+        with self._lock:
+            self._expected.extend(name.lower() for name in names)
+            self._deadline = time.perf_counter() + self.timeout
+
+    def consume(self, event_type, name):
+        """
+        Return True if the event is one of the keys we sent.
+        """
+        if not self._expected and not self._key_ups:  # No lock while nothing is being sent
+            return False
+        name = (name or "").lower()
+        now = time.perf_counter()
+        with self._lock:
+            if event_type == "up":
+                pending = self._key_ups
+                while pending and pending[0][0] < now:
+                    pending.popleft()
+                for index, (_, expected) in enumerate(pending):
+                    if expected == name:
+                        del pending[index]
+                        return True
+                return False
+            if self._deadline < now:  # Our keys stopped coming back
+                self._expected.clear()
+            if not self._expected or self._expected[0] != name:
+                return False
+            self._expected.popleft()
+            self._deadline = now + self.timeout
+            self._key_ups.append((now + self.timeout, name))
+            return True
+
+
+class TrackedBackend:
+    """
+    Wraps the keyboard backend of the injectors: every key sent is announced to `synthetic_keys` first.
+    `text_keys` is False when written text does not come back as key events, except new lines: the
+    keyboard module types it as Unicode input on Windows, which its own hook ignores.
+    """
+
+    def __init__(self, backend, synthetic_keys, text_keys=True):
+        self.backend = backend
+        self.synthetic_keys = synthetic_keys
+        self.text_keys = text_keys
+
+    def press_and_release(self, key):
+        self.synthetic_keys.expect(key.split("+") if len(key) > 1 else [key])
+        self.backend.press_and_release(key)
+
+    def write(self, text):
+        if self.text_keys:
+            self.synthetic_keys.expect([WHITESPACE_KEY_NAMES.get(char, char) for char in text])
+        else:
+            self.synthetic_keys.expect(["enter"] * text.count("\n"))
+        self.backend.write(text)
+
+
+def move_caret(backend, job):
+    """
+    Move the caret back to the {cursor} placeholder of the expansion. Returns the number of keystrokes sent.
+    """
+    for _ in range(job.caret):
+        backend.press_and_release('left')
+    return job.caret
+
+
+def type_expansion(backend, job):
+    """
+    Delete the differing end of the typed text and type the rest of the expansion.
+    `backend` is the `keyboard` module or any object with press_and_release(key) and write(text).
+    Returns the number of synthetic keystrokes sent.
+    """
+    plan = plan_edit(job)
+    for _ in range(plan.backspaces):
+        backend.press_and_release('backspace')
+
+    # Split the text by newlines and simulate typing each part
+    parts = plan.text.split('\n')
+    for index, part in enumerate(parts):
+        if part:
+            backend.write(part)
+        if index < len(parts) - 1:  # If not the last part, press Enter
+            backend.press_and_release('enter')
+    return plan.backspaces + len(plan.text) + move_caret(backend, job)
+
+
+class TypingInjector:
+    """
+    Types every character of the expansion. inject() returns the number of keystrokes sent.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def inject(self, job):
+        return type_expansion(self.backend, job)
+
+
+class PasteInjector:
+    """
+    Pastes the whole expansion with a single paste keystroke.
+
+    `clipboard` is any object with paste() -> text and copy(text), such as the pyperclip module.
+    The previous clipboard text is put back after `restore_delay` seconds; clipboard content
+    that is not text cannot be saved this way and is lost.
+    """
+
+    def __init__(self, backend, clipboard, hotkey=DEFAULT_PASTE_HOTKEY, restore_delay=DEFAULT_PASTE_RESTORE_DELAY):
+        self.backend = backend
+        self.clipboard = clipboard
+        self.hotkey = hotkey
+        self.restore_delay = restore_delay
+
+    def inject(self, job):
+        plan = plan_edit(job)
+        for _ in range(plan.backspaces):
+            self.backend.press_and_release('backspace')
+        if not plan.text:
+            return plan.backspaces + move_caret(self.backend, job)
+        try:
+            previous = self.clipboard.paste()
+        except Exception as e:
+            logging.warning(f"Could not read the clipboard, it will not be restored: {e}")
+            previous = None
+        self.clipboard.copy(plan.text)
+        self.backend.press_and_release(self.hotkey)
+        if previous is not None:
+            time.sleep(self.restore_delay)  # The target app reads the clipboard after handling the keystroke
+            self.clipboard.copy(previous)
+        return plan.backspaces + 1 + move_caret(self.backend, job)
+
+
+class AutoInjector:
+    """
+    Pastes expansions of at least `paste_threshold` characters and types the shorter ones.
+    The job's mode, from the sheet's "Mode" column, overrides the choice. Without a paste
+    injector (no clipboard support) everything is typed.
+    """
+
+    def __init__(self, typing_injector, paste_injector=None, paste_threshold=DEFAULT_PASTE_THRESHOLD):
+        self.typing_injector = typing_injector
+        self.paste_injector = paste_injector
+        self.paste_threshold = paste_threshold
+
+    def choose(self, job):
+        if self.paste_injector is None or job.mode == MODE_TYPE:
+            return self.typing_injector
+        if job.mode == MODE_PASTE:
+            return self.paste_injector
+        length = len(job.before) + len(job.replacement) + len(job.after)
+        if self.paste_threshold and length >= self.paste_threshold:
+            return self.paste_injector
+        return self.typing_injector
+
+    def inject(self, job):
+        return self.choose(job).inject(job)
+
+
+class InjectionWorker:
+    """
+    Performs expansions on a dedicated thread, so the keyboard hook callback only queues them.
+
+    At most `maxsize` expansions wait in the queue: when it is full the expansion is dropped rather
+    than blocking the hook. The keys queued by release() do not count towards it and never wait.
+    `busy` is true from submit() until the expansion has been typed. Our own keys come back through
+    the hook; the key handler tells them apart with SyntheticKeys (see TrackedBackend), and queues the
+    user's keys typed while `busy` behind the expansion with release().
+    Its counters and timings are kept in `metrics`, a MetricsRegistry. Template replacements are
+    rendered here with `template_context`, so reading the clock or the clipboard never happens in the hook.
+    """
+
+    def __init__(self, injector, maxsize=DEFAULT_INJECTION_QUEUE_SIZE, metrics=None, template_context=None):
+        self.injector = injector  # Anything with inject(job): TypingInjector, PasteInjector, AutoInjector
+        self.template_context = template_context or TemplateContext()
+        self.maxsize = maxsize
+        self.queue = queue.Queue()  # Unbounded, so the hook never waits; submit() limits the expansions
+        metrics = metrics or MetricsRegistry()
+        self.callback_stats = metrics.histogram("hook_callback")  # Time spent in the keyboard hook callback
+        self.wait_stats = metrics.histogram("injection_queue_wait")  # Time an expansion waited in the queue
+        self.injection_stats = metrics.histogram("injection")  # Time spent typing an expansion
+        self.expansions = metrics.counter("expansions")
+        self.dropped = metrics.counter("expansions_dropped")
+        self.keystrokes = metrics.counter("keystrokes_injected")  # Synthetic keystrokes sent
+        self.keystrokes_saved = metrics.counter("keystrokes_saved")  # Avoided by the minimal edit compared to retyping everything
+        self.keys_released = metrics.counter("keys_released")  # Held back or queued keys sent on
+        self._pending = 0
+        self._queued_expansions = 0
+        self._pending_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="injector", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Finish the queued expansions and stop the worker thread.
+        """
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, job):
+        """
+        Queue an expansion. Returns False if the queue is full and the expansion was dropped.
+        """
+        with self._pending_lock:
+            full = self.maxsize > 0 and self._queued_expansions >= self.maxsize
+            if not full:
+                self._queued_expansions += 1
+                self._pending += 1
+        if full:
+            self.dropped.add()
+            logging.warning("Expansion queue full, dropped '%s'.", job.word)
+            return False
+        self.queue.put_nowait(job)
+        return True
+
+    def release(self, keys, backend):
+        """
+        Queue keys held back from the application, to be sent in order with the expansions.
+        Unlike expansions they are never dropped, and the call never waits: it runs in the keyboard hook.
+        """
+        with self._pending_lock:
+            self._pending += 1
+        self.queue.put_nowait(ReleasedKeys(tuple(keys), backend, time.perf_counter()))
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            if job.__class__ is ReleasedKeys:
+                try:
+                    self.keys_released.add(replay_keys(job.backend, job.keys))
+                except Exception as e:
+                    logging.error(f"Error while releasing held keys: {e}")
+                finally:
+                    with self._pending_lock:
+                        self._pending -= 1
+                continue
+            with self._pending_lock:
+                self._queued_expansions -= 1
+            start = time.perf_counter()
+            self.wait_stats.add(start - job.queued_at)
+            keystrokes = 0
+            try:
+                if job.replacement.__class__ is not str:  # A Template; plain strings skip this entirely
+                    job = render_job(job, self.template_context)
+                keystrokes = self.injector.inject(job)
+                self.expansions.add()
+                self.keystrokes.add(keystrokes)
+                self.keystrokes_saved.add(naive_keystrokes(job) - keystrokes)
+            except Exception as e:
+                logging.error(f"Error while replacing '{job.word}': {e}")
+            finally:
+                elapsed = time.perf_counter() - start
+                self.injection_stats.add(elapsed)
+                with self._pending_lock:
+                    self._pending -= 1
+            if logger.isEnabledFor(logging.INFO):  # Logged per expansion: no formatting at all when INFO is off
+                logger.info("Replaced '%s' with %d keystrokes in %.1f ms (queued %.1f ms, hook callback avg %.0f us)",
+                            job.word, keystrokes, elapsed * 1000, (start - job.queued_at) * 1000,
+                            self.callback_stats.average * 1e6)
@@ -0,0 +1,204 @@
+import collections
+import string
+import unicodedata
+
+DEFAULT_RECENT_CHARACTERS = 32  # Characters kept to follow what the IME recomposes
+DEFAULT_IME_BURST = 0.01  # Seconds: a backspace closer than this to the typed key was sent by an IME
+
+# keyboard.KEY_DOWN / keyboard.KEY_UP
+KEY_DOWN = "down"
+KEY_UP = "up"
+
+# Returned by decode() to tell the matcher to forget the typed word
+RESET = None
+
+SHIFT_KEYS = frozenset({"shift", "left shift", "right shift"})
+CTRL_KEYS = frozenset({"ctrl", "left ctrl", "right ctrl", "control"})
+ALT_KEYS = frozenset({"alt", "left alt", "right alt", "windows", "left windows", "right windows", "cmd", "command"})
+CAPS_LOCK_KEYS = frozenset({"caps lock", "capslock"})
+
+# Keys that move the caret or the selection away from the end of the typed word
+CARET_KEYS = frozenset({"left", "right", "up", "down", "home", "end", "page up", "page down", "esc", "insert"})
+
+# Keys that type whitespace: the matcher gets their name, the recent characters the text
+WHITESPACE_KEYS = {"space": " ", "enter": "\n", "tab": "\t"}
+
+ASCII_LETTERS = frozenset(string.ascii_letters)
+MAX_OTHER_CHARACTERS = 4096  # Characters outside the tables whose decoding is cached
+
+# Vowels and consonants of Vietnamese with their diacritics, in both cases. Built once, so that
+# decoding a key is a dictionary lookup instead of a Unicode normalization.
+VIETNAMESE_LETTERS = "aăâbcdđeêghiklmnoôơpqrstuưvxy"
+VIETNAMESE_TONES = ("", "\u0301", "\u0300", "\u0309", "\u0303", "\u0323")  # None, sắc, huyền, hỏi, ngã, nặng
+
+
+def _build_tables():
+    """
+    Return (characters, compositions): every printable ASCII and Vietnamese character mapped to the
+    1-tuple decode() returns for it, and (character, combining mark) pairs mapped to their NFC composition.
+    """
+    characters = {}
+    compositions = {}
+    letters = set(chr(code) for code in range(0x21, 0x7f))
+    for letter in VIETNAMESE_LETTERS:
+        for tone in VIETNAMESE_TONES:
+            for cased in (letter, letter.upper()):
+                letters.add(unicodedata.normalize("NFC", cased + tone))
+    for char in letters:
+        characters[char] = (char,)
+        decomposed = unicodedata.normalize("NFD", char)
+        # Every way of reaching `char` by adding one combining mark to a partly composed character
+        for index in range(1, len(decomposed)):
+            base = unicodedata.normalize("NFC", decomposed[:index] + decomposed[index + 1:])
+            if len(base) == 1:
+                compositions[(base, decomposed[index])] = char
+    return characters, compositions
+
+
+CHARACTERS, COMPOSITIONS = _build_tables()
+
+
+class KeyDecoder:
+    """
+    Turns raw keyboard events into what the matcher should see: NFC characters, the backspace
+    and trigger key names, and RESET when the caret may no longer be at the end of the typed word.
+
+    It follows IMEs such as Unikey or EVKey typing Vietnamese in Telex or VNI: they delete what
+    they typed with backspaces and type the recomposed syllable again, sometimes as a base letter
+    followed by combining marks ("Unicode tổ hợp"). A combining mark is composed with the previous
+    character, which the matcher sees as a backspace and the composed character. The last
+    `recent_characters` characters are kept for that, in `recent`.
+
+    The IME sends its keys within a fraction of a millisecond; a key down closer than `ime_burst`
+    seconds to the previous one is taken as part of such a burst. When the IME hook runs after
+    ours we also see the key it swallowed: Telex "as" shows "a", "s", then the IME's backspace
+    and "á", though "s" never reached the screen. A burst backspace right after a key typed by
+    hand drops that key as well.
+
+    Shift and Caps Lock are tracked from the key events. Backends that report the unshifted key
+    ("a" with Shift held) are detected on the first shifted letter, and their ASCII letters get
+    the case shown on screen; backends reporting "A", such as the keyboard module, are left alone.
+    Characters sent by an IME are never changed. Keys typed with Ctrl, Alt or the Windows key held
+    are shortcuts rather than text and reset the word, as do the arrow and navigation keys.
+
+    decode() is called for every key event, key releases included, from the keyboard hook only.
+    """
+
+    def __init__(self, recent_characters=DEFAULT_RECENT_CHARACTERS, ime_burst=DEFAULT_IME_BURST, caps_lock=False):
+        self.recent = collections.deque(maxlen=recent_characters)
+        self.ime_burst = ime_burst
+        self.caps_lock = caps_lock
+        self.shift = False
+        self.ctrl = False
+        self.alt = False
+        self.backend_cases = None  # Whether the backend reports letters with Shift applied, None until seen
+        self._other_characters = {}  # Decoded characters outside CHARACTERS, cached
+        self._down_at = None  # Time of the last key down
+        self._typed_at = None  # Time of the last character typed by hand, until the next key down
+
+    def reset(self):
+        self.recent.clear()
+
+    def decode(self, event_type, name, event_time=None):
+        """
+        Return a tuple of matcher key names for one key event, RESET among them to forget the typed word.
+        `event_time` is the time.time() of the event, as in keyboard events; without it IME bursts are not detected.
+        """
+        if not name:
+            return ()
+        if event_type == KEY_UP:
+            if name in SHIFT_KEYS:
+                self.shift = False
+            elif name in CTRL_KEYS:
+                self.ctrl = False
+            elif name in ALT_KEYS:
+                self.alt = False
+            return ()
+
+        burst = event_time is not None and self._down_at is not None and event_time - self._down_at < self.ime_burst
+        self._down_at = event_time
+        typed_at = self._typed_at
+        self._typed_at = None
+
+        decoded = CHARACTERS.get(name)
+        if decoded is not None and not (self.ctrl or self.alt):
+            char = decoded[0]
+            if not burst:
+                if (self.shift or self.caps_lock) and char in ASCII_LETTERS and self.backend_cases is not True:
+                    char = self._apply_case(char)
+                    decoded = (char,)
+                self._typed_at = event_time
+            self.recent.append(char)
+            return decoded
+
+        if name == "backspace":
+            if self.ctrl or self.alt:  # Deletes a whole word
+                self.recent.clear()
+                return (RESET,)
+            if burst and typed_at is not None:
+                # The IME swallowed the key it just reported and is now recomposing the text before it
+                for _ in range(2):
+                    if self.recent:
+                        self.recent.pop()
+                return ("backspace", "backspace")
+            if self.recent:
+                self.recent.pop()
+            return ("backspace",)
+        if name in WHITESPACE_KEYS:
+            self.recent.append(WHITESPACE_KEYS[name])
+            return (name,)
+        if name in SHIFT_KEYS:
+            self.shift = True
+            return ()
+        if name in CTRL_KEYS:
+            self.ctrl = True
+            return ()
+        if name in ALT_KEYS:  # Also opens menus or switches windows on its own
+            self.alt = True
+            return (RESET,)
+        if name in CAPS_LOCK_KEYS:
+            self.caps_lock = not self.caps_lock
+            return ()
+        if name in CARET_KEYS or self.ctrl or self.alt:  # Caret moved, or a shortcut such as ctrl+z or ctrl+v
+            self.recent.clear()
+            return (RESET,)
+        if len(name) == 1:
+            return self._decode_other(name)
+        return (name,)  # Other named keys, e.g. "delete" or "f5", do not change the typed word
+
+    def _apply_case(self, char):
+        """
+        Return the ASCII letter `char` as shown on screen with the current Shift and Caps Lock state.
+        """
+        if self.backend_cases is None:
+            if not self.shift or self.caps_lock:
+                return char  # Cannot tell yet whether the backend applied them
+            self.backend_cases = char.isupper()
+            if self.backend_cases:
+                return char
+        return char.upper() if self.shift != self.caps_lock else char.lower()
+
+    def _decode_other(self, char):
+        """
+        Decode a character outside the precomputed tables: a combining mark composed with the
+        previous character, or any other character normalized to NFC once and cached.
+        """
+        if unicodedata.combining(char):
+            previous = self.recent[-1] if self.recent else None
+            composed = COMPOSITIONS.get((previous, char))
+            if composed is None and previous is not None:
+                normalized = unicodedata.normalize("NFC", previous + char)
+                composed = normalized if len(normalized) == 1 else None
+            if composed is None:
+                return ()  # A mark that does not compose is not part of any word
+            self.recent[-1] = composed
+            return ("backspace", composed)
+        decoded = self._other_characters.get(char)
+        if decoded is None:
+            normalized = unicodedata.normalize("NFC", char)
+            decoded = (normalized,) if len(normalized) == 1 and normalized.isprintable() else ()
+            if len(self._other_characters) < MAX_OTHER_CHARACTERS:
+                self._other_characters[char] = decoded
+        if decoded:
+            self.recent.append(decoded[0])
+        return decoded
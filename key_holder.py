@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+
+from metrics import MetricsRegistry
+
+DEFAULT_HOLD_TIMEOUT = 0.3  # Seconds a key may be held back before it is sent on unchanged
+
+
+class KeyHolder:
+    """
+    Keys held back from the application by the suppressing hook mode, while the typed word may still
+    become an expansion.
+
+    The key handler holds each character of a word as long as the word follows the trie. When it
+    expands, take() drops the held keys, and the expansion is typed without deleting anything;
+    otherwise release() hands the held keys, followed by the key that ended the word, to
+    `release_function(keys)`, which sends them on in order; it is called from the hook callback under
+    the holder's lock and must not wait. Keys are never held longer than
+    `timeout` seconds: a background thread releases them when the oldest one reaches that age, so
+    a word typed without a trigger still shows up. hold(), pop() and take() only act when
+    `expected` keys are held, which is false once a timeout released them, and the key handler
+    falls back to deleting the typed word.
+    """
+
+    def __init__(self, release_function, timeout=DEFAULT_HOLD_TIMEOUT, metrics=None):
+        self.release_function = release_function
+        self.timeout = timeout
+        metrics = metrics or MetricsRegistry()
+        self.held_stats = metrics.counter("keys_held")
+        self.timeouts = metrics.counter("hold_timeouts")
+        self.keys = []
+        self.deadline = None  # time.perf_counter() at which the held keys are released
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def hold(self, key, expected):
+        """
+        Hold `key` if exactly `expected` keys are held. Returns True if it was held.
+        """
+        with self._condition:
+            if len(self.keys) != expected:
+                return False
+            if not self.keys:
+                self.deadline = time.perf_counter() + self.timeout
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="key-holder", daemon=True)
+                    self._thread.start()
+                self._condition.notify_all()
+            self.keys.append(key)
+            self.held_stats.add()
+            return True
+
+    def pop(self, expected):
+        """
+        Drop the last held key, for a backspace, if exactly `expected` keys are held. Returns True if one was dropped.
+        """
+        with self._condition:
+            if not self.keys or len(self.keys) != expected:
+                return False
+            self.keys.pop()
+            if not self.keys:
+                self.deadline = None
+            return True
+
+    def take(self, expected):
+        """
+        Drop the held keys, replaced by an expansion, if exactly `expected` keys are held. Returns True if they were.
+        """
+        with self._condition:
+            if len(self.keys) != expected:
+                return False
+            self.keys = []
+            self.deadline = None
+            return True
+
+    def release(self, *keys):
+        """
+        Send the held keys on, followed by `keys`, if any key is held. Returns True if there were held keys,
+        in which case the caller suppresses the current key, sent after them.
+        """
+        with self._condition:
+            if not self.keys:
+                return False
+            released = self.keys + list(keys)
+            self.keys = []
+            self.deadline = None
+            self.release_function(released)  # Under the lock, so releases reach the queue in order
+            return True
+
+    def stop(self):
+        """
+        Release the held keys and stop the timeout thread.
+        """
+        self.release()
+        with self._condition:
+            thread = self._thread
+            self._thread = None
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(1)
+
+    def _run(self):
+        current = threading.current_thread()
+        with self._condition:
+            while self._thread is current:
+                if self.deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self.deadline - time.perf_counter()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                logging.debug(f"Releasing {len(self.keys)} held keys after {self.timeout * 1000:.0f} ms.")
+                self.timeouts.add()
+                released = self.keys
+                self.keys = []
+                self.deadline = None
+                self.release_function(released)
@@ -0,0 +1,108 @@
+import logging
+import threading
+
+
+class _Hook:
+    """
+    One registered hook and the thread that owns it.
+    """
+
+    def __init__(self, backend, dispatch, suppress=False):
+        self.backend = backend
+        self.dispatch = dispatch
+        self.suppress = suppress
+        self.handle = None
+        self.ready_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="keyboard-hook", daemon=True)
+
+    def _run(self):
+        if self.suppress:
+            self.handle = self.backend.hook(self.dispatch, suppress=True)
+        else:
+            self.handle = self.backend.hook(self.dispatch)
+        self.ready_event.set()
+        self.stop_event.wait()  # Blocks until stop(), no polling
+        self.backend.unhook(self.handle)  # Remove only this hook, never the ones registered by others
+        self.handle = None
+
+
+class KeyboardListener:
+    """
+    Lifecycle of the keyboard hook: start, stop, join and restart.
+
+    `backend` is the `keyboard` module or any object with hook(callback) -> handle and
+    unhook(handle). With `suppress`, the hook is registered with suppress=True and an event is kept
+    from the application when the callback returns a false value. restart() registers the new hook
+    before removing the old one, and events are passed on through a single dispatcher that drops an
+    event object it has just seen, so no key is lost or handled twice while both hooks are registered.
+    """
+
+    def __init__(self, backend, callback, suppress=False):
+        self.backend = backend
+        self.callback = callback
+        self.suppress = suppress
+        self._hook = None
+        self._stopped_hook = None
+        self._lock = threading.Lock()  # Serialises start/stop/restart
+        self._dispatch_lock = threading.Lock()
+        self._last_event = None
+        self._last_result = True
+
+    @property
+    def running(self):
+        return self._hook is not None
+
+    def _dispatch(self, event):
+        with self._dispatch_lock:
+            if event is self._last_event:  # Same event delivered by the overlapping hook during a restart
+                return self._last_result
+            self._last_event = event
+        self._last_result = self.callback(event)
+        return self._last_result
+
+    def _start_hook(self):
+        hook = _Hook(self.backend, self._dispatch, self.suppress)
+        hook.thread.start()
+        hook.ready_event.wait()
+        return hook
+
+    def start(self):
+        """
+        Register the hook. Returns once it is active.
+        """
+        with self._lock:
+            if self._hook is None:
+                self._hook = self._start_hook()
+                logging.info("Listening for keyboard input...")
+
+    def stop(self):
+        """
+        Ask the hook thread to remove its hook and exit. Use join() to wait for it.
+        """
+        with self._lock:
+            hook, self._hook = self._hook, None
+            if hook is not None:
+                hook.stop_event.set()
+                self._stopped_hook = hook
+                logging.info("Keyboard hook stopped.")
+
+    def join(self, timeout=None):
+        """
+        Wait until the last stopped hook thread has removed its hook.
+        """
+        hook = self._stopped_hook
+        if hook is not None:
+            hook.thread.join(timeout)
+
+    def restart(self):
+        """
+        Replace the hook with a fresh one without a gap in which keys are not seen.
+        """
+        with self._lock:
+            old_hook = self._hook
+            self._hook = self._start_hook()
+            if old_hook is not None:
+                old_hook.stop_event.set()
+                old_hook.thread.join()
+                logging.info("Keyboard hook restarted.")
@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+BASE_LAYER = "base"  # The sheet of the sheet_url setting, which also provides the special rows
+
+# One parsed dictionary sheet. Layers with a higher `priority` override the entries of lower ones.
+# `source` identifies where it was read from, e.g. the URL and tab name, to match it with its cache.
+DictionaryLayer = namedtuple("DictionaryLayer", "name priority replacement_data instant_words injection_modes source_hash source")
+
+# Where an extra layer is downloaded from: `sheet` is the tab name, None for the active tab
+LayerSource = namedtuple("LayerSource", "name priority url sheet")
+
+
+def parse_layer_sheets(value):
+    """
+    Parse the layer_sheets setting: one layer per line, "<url>" or "<url> <tab name>",
+    from the lowest to the highest priority. All of them override the base sheet.
+    """
+    sources = []
+    for line in (value or "").splitlines():
+        parts = line.strip().split(None, 1)
+        if not parts:
+            continue
+        priority = len(sources) + 1
+        sources.append(LayerSource(f"layer{priority}", priority, parts[0], parts[1] if len(parts) > 1 else None))
+    return sources
+
+
+class LayeredDictionary:
+    """
+    Replacement dictionaries of several sheets merged by priority into one index.
+
+    For a word present in several layers, the entry of the highest priority layer wins along
+    with its instant flag and injection mode. The merged dictionary is updated incrementally:
+    set_layer() only looks at the words that differ between the old and the new version of
+    the layer, and returns the words whose merged entry changed, so the matcher can be updated
+    for those words only (see DictionarySnapshot's `previous` and `changed_words`).
+    Layers are set from the sync thread only; readers use the published snapshot instead.
+    """
+
+    def __init__(self):
+        self.layers = {}
+        self.replacement_data = {}
+        self.instant_words = set()
+        self.injection_modes = {}
+        self._order = []  # Layers by decreasing priority
+
+    def set_layer(self, layer):
+        """
+        Add a layer or replace the layer with the same name. Returns the set of words whose merged entry changed.
+        """
+        old = self.layers.get(layer.name)
+        self.layers[layer.name] = layer
+        self._order = sorted(self.layers.values(), key=lambda item: -item.priority)
+        if old is None or old.priority != layer.priority:
+            words = set(layer.replacement_data)
+            if old is not None:
+                words.update(old.replacement_data)
+        else:
+            words = _changed_entries(old, layer)
+        return self._merge(words)
+
+    def remove_layer(self, name):
+        """
+        Remove a layer. Returns the set of words whose merged entry changed.
+        """
+        old = self.layers.pop(name, None)
+        if old is None:
+            return set()
+        self._order = sorted(self.layers.values(), key=lambda item: -item.priority)
+        return self._merge(old.replacement_data)
+
+    def _merge(self, words):
+        changed = set()
+        replacement_data = self.replacement_data
+        instant_words = self.instant_words
+        injection_modes = self.injection_modes
+        for word in words:
+            before = (replacement_data.get(word), word in instant_words, injection_modes.get(word))
+            for layer in self._order:
+                replacement = layer.replacement_data.get(word)
+                if replacement is not None:
+                    after = (replacement, word in layer.instant_words, layer.injection_modes.get(word))
+                    break
+            else:
+                after = (None, False, None)
+            if after == before:
+                continue
+            changed.add(word)
+            if after[0] is None:
+                replacement_data.pop(word, None)
+            else:
+                replacement_data[word] = after[0]
+            if after[1]:
+                instant_words.add(word)
+            else:
+                instant_words.discard(word)
+            if after[2] is None:
+                injection_modes.pop(word, None)
+            else:
+                injection_modes[word] = after[2]
+        return changed
+
+
+def _changed_entries(old, new):
+    """
+    Words whose entry, instant flag or injection mode differs between two versions of a layer.
+    """
+    old_data, new_data = old.replacement_data, new.replacement_data
+    words = {word for word, replacement in new_data.items() if old_data.get(word) != replacement}
+    words.update(word for word in old_data if word not in new_data)
+    words.update(old.instant_words ^ new.instant_words)
+    words.update(word for word in old.injection_modes.keys() | new.injection_modes.keys()
+                 if old.injection_modes.get(word) != new.injection_modes.get(word))
+    return words
+
+
+def source_key(source):
+    """
+    Identify a layer source in its cache: the URL, followed by the tab name if there is one.
+    """
+    return f"{source.url} {source.sheet}" if source.sheet else source.url
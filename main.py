@@ -1,37 +1,37 @@
 from re import I
-import requests
-import keyboard
+from startup_timing import StartupTimer
+startup_timer = StartupTimer()  # Time to the first paint and to the keyboard hook, logged once started
+
+# requests, openpyxl, pynput and pyperclip are imported where they are first needed, off the startup path
 import logging
-from pynput import mouse
 import tkinter as tk
 from tkinter import messagebox
 import configparser
-import threading
 import os
-import time
-import openpyxl
+import threading
 import atexit
 import webbrowser
 import sys
+import engine
+from control import ControlClient, ControlServer, ControlError, LocalClient, parse_control_address
+from status_log import StatusBarHandler, DEFAULT_STATUS_UPDATES_PER_SECOND
+from metrics import format_snapshot
+startup_timer.mark("imports")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
 # Constants
-BACKUP_XLSX_PATH = "backup_replacement_data.xlsx"
 LANGUAGE_FOLDER = "languages"
-DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQKz1tiROR-S8zLK6YkrR5OPsvsuJAEVi1uC1ecTKk5-MLC-g6_jzIvSwAUNdnN5kyuIzbvU2DkmH1g/pub?output=xlsx"
-DEFAULT_BEFORE_REPLACEMENT = ""
-DEFAULT_AFTER_REPLACEMENT = " "
-LINK_EDIT_FILE = "https://docs.google.com/spreadsheets/d/16uVFfVMKR7jVXA70g4BCo8KAE7iZVYnJT48oTpD1Z-4/edit?gid=0#gid=0"
+LANGUAGES_XLSX_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSVoAsKwGTxQyR16vv8rLTwEx07N4OxZpK7qDql-tnb3sc3sOe6YCsJ549C3xFMNfMLO6Knn2I5By_Q/pub?output=xlsx"
+STATUS_POLL_INTERVAL_MS = 500  # How often the window asks the engine for its status
 
 # Global variables
-last_mouse_position = (0, 0)
-mouse_moved_significantly = False
-is_paused = False
-keyboard_thread_running = False
-current_replacement_data = {}
-stop_event = threading.Event()  # Global event to signal thread stop
+is_paused = False  # As last reported by the engine
+engine_client = None  # ControlClient of a running daemon, or LocalClient of the engine started by this window
+control_server = None  # Serves the control API of the engine started by this window
+shown_status = None  # Last engine status shown in the window
+pending_reload = None  # Sync count of the engine when the user asked for a reload, until its outcome is shown
 
 # Load settings from .ini file
 config = configparser.ConfigParser()
@@ -56,14 +56,13 @@ BASE_PATH = get_base_path()
 LANGUAGES_FOLDER = os.path.join(BASE_PATH, "languages")
 
 # Get settings or use defaults
-SHEET_URL = config.get('Settings', 'sheet_url', fallback="https://docs.google.com/spreadsheets/d/e/2PACX-1vQKz1tiROR-S8zLK6YkrR5OPsvsuJAEVi1uC1ecTKk5-MLC-g6_jzIvSwAUNdnN5kyuIzbvU2DkmH1g/pub?output=xlsx") #DEFAULT_SHEET_URL
-BEFORE_REPLACEMENT = config.get('Settings', 'before_replacement', fallback=DEFAULT_BEFORE_REPLACEMENT)
-AFTER_REPLACEMENT = config.get('Settings', 'after_replacement', fallback=DEFAULT_AFTER_REPLACEMENT)
+SHEET_URL = config.get('Settings', 'sheet_url', fallback=engine.DEFAULT_SHEET_URL)
+STATUS_UPDATES_PER_SECOND = config.getfloat('Settings', 'status_updates_per_second', fallback=DEFAULT_STATUS_UPDATES_PER_SECOND)
+CONTROL_ADDRESS = parse_control_address(engine.CONTROL_SOCKET)
+logging.getLogger().setLevel(engine.LOG_LEVEL)
 
 # Track previous values of the widgets
 previous_sheet_url = SHEET_URL
-previous_before_replacement = BEFORE_REPLACEMENT
-previous_after_replacement = AFTER_REPLACEMENT
 
 def load_language(language_code):
     """
@@ -84,6 +83,9 @@ def download_and_process_xlsx_for_languages(xlsx_url, languages_folder):
     Download the XLSX file and process it to create .ini files for each language.
     """
     try:
+        import requests
+        import openpyxl
+
         response = requests.get(xlsx_url)
         response.raise_for_status()
 
@@ -108,177 +110,20 @@ def download_and_process_xlsx_for_languages(xlsx_url, languages_folder):
     except Exception as e:
         logging.error(f"Error downloading or processing XLSX file: {e}")
 
-
-def value_to_string(value):
-    if isinstance(value, float):
-        if value.is_integer():
-            return str(int(value))
-        else:
-            return str(value)
-    elif value is None:
-        return ''
-    else:
-        return str(value)
-# Rest of your code (load_replacement_data, process_xlsx_data, etc.) remains mostly the same...
-# ... (Make sure to use BASE_PATH where appropriate if you have other file paths) ...
-def parse_xlsx_for_replacements(workbook):
-    """
-    Process the XLSX data to extract replacement data, 
-    including BEFORE_REPLACEMENT, AFTER_REPLACEMENT, and LINK_EDIT_FILE.
-    """
-    sheet = workbook.active
-    replacement_data = {}
-    global BEFORE_REPLACEMENT, AFTER_REPLACEMENT, LINK_EDIT_FILE  # Use global variables
-
-    for row in sheet.iter_rows(min_row=2):
-        if len(row) >= 2:
-            word_cell = row[0]
-            replacement_cell = row[1]
-            word = value_to_string(word_cell.value).strip()  # Access .value
-            replacement = value_to_string(replacement_cell.value)  # Access .value
-
-            # Check for special cases: BEFORE_REPLACEMENT, AFTER_REPLACEMENT, and LINK_EDIT_FILE
-            if word == "BEFORE_REPLACEMENT":
-                BEFORE_REPLACEMENT = replacement
-                logging.info(f"Set BEFORE_REPLACEMENT to: '{BEFORE_REPLACEMENT}'")
-                continue
-            elif word == "AFTER_REPLACEMENT":
-                AFTER_REPLACEMENT = replacement
-                logging.info(f"Set AFTER_REPLACEMENT to: '{AFTER_REPLACEMENT}'")
-                continue
-            elif word == "LINK_EDIT_FILE":
-                LINK_EDIT_FILE = replacement
-                logging.info(f"Set LINK_EDIT_FILE to: '{LINK_EDIT_FILE}'")
-                continue
-
-            if word and replacement is not None:
-                # Replace escaped newlines (\\n) with actual newlines (\n)
-                replacement = replacement.replace('\\n', '\n')
-                replacement_data[word] = replacement
-
-    return replacement_data
-
-def load_xlsx_from_url(xlsx_url):
-    """
-    Load replacement data from an XLSX file hosted online.
-    """
-    with requests.Session() as s:
-        download = s.get(xlsx_url, allow_redirects=True, stream=True, timeout=5)
-        download.raise_for_status()
-
-        # Save the downloaded XLSX to a temporary file
-        temp_file = "temp_replacement_data.xlsx"
-        with open(temp_file, 'wb') as f:
-            f.write(download.content)
-
-        try:
-            # Load the XLSX file using openpyxl
-            workbook = openpyxl.load_workbook(temp_file)
-            replacement_data = parse_xlsx_for_replacements(workbook)  # Process the workbook data
-
-            # Remove the temporary file
-            os.remove(temp_file)
-            return replacement_data
-        except Exception as e:
-            logging.error(f"Error loading XLSX file: {e}")
-            return {}
-
-def load_xlsx_from_file(file_path):
+def download_languages():
     """
-    Load replacement data from a local XLSX file.
+    Download the language files on a worker thread, then refresh the language dropdown on the Tk thread.
     """
-    try:
-        workbook = openpyxl.load_workbook(file_path)
-        return parse_xlsx_for_replacements(workbook)  # Process the workbook data
-    except Exception as e:
-        logging.error(f"Error loading replacement data from local backup: {e}")
-        return {}
+    download_and_process_xlsx_for_languages(LANGUAGES_XLSX_URL, LANGUAGES_FOLDER)
+    root.after(0, refresh_language_menu)
 
-def save_xlsx_to_file(replacement_data, file_path):
+def list_language_codes():
     """
-    Save replacement data to a local XLSX file, including BEFORE_REPLACEMENT,
-    AFTER_REPLACEMENT, and LINK_EDIT_FILE.
+    Return the codes of the language files found in the languages folder.
     """
-    workbook = openpyxl.Workbook()
-    sheet = workbook.create_sheet("Sheet1", 0)
-    # Insert the header row
-    sheet.append(["Word", "Replacement"])
-
-    # Insert special rows
-    sheet.append(["BEFORE_REPLACEMENT", BEFORE_REPLACEMENT])
-    after_replacement_to_save = AFTER_REPLACEMENT.replace(' ', '\u00A0')
-    sheet.append(["AFTER_REPLACEMENT", after_replacement_to_save])
-
-    sheet.append(["LINK_EDIT_FILE", LINK_EDIT_FILE])
-
-    # Insert the replacement data
-    for word, replacement in replacement_data.items():
-        sheet.append([word, replacement])
-
-    workbook.save(file_path)
+    language_files = [f for f in os.listdir(LANGUAGES_FOLDER) if f.endswith('.ini')]
+    return [os.path.splitext(f)[0] for f in language_files]  # Extract language codes
 
-def replace_word(word, replacement):
-    """
-    Replace the typed word with the replacement text.
-    """
-    logging.info(f"Replacing '{word}' with '{replacement}'")
-    # Simulate pressing backspace to delete the typed word
-    for _ in range(len(word)+1):
-        keyboard.press_and_release('backspace')
-
-    # Split the replacement text by newlines and simulate typing each part
-    replacement_parts = replacement.split('\n')
-    keyboard.write(BEFORE_REPLACEMENT)
-    for part in replacement_parts:
-        keyboard.write(part)
-        if part != replacement_parts[-1]:  # If not the last part, press Enter
-            keyboard.press_and_release('enter')
-    keyboard.write(AFTER_REPLACEMENT)
-    
-def on_mouse_move(x, y):
-    """
-    Callback function to detect significant mouse movement.
-    """
-    global last_mouse_position, mouse_moved_significantly
-    # Check if the mouse has moved more than 10 pixels in any direction
-    if abs(x - last_mouse_position[0]) > 10 or abs(y - last_mouse_position[1]) > 10:
-        mouse_moved_significantly = True
-        last_mouse_position = (x, y)
-
-# Start listening for mouse events
-mouse_listener = mouse.Listener(on_move=on_mouse_move)
-mouse_listener.start()
-
-def on_key_event(replacement_data):
-    """
-    Callback function to handle key events and detect words between spaces.
-    """
-    # Buffer to store typed characters
-    buffer = ""
-
-    def handle_key(event):
-        nonlocal buffer
-        global mouse_moved_significantly, is_paused  # Include is_paused here
-
-        if is_paused:  # If paused, ignore all keyboard events
-            return
-
-        if event.event_type == keyboard.KEY_DOWN:
-            # Reset buffer if mouse moved significantly
-            if mouse_moved_significantly:
-                buffer = ""
-                mouse_moved_significantly = False  # Reset the flag
-
-            if event.name == 'space':  # When a space is detected
-                if buffer in replacement_data:  # Check if the word is in the replacement data
-                    replace_word(buffer, replacement_data[buffer])
-                buffer = ""  # Reset the buffer
-            elif event.name == 'backspace':  # Handle backspace to remove the last character
-                buffer = buffer[:-1]  # Remove the last character from the buffer
-            elif event.name.isalnum() and event.name not in ['ctrl', 'enter']:  # Only process alphanumeric characters and ignore special keys
-                buffer += event.name  # Add the character to the buffer
-
-    return handle_key
 
 def save_settings():
     """
@@ -295,123 +140,146 @@ def save_settings():
         previous_sheet_url = current_sheet_url
 
         # Save the URL to the .ini file
-        config['Settings'] = {
-            'sheet_url': current_sheet_url
-        }
-        with open('settings.ini', 'w') as configfile:
-            config.write(configfile)
+        write_settings(sheet_url=current_sheet_url)
         logging.info("Settings saved successfully!")
 
-def load_settings_and_data():
+def write_settings(**values):
     """
-    Loads settings from the .ini file and reloads the replacement data.
+    Update the given keys of the [Settings] section and write the .ini file; every other setting is kept.
     """
-    global SHEET_URL, BEFORE_REPLACEMENT, AFTER_REPLACEMENT, current_replacement_data, LINK_EDIT_FILE
-
-    # Load settings from the .ini file
-    config.read('settings.ini')
-    SHEET_URL = config.get('Settings', 'sheet_url', fallback=DEFAULT_SHEET_URL)
-
-    # Reload the replacement data from the XLSX URL
-    replacement_data = load_replacement_data(SHEET_URL)
-    if replacement_data:
-        current_replacement_data = replacement_data  # Update the current replacement data
-        logging.info("Replacement data reloaded successfully.")
-
-        # Update the Tkinter entry fields with the dynamic values
-        before_replacement_entry.config(state="normal")  # Temporarily enable to update
-        before_replacement_entry.delete(0, tk.END)  # Clear the entry field
-        before_replacement_entry.insert(0, BEFORE_REPLACEMENT)  # Insert the dynamic value
-        before_replacement_entry.config(state="readonly")  # Disable editing again
-
-        after_replacement_entry.config(state="normal")  # Temporarily enable to update
-        after_replacement_entry.delete(0, tk.END)  # Clear the entry field
-        after_replacement_entry.insert(0, AFTER_REPLACEMENT)  # Insert the dynamic value
-        after_replacement_entry.config(state="readonly")  # Disable editing again
-
-        update_link_edit_file_field()  # Update the "Link Edit File" field
-        return replacement_data
-    else:
-        logging.error("Failed to reload replacement data.")
-        return None
+    if not config.has_section('Settings'):
+        config.add_section('Settings')
+    for key, value in values.items():
+        config['Settings'][key] = value
+    with open('settings.ini', 'w') as configfile:
+        config.write(configfile)
 
-def start_keyboard_listener(replacement_data):
+def update_replacement_fields(settings):
     """
-    Starts the keyboard hook in a separate thread.
+    Update the Tkinter entry fields with the values read from the sheet, as reported by the engine.
     """
-    global keyboard_thread_running
-    if keyboard_thread_running:
-        stop_keyboard_hook()
-    stop_event.clear()  # Clear the stop event before starting the thread
-    keyboard_thread = threading.Thread(target=start_keyboard_hook, args=(replacement_data,))
-    keyboard_thread.daemon = True  # Daemon thread will exit when the main program exits
-    keyboard_thread.start()
-    keyboard_thread_running = True  # Set the flag to indicate the thread is running
-    logging.info("Listening for keyboard input...")
+    before_replacement_entry.config(state="normal")  # Temporarily enable to update
+    before_replacement_entry.delete(0, tk.END)  # Clear the entry field
+    before_replacement_entry.insert(0, settings["BEFORE_REPLACEMENT"])  # Insert the dynamic value
+    before_replacement_entry.config(state="readonly")  # Disable editing again
+
+    after_replacement_entry.config(state="normal")  # Temporarily enable to update
+    after_replacement_entry.delete(0, tk.END)  # Clear the entry field
+    after_replacement_entry.insert(0, settings["AFTER_REPLACEMENT"])  # Insert the dynamic value
+    after_replacement_entry.config(state="readonly")  # Disable editing again
+
+    update_link_edit_file_field(settings["LINK_EDIT_FILE"])  # Update the "Link Edit File" field
 
 def start_program():
     """
-    Restart the program by reloading all settings and replacement data.
+    Connect the window to the engine; runs from the main loop once the window is shown.
+    An engine already running for this user (daemon.py) is used as it is. Otherwise the engine is
+    started in this process; its control API is only served when the control_socket setting asks
+    for it, so that scripts can drive it as well.
     """
-    replacement_data = load_settings_and_data()
-    if replacement_data:
-        start_keyboard_listener(replacement_data)
-    else:
-        logging.error("Failed to start program. Exiting program.")
+    global engine_client, control_server
 
-def start_keyboard_hook(replacement_data):
-    """
-    Start the keyboard hook in a separate thread.
+    client = ControlClient(CONTROL_ADDRESS, timeout=1)
+    try:
+        client.connect()
+        engine_client = client
+        logging.info(f"Connected to the engine running on {CONTROL_ADDRESS}.")
+    except OSError:
+        engine.start(timer=startup_timer)
+        engine_client = LocalClient(engine.handle_command)
+        if engine.CONTROL_SOCKET:
+            control_server = ControlServer(engine.handle_command, CONTROL_ADDRESS)
+            try:
+                control_server.start()
+            except OSError as e:
+                logging.warning(f"Control API not available: {e}")
+                control_server = None
+        atexit.register(stop_engine)
+    poll_status()
+
+def stop_engine():
+    """
+    Stop the control API and the engine started by this window.
+    """
+    if control_server is not None:
+        control_server.stop()
+    engine.stop()
+
+def poll_status():
+    """
+    Show the engine's status, then ask again in STATUS_POLL_INTERVAL_MS. Runs on the Tk thread;
+    a status request is a sub-millisecond round trip, or a function call for the engine of this window.
     """
-    global stop_event
-    keyboard.hook(on_key_event(replacement_data))
-    
-    while not stop_event.is_set():  # Loop until the stop event is set
-        time.sleep(0.1)  # Sleep for 100 milliseconds to reduce CPU usage
-    
-    # Clean up when the thread is stopped
-    keyboard.unhook_all()
-    logging.info("Keyboard hook stopped.")
+    try:
+        show_status(engine_client.call("status"))
+    except (OSError, ControlError) as e:
+        if shown_status is not None:  # Reported once, when the connection is lost
+            logging.error(f"Lost the connection to the engine: {e}")
+        show_status(None)
+    root.after(STATUS_POLL_INTERVAL_MS, poll_status)
+
+def show_status(status):
+    """
+    Update the window for a new engine status, and tell the user the outcome of a reload they asked for.
+    """
+    global shown_status, pending_reload
+    previous = shown_status
+    shown_status = status
+    if status is None:
+        return
+    if previous is None or status["settings"] != previous["settings"]:
+        update_replacement_fields(status["settings"])
+    if previous is None or status["paused"] != previous["paused"]:
+        show_pause_state(status["paused"])
+
+    sync = status["sync"]
+    if pending_reload is None or sync["count"] <= pending_reload or not sync["manual"]:
+        return
+    pending_reload = None
+    if sync["error"] is None:
+        logging.info("XLSX file reloaded from the internet.")
+        messagebox.showinfo("Reload", "XLSX file reloaded successfully!")
+    else:
+        logging.error("Failed to reload XLSX file from the internet.")
+        messagebox.showerror("Reload", "Failed to reload XLSX file from the internet.")
 
-def stop_keyboard_hook():
-    """
-    Signal the keyboard hook thread to stop.
-    """
-    global stop_event
-    stop_event.set()  # Set the stop event to signal the thread to stop
-    # logging.info("Stopping keyboard hook thread...")
+def show_pause_state(paused):
+    global is_paused
+    is_paused = paused
+    if is_paused:
+        pause_button.config(text=language_config.get('Buttons', 'resume', fallback="Resume"), bg="red", activebackground="darkred")
+    else:
+        pause_button.config(text=language_config.get('Buttons', 'pause', fallback="Pause"), bg="green", activebackground="darkgreen")
 
 def toggle_pause():
     """
     Toggle the pause state.
     """
-    global is_paused
-    is_paused = not is_paused  # Toggle the pause state
-    if is_paused:
-        pause_button.config(text=language_config['Buttons']['resume'], bg="red", activebackground="darkred")
-        logging.info("Program paused.")
-    else:
-        pause_button.config(text=language_config['Buttons']['pause'], bg="green", activebackground="darkgreen")
-        logging.info("Program resumed.")
+    try:
+        show_pause_state(engine_client.call("resume" if is_paused else "pause")["paused"])
+    except (OSError, ControlError) as e:
+        logging.error(f"Could not change the pause state: {e}")
 
 def reload_xlsx_from_internet(current_value):
     """
     Reload the XLSX file from the internet and update the replacement data.
+    The download runs on the engine's sync thread; show_status reports the outcome.
     """
-    global SHEET_URL, current_replacement_data
-    replacement_data = load_replacement_data(current_value)
-    if replacement_data:
-        current_replacement_data = replacement_data  # Update the current replacement data
-        logging.info("XLSX file reloaded from the internet.")
-        messagebox.showinfo("Reload", "XLSX file reloaded successfully!")
-    else:
-        logging.error("Failed to reload XLSX file from the internet.")
-        messagebox.showerror("Reload", "Failed to reload XLSX file from the internet.")
+    global pending_reload
+    try:
+        pending_reload = shown_status["sync"]["count"] if shown_status else 0
+        engine_client.call("reload", url=current_value)
+    except (OSError, ControlError) as e:
+        pending_reload = None
+        logging.error(f"Could not reload the XLSX file: {e}")
 
 def update_gui_language():
     """
     Update the GUI labels, buttons, and messages based on the selected language.
     """
+    if not language_config.has_section('Labels'):  # Language files not downloaded yet
+        return
+
     # Update Labels
     sheet_url_label.config(text=language_config['Labels']['sheet_url'])
     before_replacement_label.config(text=language_config['Labels']['before_replacement'])
@@ -421,6 +289,7 @@ def update_gui_language():
     save_button.config(text=language_config['Buttons']['save_settings'])
     pause_button.config(text=language_config['Buttons']['pause'])
     reload_button.config(text=language_config['Buttons']['reload_csv'])
+    metrics_button.config(text=language_config.get('Buttons', 'metrics', fallback="Metrics"))
 
 def change_language(language_code):
     """
@@ -431,12 +300,7 @@ def change_language(language_code):
     update_gui_language()
 
     # Save the selected language to the settings file
-    config['Settings'] = {
-        'language': language_code,
-        'sheet_url': sheet_url_text.get("1.0", "end-1c")
-    }
-    with open('settings.ini', 'w') as configfile:
-        config.write(configfile)
+    write_settings(language=language_code, sheet_url=sheet_url_text.get("1.0", "end-1c"))
     logging.info(f"Language changed to {language_code} and saved to settings file.")
 
 # Button to open the Google Sheet URL
@@ -447,10 +311,48 @@ def open_google_sheet():
     else:
         messagebox.showwarning("No URL", "The 'Link Edit File' URL is not set.")
 
-def update_link_edit_file_field():
+def refresh_language_menu():
+    """
+    Fill the language dropdown with the downloaded languages and apply the selected one.
+    """
+    menu = language_menu["menu"]
+    menu.delete(0, tk.END)
+    for language_code in list_language_codes():
+        menu.add_command(label=language_code, command=tk._setit(language_var, language_code, change_language))
+    change_language(language_var.get())
+
+def show_metrics_panel():
+    """
+    Open a window showing the metrics, refreshed every second while it is open.
+    """
+    global metrics_window
+    if metrics_window is not None and metrics_window.winfo_exists():
+        metrics_window.lift()
+        return
+
+    metrics_window = tk.Toplevel(root)
+    metrics_window.title("Metrics")
+    metrics_text = tk.Text(metrics_window, width=80, height=30, font=("Courier", 9), bg="#fff", fg="#333", relief="flat")
+    metrics_text.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def refresh():
+        if not metrics_text.winfo_exists():
+            return
+        metrics_text.config(state="normal")
+        metrics_text.delete("1.0", tk.END)
+        try:
+            metrics_text.insert("1.0", format_snapshot(engine_client.call("stats")["metrics"]))
+        except (OSError, ControlError) as e:
+            metrics_text.insert("1.0", f"Metrics not available: {e}")
+        metrics_text.config(state="disabled")
+        metrics_window.after(1000, refresh)
+
+    refresh()
+
+def update_link_edit_file_field(link_edit_file):
     link_edit_file_text.config(state="normal")  # Temporarily enable to update
     link_edit_file_text.delete("1.0", tk.END)  # Clear the entry field
-    link_edit_file_text.insert("1.0", LINK_EDIT_FILE)  # Insert the dynamic value
+    link_edit_file_text.insert("1.0", link_edit_file)  # Insert the dynamic value
     link_edit_file_text.config(state="disabled")  # Disable editing again
 
 # Create the GUI
@@ -480,11 +382,11 @@ sheet_url_text.grid(row=0, column=1, padx=10, pady=10)
 
 # Disable editing for BEFORE_REPLACEMENT and AFTER_REPLACEMENT fields
 before_replacement_entry = tk.Entry(root, width=50, font=custom_font, bg="#fff", fg="#333", relief="flat", bd=2, state="readonly")
-before_replacement_entry.insert(0, BEFORE_REPLACEMENT)
+before_replacement_entry.insert(0, engine.BEFORE_REPLACEMENT)
 before_replacement_entry.grid(row=1, column=1, padx=10, pady=10)
 
 after_replacement_entry = tk.Entry(root, width=50, font=custom_font, bg="#fff", fg="#333", relief="flat", bd=2, state="readonly")
-after_replacement_entry.insert(0, AFTER_REPLACEMENT)
+after_replacement_entry.insert(0, engine.AFTER_REPLACEMENT)
 after_replacement_entry.grid(row=2, column=1, padx=10, pady=10)
 
 # Buttons
@@ -497,18 +399,20 @@ pause_button.grid(row=3, column=1, padx=10, pady=10, sticky="ew")
 reload_button = tk.Button(root, text="Reload XLSX from Internet", font=custom_font, bg="#0078d7", fg="#fff", relief="flat", activebackground="#005a9e", activeforeground="#fff", command=lambda: reload_xlsx_from_internet(sheet_url_text.get("1.0", "end-1c").strip()))
 reload_button.grid(row=4, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
 
+metrics_window = None
+metrics_button = tk.Button(root, text="Metrics", font=custom_font, bg="#0078d7", fg="#fff", relief="flat", activebackground="#005a9e", activeforeground="#fff", command=show_metrics_panel)
+metrics_button.grid(row=3, column=2, padx=10, pady=10, sticky="ew")
+
 # Language dropdown
 saved_language = config.get('Settings', 'language', fallback='vi')
 # Load all .ini files in the language folder
-# Check if the languages folder exists, if not, create it and download the XLSX file
+# Check if the languages folder exists, if not, create it and download the XLSX file in the background
 if not os.path.exists(LANGUAGES_FOLDER):
     os.makedirs(LANGUAGES_FOLDER)
-    download_and_process_xlsx_for_languages("https://docs.google.com/spreadsheets/d/e/2PACX-1vSVoAsKwGTxQyR16vv8rLTwEx07N4OxZpK7qDql-tnb3sc3sOe6YCsJ549C3xFMNfMLO6Knn2I5By_Q/pub?output=xlsx", LANGUAGES_FOLDER)
+    threading.Thread(target=download_languages, name="languages", daemon=True).start()
 
 load_language(saved_language)
-language_files = [f for f in os.listdir(LANGUAGES_FOLDER) if f.endswith('.ini')]
-
-language_codes = [os.path.splitext(f)[0] for f in language_files]  # Extract language codes
+language_codes = list_language_codes() or [saved_language]  # The dropdown needs one entry until the download is done
 
 # Update the language dropdown with all available languages
 language_var = tk.StringVar(root)
@@ -537,43 +441,16 @@ sheet_url_text.bind("<FocusOut>", lambda event: save_settings())
 status_bar = tk.Label(root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W, font=custom_font, bg="#f5f5f5", fg="#333")
 status_bar.grid(row=6, column=0, columnspan=3, sticky="ew", padx=10, pady=10)
 
-# Redirect logging to the status bar
-class StatusBarHandler(logging.Handler):
-    def emit(self, record):
-        log_entry = self.format(record)
-        status_bar.config(text=log_entry)
-                
-# Add the status bar handler to the logger
-status_bar_handler = StatusBarHandler()
+# Redirect logging to the status bar; records from other threads are shown by the Tk thread
+status_bar_handler = StatusBarHandler(status_bar, STATUS_UPDATES_PER_SECOND)
 status_bar_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logging.getLogger().addHandler(status_bar_handler)
+status_bar_handler.start()
 
-def load_replacement_data(xlsx_url):
-    """
-    Load replacement data from an XLSX file hosted online or from a local backup.
-    """
-    try:
-        # Try to download the XLSX from the internet
-        replacement_data = load_xlsx_from_url(xlsx_url)
-        if replacement_data:
-            # Save the downloaded XLSX to a local backup file
-            save_xlsx_to_file(replacement_data, BACKUP_XLSX_PATH)
-            logging.info("Replacement data loaded from the internet and saved to local backup.")
-        return replacement_data
-
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error downloading data: {e}")
-        logging.info("Attempting to load replacement data from local backup...")
-
-        # If the download fails, try loading from the local backup file
-        if os.path.exists(BACKUP_XLSX_PATH):
-            return load_xlsx_from_file(BACKUP_XLSX_PATH)
-        else:
-            logging.error("No local backup file found. Exiting program.")
-            return {}
-
-start_program()
-atexit.register(stop_keyboard_hook)
+# Draw the window first, then start the hook and the sync from the main loop
+root.update()
+startup_timer.mark("window shown")
+root.after(0, start_program)
 
 # Run the GUI
 root.mainloop()
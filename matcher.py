@@ -0,0 +1,483 @@
+import logging
+import re
+import time
+from types import MappingProxyType
+
+from templates import compile_template, compile_templates, keep_fields
+
+# Whitespace separated key names, e.g. "space enter tab . ,"
+DEFAULT_TRIGGER_KEYS = "space"
+
+# Keys that end the typed word when they are not trigger keys
+WORD_BREAK_KEYS = frozenset({"space", "enter", "tab"})
+
+
+def parse_trigger_keys(value):
+    """
+    Turn a whitespace separated trigger key setting (e.g. "space enter . ,") into a frozenset.
+    """
+    keys = frozenset(value.split()) if value else frozenset()
+    return keys or frozenset(DEFAULT_TRIGGER_KEYS.split())
+
+
+def fold(char):
+    """
+    Case-fold one typed character for the trie, keeping characters whose lower case is longer than one.
+    """
+    lower = char.lower()
+    return lower if len(lower) == 1 else char
+
+
+def fold_word(word):
+    return "".join(fold(char) for char in word)
+
+
+def is_pattern_rule(word):
+    """
+    Sheet words starting with "re:" are regular expressions, words containing * or ? are wildcards.
+    """
+    return word.startswith("re:") or "*" in word or "?" in word
+
+
+def match_case(typed, word, replacement):
+    """
+    Carry the case the user typed over to the replacement of a case-insensitive match:
+    "BN" -> all upper case, "Bn" -> first letter upper case, anything else unchanged.
+    """
+    if typed == word:
+        return replacement
+    if len(typed) > 1 and typed.isupper():
+        return replacement.upper()
+    if typed[:1].isupper() and not word[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+class _Node:
+    __slots__ = ("children", "words", "instant")
+
+    def __init__(self):
+        self.children = {}  # Keyed by folded character
+        self.words = ()  # Words ending at this node; several when they only differ in case
+        self.instant = False  # One of the words fires as soon as it is typed, without a trigger key
+
+    def copy(self):
+        node = _Node()
+        node.children = dict(self.children)
+        node.words = self.words
+        node.instant = self.instant
+        return node
+
+
+REGEX_QUANTIFIERS = "*+?{"
+
+
+def literal_prefix(word):
+    """
+    The characters every word matched by a pattern rule starts with, as far as they can be read off the rule.
+    """
+    if word.startswith("re:"):
+        expression = word[3:]
+        if "|" in expression:  # Alternatives may start differently
+            return ""
+        length = 0
+        while length < len(expression) and expression[length].isalnum():
+            length += 1
+        if length < len(expression) and expression[length] in REGEX_QUANTIFIERS:
+            length -= 1  # "ab?" does not require the "b"
+        return expression[:length]
+    for index, char in enumerate(word):
+        if char in "*?":
+            return word[:index]
+    return word
+
+
+def literal_suffix(word):
+    """
+    The characters every word matched by a pattern rule ends with, as far as they can be read off the rule.
+    """
+    if word.startswith("re:"):
+        expression = word[3:]
+        if "|" in expression:  # Alternatives may end differently
+            return ""
+        start = len(expression)
+        while start > 0 and expression[start - 1].isalnum():
+            start -= 1
+        if start > 0 and expression[start - 1] == "\\":
+            start += 1  # "\dkg": the "d" belongs to the escape
+        return expression[start:]
+    for index in range(len(word) - 1, -1, -1):
+        if word[index] in "*?":
+            return word[index + 1:]
+    return word
+
+
+# Rule expressions that cannot sit in an alternation with others: named groups, references to a
+# group by number or name, and global flags, which only apply at the start of an expression
+UNCOMBINABLE_RULE = re.compile(r"\(\?P[<=]|\(\?\(|\\[1-9]|^\(\?[aiLmsux]+\)")
+
+
+class _PatternRules:
+    """
+    The regex ("re:...") and wildcard ("*", "?") rules of a dictionary, compiled once at load time.
+
+    The rules are indexed by their case-folded literal prefix in a small trie, so a typed word is
+    only tried against the rules whose prefix it starts with. Rules without a literal prefix ("*x",
+    "re:(\\d+)kg") are indexed by their literal suffix in a second trie, walked from the end of the
+    word, and the few with neither share the root. The rules of one node are compiled into one
+    alternation, each rule in a group named after its index, so one fullmatch finds the first of
+    them matching, in sheet order; rules that cannot be combined (see UNCOMBINABLE_RULE) are tried
+    one by one. The first rule matching the whole word is expanded with its own expression:
+    \\1, \\2... in the replacement refer to its groups, each * or ? of a wildcard being one group.
+    """
+
+    def __init__(self, words, ignore_case=False):
+        self.words = list(words)
+        self.rules = []
+        self._root = {}  # Folded character -> child; the None key holds the rules ending there, see _compile_bucket
+        self._suffix_root = {}  # The same for the reversed suffixes of the rules without a prefix
+        for word in self.words:
+            try:
+                rule = re.compile(self._expression(word, ignore_case))
+            except re.error as e:
+                logging.warning(f"Invalid pattern rule '{word}': {e}")
+                continue
+            prefix = literal_prefix(word)
+            node, literal = (self._root, prefix) if prefix else (self._suffix_root, literal_suffix(word)[::-1])
+            for char in fold_word(literal):
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(len(self.rules))
+            self.rules.append((word, rule))
+        nodes = [self._root, self._suffix_root]
+        while nodes:
+            node = nodes.pop()
+            if None in node:
+                node[None] = self._compile_bucket(node[None])
+            nodes.extend(child for char, child in node.items() if char is not None)
+
+    @staticmethod
+    def _expression(word, ignore_case):
+        if word.startswith("re:"):
+            return word[3:]
+        expression = "".join("(.*)" if char == "*" else "(.)" if char == "?" else re.escape(char) for char in word)
+        return f"(?i:{expression})" if ignore_case else expression
+
+    def _compile_bucket(self, indexes):
+        """
+        Return (alternation or None, indexes of the rules tried one by one) for the rules `indexes`.
+        """
+        combined = [index for index in indexes if not UNCOMBINABLE_RULE.search(self.rules[index][1].pattern)]
+        separate = [index for index in indexes if index not in combined]
+        if not combined:
+            return None, tuple(separate)
+        try:
+            alternation = re.compile("|".join(f"(?P<r{index}>{self.rules[index][1].pattern})" for index in combined))
+        except re.error:
+            return None, tuple(indexes)
+        return alternation, tuple(separate)
+
+    def match(self, typed):
+        """
+        Return (word, match) for the first rule matching the whole typed text, or None.
+        """
+        buckets = []
+        for node, chars in ((self._root, typed), (self._suffix_root, reversed(typed))):
+            for char in chars:
+                if None in node:
+                    buckets.append(node[None])
+                node = node.get(fold(char))
+                if node is None:
+                    break
+            else:
+                if None in node:
+                    buckets.append(node[None])
+        first = None
+        separate = []
+        for alternation, indexes in buckets:
+            if alternation is not None:
+                found = alternation.fullmatch(typed)
+                if found is not None:
+                    index = int(found.lastgroup[1:])  # The rule's own group closes last
+                    if first is None or index < first:
+                        first = index
+            separate += indexes
+        for index in sorted(separate):
+            if first is not None and index > first:
+                break
+            if self.rules[index][1].fullmatch(typed) is not None:
+                first = index
+                break
+        if first is None:
+            return None
+        word, rule = self.rules[first]
+        return word, rule.fullmatch(typed)
+
+
+class ReplacementMatcher:
+    """
+    Incremental matcher over the replacement words.
+
+    The words are compiled once into a prefix trie and every keystroke moves the
+    current state by one node, so the cost per key does not depend on the size of
+    the dictionary and no buffer string is rebuilt while typing.
+
+    The trie is keyed by case-folded characters. A word typed with another case than the sheet's
+    matches when `ignore_case` is set, and the case is carried over to the replacement (see
+    match_case); a word present in the sheet with the exact typed case always wins. Regex and
+    wildcard rules are compiled by _PatternRules and only tried when a trigger key ends a word
+    without a plain entry.
+    """
+
+    def __init__(self, replacement_data, trigger_keys=DEFAULT_TRIGGER_KEYS, instant_words=(), ignore_case=False):
+        self.replacement_data = replacement_data
+        if isinstance(trigger_keys, str):
+            trigger_keys = parse_trigger_keys(trigger_keys)
+        self.trigger_keys = frozenset(trigger_keys)
+        self.instant_words = frozenset(instant_words)
+        self.ignore_case = ignore_case
+        self.last_rule = None  # Sheet word of the last match, e.g. the rule behind a case-insensitive match
+        self._root = _Node()
+        pattern_words = []
+        for word in replacement_data:
+            if is_pattern_rule(word):
+                pattern_words.append(word)
+            else:
+                self._insert(self._root, word, word in self.instant_words)
+        self._patterns = _PatternRules(pattern_words, ignore_case) if pattern_words else None
+        self.reset()
+
+    def _insert(self, root, word, instant, copied=None):
+        """
+        Add `word` under `root`. With `copied` (ids of the nodes created by the current update),
+        shared nodes are copied before being modified.
+        """
+        node = root
+        for char in fold_word(word):
+            child = node.children.get(char)
+            if child is None:
+                child = _Node()
+            elif copied is None or id(child) in copied:
+                node = child
+                continue
+            else:
+                child = child.copy()
+            node.children[char] = child
+            if copied is not None:
+                copied.add(id(child))
+            node = child
+        if word not in node.words:
+            node.words += (word,)
+        if instant:
+            node.instant = True
+        return node
+
+    def updated(self, replacement_data, changed_words, instant_words=()):
+        """
+        Return a new matcher for `replacement_data`, which differs from this matcher's data only in `changed_words`.
+
+        The trie nodes are shared, except on the paths of the changed words, which are copied
+        before being modified. The update costs O(length of the changed words) whatever the size
+        of the dictionary, and this matcher stays valid for a hook that is still using it.
+        Nodes of removed words are left in place without a word; they never match.
+        """
+        matcher = ReplacementMatcher.__new__(ReplacementMatcher)
+        matcher.replacement_data = replacement_data
+        matcher.trigger_keys = self.trigger_keys
+        matcher.instant_words = frozenset(instant_words)
+        matcher.ignore_case = self.ignore_case
+        matcher.last_rule = None
+        matcher._root = self._root.copy()
+        copied = {id(matcher._root)}  # Nodes created by this update, which may be modified in place
+        pattern_words = list(self._patterns.words) if self._patterns is not None else []
+        patterns_changed = False
+        for word in changed_words:
+            present = word in replacement_data
+            if is_pattern_rule(word):
+                if word in pattern_words:
+                    pattern_words.remove(word)
+                if present:
+                    pattern_words.append(word)
+                patterns_changed = True
+                continue
+            if not present and not self._has_word(word):
+                continue
+            node = matcher._insert(matcher._root, word, False, copied)
+            if not present:
+                node.words = tuple(other for other in node.words if other != word)
+            node.instant = any(other in matcher.instant_words for other in node.words)
+        if patterns_changed:
+            matcher._patterns = _PatternRules(pattern_words, self.ignore_case) if pattern_words else None
+        else:
+            matcher._patterns = self._patterns
+        matcher.reset()
+        return matcher
+
+    def _has_word(self, word):
+        node = self._root
+        for char in fold_word(word):
+            node = node.children.get(char)
+            if node is None:
+                return False
+        return word in node.words
+
+    def reset(self):
+        """
+        Forget everything typed so far.
+        """
+        self._path = [self._root]  # Nodes for each typed character that still follows the trie
+        self._typed = []  # Every typed character, also after the point where no word can match any more
+
+    @property
+    def typed_length(self):
+        """
+        Number of characters currently held in the matcher.
+        """
+        return len(self._typed)
+
+    @property
+    def can_complete(self):
+        """
+        True when the typed word is the beginning of a word of the trie, so a later key may still expand it.
+        Pattern rules are not considered.
+        """
+        return len(self._path) > len(self._typed) > 0
+
+    def _node_match(self, node, typed, instant_only=False):
+        """
+        Return (word, replacement) for the word of `node` matching the typed text, or None.
+        """
+        words = node.words
+        if not words:
+            return None
+        if typed in words:
+            word = typed
+        elif self.ignore_case:
+            word = next((word for word in words if word == word.lower()), words[0])  # Prefer the lower case entry
+        else:
+            return None
+        if instant_only and word not in self.instant_words:
+            return None
+        return word, match_case(typed, word, self.replacement_data[word])
+
+    def feed(self, key_name):
+        """
+        Advance the matcher by one key press.
+
+        Returns a (typed word, replacement, trigger) tuple when a word fires, otherwise None; the sheet
+        word behind the match is in `last_rule`. `trigger` is the trigger key name, or None for
+        instant words, where no trigger key was typed.
+        """
+        if not key_name:
+            return None
+
+        if key_name in self.trigger_keys:
+            typed = "".join(self._typed)
+            found = None
+            if typed:
+                if len(self._path) > len(self._typed):  # Every typed character followed the trie
+                    found = self._node_match(self._path[-1], typed)
+                if found is None and self._patterns is not None:
+                    pattern_match = self._patterns.match(typed)
+                    if pattern_match is not None:
+                        word, match = pattern_match
+                        try:
+                            replacement = match.expand(self.replacement_data[word])
+                        except (re.error, IndexError):
+                            replacement = self.replacement_data[word]
+                        if self.ignore_case and not word.startswith("re:"):
+                            replacement = match_case(typed, word, replacement)
+                        found = word, replacement
+            self.reset()
+            if found is not None:
+                self.last_rule = found[0]
+                return typed, found[1], key_name
+            return None
+
+        if key_name in WORD_BREAK_KEYS or key_name.isspace():  # Whitespace that is no trigger starts a new word
+            self.reset()
+            return None
+
+        if key_name == 'backspace':  # Undo the last typed character
+            if self._typed:
+                if len(self._path) > len(self._typed):
+                    self._path.pop()
+                self._typed.pop()
+            return None
+
+        # Any single printable character, so "!" or "-" in a typed word is not skipped; not key names like 'shift'
+        if len(key_name) == 1 and key_name.isprintable() and not key_name.isspace():
+            self._typed.append(key_name)
+            if len(self._path) < len(self._typed):  # Already off the trie
+                return None
+            node = self._path[-1].children.get(fold(key_name))
+            if node is None:
+                return None
+            if node.instant:
+                typed = "".join(self._typed)
+                found = self._node_match(node, typed, instant_only=True)
+                if found is not None:
+                    self.reset()
+                    self.last_rule = found[0]
+                    return typed, found[1], None
+            self._path.append(node)
+        return None
+
+
+class DictionarySnapshot:
+    """
+    Immutable view of one loaded dictionary, published to the key handler as a whole.
+
+    The key handler reads the current snapshot once per key, so replacing it is a single
+    reference assignment and the hook thread never has to be restarted. Only the hook thread
+    feeds keys to the snapshot's matcher.
+
+    When `previous` (the snapshot being replaced) and `changed_words` are given, the matcher
+    is derived from the previous one with ReplacementMatcher.updated() instead of being rebuilt.
+
+    `templates` holds the compiled templates.Template of the entries with placeholders only;
+    every other entry is injected as its plain string (see template_for).
+    """
+    __slots__ = ("replacement_data", "injection_modes", "matcher", "templates", "source_hash", "loaded_at")
+
+    def __init__(self, replacement_data, trigger_keys=DEFAULT_TRIGGER_KEYS, instant_words=(), source_hash=None, loaded_at=None,
+                 injection_modes=None, previous=None, changed_words=None, ignore_case=False):
+        replacement_data = MappingProxyType(dict(replacement_data))
+        instant_words = frozenset(instant_words)
+        if isinstance(trigger_keys, str):
+            trigger_keys = parse_trigger_keys(trigger_keys)
+        if (previous is not None and changed_words is not None and previous.matcher.trigger_keys == trigger_keys
+                and previous.matcher.ignore_case == ignore_case):
+            matcher = previous.matcher.updated(replacement_data, changed_words, instant_words)
+        else:
+            matcher = ReplacementMatcher(replacement_data, trigger_keys, instant_words, ignore_case)
+        if previous is not None and changed_words is not None:
+            templates = {word: template for word, template in previous.templates.items() if word not in changed_words}
+            templates.update(compile_templates(replacement_data, changed_words))
+        else:
+            templates = compile_templates(replacement_data)
+        object.__setattr__(self, "replacement_data", replacement_data)
+        object.__setattr__(self, "injection_modes", MappingProxyType(dict(injection_modes or {})))
+        object.__setattr__(self, "matcher", matcher)
+        object.__setattr__(self, "templates", MappingProxyType(templates))
+        object.__setattr__(self, "source_hash", source_hash)
+        object.__setattr__(self, "loaded_at", loaded_at if loaded_at is not None else time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DictionarySnapshot is immutable")
+
+    def template_for(self, rule, replacement):
+        """
+        Return what to inject for a match of the sheet word `rule`: the plain `replacement` string for
+        entries without placeholders, else its Template. The precompiled template is used unless
+        the matcher changed the text (case propagation, pattern rule captures), which is compiled
+        again with the placeholders of the entry.
+        """
+        template = self.templates.get(rule)
+        if template is None:
+            return replacement
+        if replacement == template.text:
+            return template
+        return keep_fields(compile_template(replacement), template)
+
+
+EMPTY_SNAPSHOT = DictionarySnapshot({})
@@ -0,0 +1,251 @@
+import bisect
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_METRICS_EXPORT_INTERVAL = 60  # Seconds between snapshot files, 0 disables the export
+DEFAULT_METRICS_EXPORT_PATH = "metrics.json"  # A .csv extension writes CSV instead of JSON
+
+# Upper bounds in seconds of the histogram buckets: 1 us to about 33 s, doubling each time
+LATENCY_BUCKETS = tuple(1e-6 * 2 ** i for i in range(26))
+
+
+class Counter:
+    """
+    A number that only goes up. Each counter should be updated from a single thread; reading it from others is fine.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def add(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    """
+    The last value set, such as the dictionary size.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.add(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """
+    Distribution of durations in seconds: count, total and maximum, plus counts per LATENCY_BUCKETS bucket
+    for percentiles. add() is a bisect and three updates, cheap enough for the keyboard hook callback.
+    Like a Counter, it should be updated from a single thread; SharedHistogram is for the others.
+    """
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # The last bucket holds everything above the bounds
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def time(self):
+        """
+        Context manager adding the duration of the `with` block.
+        """
+        return _Timer(self)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Upper bound of the bucket holding the given percentile, never above the maximum seen.
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                break
+        if index >= len(LATENCY_BUCKETS):
+            return self.max
+        return min(LATENCY_BUCKETS[index], self.max)
+
+
+class SharedHistogram(Histogram):
+    """
+    A Histogram updated from several threads, such as the dictionary-load and sync threads: add() takes a lock.
+    """
+    __slots__ = ("_lock",)
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            Histogram.add(self, seconds)
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms. The accessors create the metric on first use
+    and return the same object afterwards, so hot paths can keep a reference to it.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def _get(self, metrics, name, factory):
+        metric = metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = metrics.setdefault(name, factory())
+        return metric
+
+    def counter(self, name):
+        return self._get(self.counters, name, Counter)
+
+    def gauge(self, name):
+        return self._get(self.gauges, name, Gauge)
+
+    def histogram(self, name, shared=False):
+        """
+        The histogram `name`, a SharedHistogram with `shared` for one updated from several threads.
+        """
+        return self._get(self.histograms, name, SharedHistogram if shared else Histogram)
+
+    def snapshot(self):
+        """
+        Return the current values as plain data. Durations are in milliseconds.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = dict(self.histograms)
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started_at,
+            "counters": {name: counter.value for name, counter in sorted(counters.items())},
+            "gauges": {name: gauge.value for name, gauge in sorted(gauges.items())},
+            "histograms": {
+                name: {
+                    "count": histogram.count,
+                    "avg_ms": histogram.average * 1000,
+                    "p50_ms": histogram.percentile(50) * 1000,
+                    "p99_ms": histogram.percentile(99) * 1000,
+                    "max_ms": histogram.max * 1000,
+                }
+                for name, histogram in sorted(histograms.items())
+            },
+        }
+
+
+def format_snapshot(snapshot):
+    """
+    Render a snapshot as aligned text lines for the metrics panel.
+    """
+    lines = [f"Uptime {snapshot['uptime']:.0f} s", ""]
+    for name, value in snapshot["counters"].items():
+        lines.append(f"{name:<24} {value:>12}")
+    for name, value in snapshot["gauges"].items():
+        lines.append(f"{name:<24} {value:>12}")
+    lines.append("")
+    lines.append(f"{'duration (ms)':<24} {'count':>8} {'avg':>9} {'p50':>9} {'p99':>9} {'max':>9}")
+    for name, stats in snapshot["histograms"].items():
+        lines.append(f"{name:<24} {stats['count']:>8} {stats['avg_ms']:>9.3f} {stats['p50_ms']:>9.3f} "
+                     f"{stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+    return "\n".join(lines)
+
+
+def write_snapshot(snapshot, file_path):
+    """
+    Write a snapshot to `file_path` atomically, as CSV (metric, field, value rows) if the path ends in .csv, else JSON.
+    """
+    temp_file = file_path + ".tmp"
+    if file_path.lower().endswith(".csv"):
+        with open(temp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "metric", "field", "value"])
+            timestamp = f"{snapshot['time']:.3f}"
+            writer.writerow([timestamp, "uptime", "seconds", f"{snapshot['uptime']:.3f}"])
+            for kind in ("counters", "gauges"):
+                for name, value in snapshot[kind].items():
+                    writer.writerow([timestamp, name, "value", value])
+            for name, stats in snapshot["histograms"].items():
+                for field, value in stats.items():
+                    writer.writerow([timestamp, name, field, value])
+    else:
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+    os.replace(temp_file, file_path)
+
+
+class MetricsExporter:
+    """
+    Write a snapshot of `registry` to `file_path` every `interval` seconds on a background thread,
+    and a last one when stopped.
+    """
+
+    def __init__(self, registry, file_path=DEFAULT_METRICS_EXPORT_PATH, interval=DEFAULT_METRICS_EXPORT_INTERVAL):
+        self.registry = registry
+        self.file_path = file_path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def export(self):
+        try:
+            write_snapshot(self.registry.snapshot(), self.file_path)
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.file_path}: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.export()
+        self.export()
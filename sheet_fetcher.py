@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from dictionary_cache import content_hash
+
+# Result of a fetch. `content` is None when the server answered 304 Not Modified.
+# `changed` tells whether the workbook differs from the one the caller already has.
+FetchResult = namedtuple("FetchResult", "content content_hash changed")
+
+
+class SheetFetchError(Exception):
+    """
+    The sheet could not be downloaded (network error or HTTP error status).
+    """
+
+
+class SheetFetcher:
+    """
+    Download the published workbook with conditional requests over one pooled session.
+
+    For each URL the ETag, Last-Modified and SHA-256 of the last body are remembered
+    (and saved to `state_path` so they survive a restart). They are only sent when the caller
+    still holds the data with that hash, otherwise a 304 answer would leave it with nothing.
+
+    `requests` is only imported when the first download starts, on the thread doing it,
+    so creating the fetcher costs nothing at startup.
+    """
+
+    def __init__(self, state_path=None, timeout=5, session=None):
+        self.state_path = state_path
+        self.timeout = timeout
+        self._session = session
+        self._lock = threading.Lock()  # The reload button and the background refresh may fetch at the same time
+        self._validators = self._load_state()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = self._make_session()
+        return self._session
+
+    @staticmethod
+    def _make_session():
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=2)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read fetch state: {e}")
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        temp_file = self.state_path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._validators, f)
+        os.replace(temp_file, self.state_path)
+
+    def fetch(self, url, known_hash=None):
+        """
+        Fetch `url`, sending the stored validators when the caller holds the content with `known_hash`.
+        Raises SheetFetchError on network or HTTP errors.
+        """
+        import requests
+
+        with self._lock:
+            headers = {}
+            validators = self._validators.get(url)
+            if known_hash and validators and validators.get("sha256") == known_hash:
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+
+            try:
+                response = self.session.get(url, headers=headers, allow_redirects=True, timeout=self.timeout)
+                if response.status_code == 304:
+                    logging.info("Sheet not modified on the server.")
+                    return FetchResult(None, known_hash, False)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise SheetFetchError(str(e)) from e
+
+            content = response.content
+            body_hash = content_hash(content)
+            new_validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": body_hash,
+            }
+            if new_validators != validators:
+                self._validators[url] = new_validators
+                try:
+                    self._save_state()
+                except OSError as e:
+                    logging.warning(f"Could not save fetch state: {e}")
+            return FetchResult(content, body_hash, body_hash != known_hash)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,23 @@
+import time
+
+
+class StartupTimer:
+    """
+    Milliseconds from the start of main.py to each startup milestone (imports done, window shown, hook ready...).
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = {}
+
+    def mark(self, name):
+        """
+        Record the milestone `name` the first time it is reached. Returns True if it was new.
+        """
+        if name in self.marks:
+            return False
+        self.marks[name] = (time.perf_counter() - self.start) * 1000
+        return True
+
+    def report(self):
+        return "Startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.marks.items())
@@ -0,0 +1,62 @@
+import collections
+import logging
+
+DEFAULT_STATUS_UPDATES_PER_SECOND = 4  # Most status bar redraws per second
+DEFAULT_STATUS_QUEUE_SIZE = 256  # Records kept between two redraws; older ones are dropped
+
+
+class StatusBarHandler(logging.Handler):
+    """
+    Logging handler that shows records in a Tk widget, such as the status bar label.
+
+    emit() may be called from any thread and only appends the record to a bounded deque;
+    Tk is never touched there. start() drains the deque on the Tk thread through `widget.after`,
+    at most `updates_per_second` times per second. Of each batch only the most severe record
+    (the latest one among equals) is formatted and shown, so a burst of log lines causes a
+    single redraw and records that are never shown are never formatted.
+    """
+
+    def __init__(self, widget, updates_per_second=DEFAULT_STATUS_UPDATES_PER_SECOND,
+                 queue_size=DEFAULT_STATUS_QUEUE_SIZE):
+        super().__init__()
+        self.widget = widget
+        self.interval_ms = max(1, int(1000 / updates_per_second))
+        self.records = collections.deque(maxlen=queue_size)  # append() and popleft() are thread-safe
+        self.updates = 0  # Times the widget was redrawn
+        self._after_id = None
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def start(self):
+        """
+        Start draining the records. Must be called on the Tk thread.
+        """
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def _drain(self):
+        shown = None
+        while True:
+            try:
+                record = self.records.popleft()
+            except IndexError:
+                break
+            if shown is None or record.levelno >= shown.levelno:
+                shown = record
+        if shown is not None:
+            try:
+                self.widget.config(text=self.format(shown))
+                self.updates += 1
+            except Exception:
+                self.handleError(shown)
+        self._after_id = self.widget.after(self.interval_ms, self._drain)
@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+
+DEFAULT_SYNC_INTERVAL = 300  # Seconds between automatic syncs, 0 disables them
+DEFAULT_SYNC_JITTER = 0.1  # Fraction of the delay added or removed at random
+DEFAULT_SYNC_MAX_BACKOFF = 3600  # Longest delay in seconds after repeated failures
+
+
+class SyncScheduler:
+    """
+    Run `sync_function` on a background thread every `interval` seconds.
+
+    Each delay is randomised by +/- `jitter` so that many clients do not hit the sheet at the
+    same moment, and doubles after each failure (up to `max_backoff`) until a sync succeeds.
+    `on_result(result, error, elapsed, manual)` is called from the worker thread after each run.
+    """
+
+    def __init__(self, sync_function, interval=DEFAULT_SYNC_INTERVAL, jitter=DEFAULT_SYNC_JITTER,
+                 max_backoff=DEFAULT_SYNC_MAX_BACKOFF, on_result=None):
+        self.sync_function = sync_function
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.on_result = on_result
+        self.failures = 0
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._manual = False
+        self._thread = None
+
+    def start(self, first_delay=None):
+        """
+        Start the worker thread. The first sync runs after `first_delay` seconds (default: one interval).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(first_delay,), name="sheet-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker thread and wait for it to finish the current sync.
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sync_now(self):
+        """
+        Ask the worker thread to sync right away instead of waiting for the next interval.
+        """
+        self._manual = True
+        self._wake_event.set()
+
+    def next_delay(self):
+        """
+        Return the delay before the next automatic sync, or None if automatic syncs are disabled.
+        """
+        if not self.interval:
+            return None
+        delay = min(self.max_backoff, self.interval * 2 ** self.failures)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self, first_delay):
+        delay = self.next_delay() if first_delay is None else first_delay
+        while not self._stop_event.is_set():
+            self._wake_event.wait(delay)  # Returns early on sync_now() or stop()
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            manual, self._manual = self._manual, False
+
+            result = error = None
+            start = time.perf_counter()
+            try:
+                result = self.sync_function()
+                self.failures = 0
+            except Exception as e:
+                error = e
+                self.failures += 1
+            elapsed = time.perf_counter() - start
+
+            delay = self.next_delay()
+            if error is None:
+                logging.info(f"Sheet sync finished in {elapsed * 1000:.0f} ms.")
+            elif delay is not None:
+                logging.error(f"Sheet sync failed ({error}), retrying in {delay:.0f} s.")
+            else:
+                logging.error(f"Sheet sync failed: {error}")
+            if self.on_result is not None:
+                self.on_result(result, error, elapsed, manual)
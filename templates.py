@@ -0,0 +1,133 @@
+import functools
+import logging
+import re
+import time
+from collections import namedtuple
+
+DEFAULT_DATE_FORMAT = "%d/%m/%Y"  # strftime format of {date}; {date:%A} uses its own
+DEFAULT_TIME_FORMAT = "%H:%M"  # strftime format of {time}
+
+# {date}, {time}, {clipboard} and {cursor}, with an optional ":format"; other braces are plain text.
+# Case-insensitive, so placeholders survive the upper-casing of a replacement typed in capitals.
+PLACEHOLDER = re.compile(r'\{(date|time|clipboard|cursor)(?::([^{}]*))?\}', re.IGNORECASE)
+
+# A rendered template: the text to insert and `caret`, the number of characters after {cursor}, None without one
+RenderedTemplate = namedtuple("RenderedTemplate", "text caret")
+
+
+class TemplateContext:
+    """
+    Where the dynamic fields come from. `clipboard` is any object with paste() -> text, such as the
+    pyperclip module, or None while clipboard support is not loaded ({clipboard} is then empty).
+    """
+
+    def __init__(self, date_format=DEFAULT_DATE_FORMAT, time_format=DEFAULT_TIME_FORMAT, clipboard=None):
+        self.date_format = date_format
+        self.time_format = time_format
+        self.clipboard = clipboard
+
+    def clipboard_text(self):
+        if self.clipboard is None:
+            return ""
+        try:
+            return self.clipboard.paste() or ""
+        except Exception as e:
+            logging.warning(f"Could not read the clipboard for {{clipboard}}: {e}")
+            return ""
+
+
+class Template:
+    """
+    A replacement with placeholders, parsed once into `segments`: plain strings, and (field, format)
+    tuples for the placeholders. render() only joins the segments with the current field values.
+    """
+    __slots__ = ("text", "segments")
+
+    def __init__(self, text, segments):
+        self.text = text
+        self.segments = segments
+
+    def render(self, context):
+        parts = []
+        caret_at = None
+        for segment in self.segments:
+            if segment.__class__ is str:
+                parts.append(segment)
+                continue
+            field, field_format = segment
+            if field == "date":
+                parts.append(time.strftime(field_format or context.date_format))
+            elif field == "time":
+                parts.append(time.strftime(field_format or context.time_format))
+            elif field == "clipboard":
+                parts.append(context.clipboard_text())
+            elif caret_at is None:  # {cursor}: only the first one counts
+                caret_at = sum(len(part) for part in parts)
+        text = "".join(parts)
+        return RenderedTemplate(text, len(text) - caret_at if caret_at is not None else None)
+
+    def __repr__(self):
+        return f"Template({self.text!r})"
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(text):
+    """
+    Parse a replacement into a Template, or return `text` itself when it has no placeholder,
+    so plain entries keep being handled as strings.
+    Cached, for the replacements produced at expansion time by case propagation and pattern rules.
+    """
+    if "{" not in text:
+        return text
+    segments = []
+    position = 0
+    for found in PLACEHOLDER.finditer(text):
+        if found.start() > position:
+            segments.append(text[position:found.start()])
+        segments.append((found.group(1).lower(), found.group(2)))
+        position = found.end()
+    if not segments:
+        return text
+    if position < len(text):
+        segments.append(text[position:])
+    return Template(text, tuple(segments))
+
+
+def keep_fields(template, original):
+    """
+    Return `template`, compiled from the text of `original` as changed by the matcher (case propagation,
+    pattern rule captures), with the placeholders of `original`: the change only applies to the text
+    segments, so "{date:%d/%m/%Y}" is not turned into "{DATE:%D/%M/%Y}" for a word typed in capitals.
+    """
+    fields = [segment for segment in original.segments if segment.__class__ is not str]
+    if template.__class__ is not Template:
+        return template
+    if sum(segment.__class__ is not str for segment in template.segments) != len(fields):
+        return template  # A pattern rule capture added or removed a placeholder
+    fields = iter(fields)
+    return Template(template.text, tuple(segment if segment.__class__ is str else next(fields) for segment in template.segments))
+
+
+def compile_templates(replacement_data, words=None):
+    """
+    Return {word: Template} for the entries of `replacement_data` that have placeholders,
+    looking only at `words` if given.
+    """
+    templates = {}
+    for word in (replacement_data if words is None else words):
+        text = replacement_data.get(word)
+        if text is not None and "{" in text:
+            template = compile_template(text)
+            if template is not text:
+                templates[word] = template
+    return templates
+
+
+def render_job(job, context):
+    """
+    Return the ExpansionJob with its Template replacement rendered and the caret moves for {cursor}.
+    The caret ends after the AFTER_REPLACEMENT text, so that is moved over as well.
+    """
+    rendered = job.replacement.render(context)
+    caret = rendered.caret + len(job.after) if rendered.caret is not None else 0
+    return job._replace(replacement=rendered.text, caret=caret)
@@ -0,0 +1,180 @@
+import logging
+import marshal
+import os
+import struct
+import threading
+import time
+
+# Usage counts of the replacement entries, kept next to the compiled dictionary cache.
+#
+# Layout: a fixed header followed by a marshal payload.
+#   magic (4 bytes) | format version (uint16) | marshal version (uint16) | tracking start (float64, epoch seconds)
+# The payload is a dict {sheet word: (count, last use in epoch seconds)}; a few thousand used
+# entries take some tens of kilobytes.
+
+USAGE_MAGIC = b"TRUS"
+USAGE_FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHd")
+
+DEFAULT_USAGE_FLUSH_INTERVAL = 60.0  # Seconds between writes of the recorded counts
+DEFAULT_PREWARM_ENTRIES = 2000  # Most used entries indexed first at startup
+
+
+def save_usage(file_path, counts, tracked_since):
+    """
+    Write `counts`, {word: (count, last use)}, to `file_path`. The file is replaced atomically.
+    """
+    payload = marshal.dumps({word: tuple(usage) for word, usage in counts.items()})
+    temp_file = file_path + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(HEADER.pack(USAGE_MAGIC, USAGE_FORMAT_VERSION, marshal.version, tracked_since))
+        f.write(payload)
+    os.replace(temp_file, file_path)
+
+
+def load_usage(file_path):
+    """
+    Load the counts written by save_usage(). Returns ({word: (count, last use)}, tracked since),
+    or ({}, None) if there is no usable file.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            return {}, None
+        magic, format_version, marshal_version, tracked_since = HEADER.unpack_from(data)
+        if magic != USAGE_MAGIC or format_version != USAGE_FORMAT_VERSION or marshal_version != marshal.version:
+            logging.info("Usage counts have another format version, ignoring them.")
+            return {}, None
+        counts = marshal.loads(data[HEADER.size:])
+    except FileNotFoundError:
+        return {}, None
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        logging.warning(f"Could not load usage counts: {e}")
+        return {}, None
+    return counts, tracked_since
+
+
+class UsageRecorder:
+    """
+    Counts how often each entry of the dictionary expands, for the usage report and to index the
+    most used entries first at startup.
+
+    record() is called by the key handler on every match and only adds to an in-memory batch; a
+    background thread merges the batch into the totals and writes them to `file_path` every
+    `flush_interval` seconds when something was recorded, and once more when stopped. The totals
+    are read from the file on first use, so the counts survive restarts.
+    """
+
+    def __init__(self, file_path, flush_interval=DEFAULT_USAGE_FLUSH_INTERVAL, metrics=None):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.flush_stats = metrics.histogram("usage_save") if metrics is not None else None
+        self._batch = {}  # Word -> (uses, last use) recorded since the last flush
+        self._counts = None  # Word -> (count, last use), loaded on first use
+        self.tracked_since = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record(self, word):
+        """
+        Count one expansion of the sheet word `word`. Cheap enough for the keyboard hook thread.
+        """
+        with self._lock:
+            uses = self._batch.get(word)
+            self._batch[word] = (uses[0] + 1 if uses else 1, time.time())
+
+    @property
+    def counts(self):
+        """
+        {word: (count, last use)} including the batch not written yet.
+        """
+        self._load()
+        with self._lock:
+            counts = dict(self._counts)
+            for word, (uses, last_used) in self._batch.items():
+                count = counts.get(word, (0, 0))[0]
+                counts[word] = (count + uses, last_used)
+        return counts
+
+    def _load(self):
+        """
+        Read the totals from the file on first use; outside the lock, so record() never waits for the disk.
+        """
+        if self._counts is not None:
+            return
+        counts, tracked_since = load_usage(self.file_path)
+        with self._lock:
+            if self._counts is None:
+                self._counts = counts
+                self.tracked_since = tracked_since if tracked_since is not None else time.time()
+
+    def hot_words(self, limit=DEFAULT_PREWARM_ENTRIES):
+        """
+        The `limit` most used words, most used first.
+        """
+        counts = self.counts
+        return sorted(counts, key=lambda word: counts[word][0], reverse=True)[:limit]
+
+    def report(self, words, limit=20):
+        """
+        Usage of the dictionary entries `words`: the `limit` most used with their count and last use,
+        the entries never used since the counts started, and how many counted words left the dictionary.
+        """
+        counts = self.counts
+        used = [word for word in counts if word in words]
+        used.sort(key=lambda word: counts[word][0], reverse=True)
+        never_used = sorted(word for word in words if word not in counts)
+        return {
+            "tracked_since": self.tracked_since,
+            "entries": len(words),
+            "used": len(used),
+            "hot": [{"word": word, "count": counts[word][0], "last_used": counts[word][1]} for word in used[:limit]],
+            "never_used": never_used,
+            "removed": len(counts) - len(used),
+        }
+
+    def flush(self):
+        """
+        Merge the recorded batch into the totals and write them, if anything was recorded.
+        """
+        self._load()
+        with self._lock:
+            batch = self._batch
+            if not batch:
+                return False
+            self._batch = {}
+            counts = self._counts
+            for word, (uses, last_used) in batch.items():
+                counts[word] = (counts.get(word, (0, 0))[0] + uses, last_used)
+            counts = dict(counts)
+            tracked_since = self.tracked_since
+        start = time.perf_counter()
+        try:
+            save_usage(self.file_path, counts, tracked_since)
+        except OSError as e:
+            logging.warning(f"Could not save usage counts to {self.file_path}: {e}")
+            return False
+        if self.flush_stats is not None:
+            self.flush_stats.add(time.perf_counter() - start)
+        return True
+
+    def start(self):
+        if self.flush_interval and self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
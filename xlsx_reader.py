@@ -0,0 +1,163 @@
+import io
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Streaming reader for the replacement workbooks.
+# It reads the active sheet (or a named one) straight from the XLSX bytes (shared strings + sheet XML)
+# and yields plain cell values, without building openpyxl cell objects or writing a temp file.
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+CELL_REFERENCE = re.compile(r"([A-Z]+)(\d+)")
+
+
+class XlsxFormatError(Exception):
+    """
+    Raised when the workbook cannot be read by the streaming reader.
+    """
+
+
+def column_index(letters):
+    """
+    Convert column letters (A, B, ..., AA) to a 0-based column index.
+    """
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _text_of(element):
+    """
+    Concatenate the <t> texts of a shared or inline string, skipping phonetic runs.
+    """
+    parts = []
+    for child in element:
+        if child.tag == MAIN_NS + "t":
+            parts.append(child.text or "")
+        elif child.tag == MAIN_NS + "r":
+            for run_child in child:
+                if run_child.tag == MAIN_NS + "t":
+                    parts.append(run_child.text or "")
+    return "".join(parts)
+
+
+def _read_shared_strings(archive):
+    """
+    Load the shared strings table as a list, in order.
+    """
+    try:
+        source = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    shared_strings = []
+    with source:
+        for _, element in ET.iterparse(source):
+            if element.tag == MAIN_NS + "si":
+                shared_strings.append(_text_of(element))
+                element.clear()
+    return shared_strings
+
+
+def _sheet_path(archive, sheet_name=None):
+    """
+    Find the path of the worksheet named `sheet_name` inside the archive,
+    or of the active one (what openpyxl calls workbook.active) if no name is given.
+    """
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheets = workbook.findall(f"{MAIN_NS}sheets/{MAIN_NS}sheet")
+    if not sheets:
+        raise XlsxFormatError("Workbook has no sheets")
+    if sheet_name is not None:
+        named = [sheet for sheet in sheets if sheet.get("name") == sheet_name]
+        if not named:
+            raise XlsxFormatError(f"Workbook has no sheet named '{sheet_name}'")
+        relation_id = named[0].get(REL_NS + "id")
+    else:
+        active_tab = 0
+        view = workbook.find(f"{MAIN_NS}bookViews/{MAIN_NS}workbookView")
+        if view is not None:
+            active_tab = int(view.get("activeTab", 0))
+        relation_id = sheets[min(active_tab, len(sheets) - 1)].get(REL_NS + "id")
+
+    relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for relation in relations.iter(PACKAGE_REL_NS + "Relationship"):
+        if relation.get("Id") == relation_id:
+            target = relation.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise XlsxFormatError(f"Worksheet relation {relation_id} not found")
+
+
+def _cell_value(cell, shared_strings):
+    """
+    Convert a <c> element to the value openpyxl would return in values_only mode.
+    """
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        inline = cell.find(MAIN_NS + "is")
+        return _text_of(inline) if inline is not None else None
+
+    value = cell.find(MAIN_NS + "v")
+    if value is None or value.text is None:
+        return None
+    text = value.text
+    if cell_type == "s":
+        return shared_strings[int(text)]
+    if cell_type == "b":
+        return text == "1"
+    if cell_type == "n":
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    return text  # "str" (formula result), "e" (error) and anything unknown stay as text
+
+
+def iter_xlsx_rows(data, min_row=1, width=3, sheet_name=None):
+    """
+    Yield the rows of the active sheet of an XLSX file, or of the sheet named `sheet_name`,
+    as tuples of `width` cell values.
+
+    `data` is the content of the file as bytes. Missing cells are None, like openpyxl's
+    iter_rows(values_only=True). Raises XlsxFormatError if the file is not a readable workbook.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise XlsxFormatError(f"Not an XLSX file: {e}") from e
+
+    with archive:
+        try:
+            shared_strings = _read_shared_strings(archive)
+            sheet_path = _sheet_path(archive, sheet_name)
+            source = archive.open(sheet_path)
+        except (KeyError, ET.ParseError, ValueError) as e:
+            raise XlsxFormatError(f"Unreadable workbook: {e}") from e
+
+        with source:
+            row_number = 0
+            try:
+                for _, element in ET.iterparse(source):
+                    if element.tag != MAIN_NS + "row":
+                        continue
+                    row_number = int(element.get("r", row_number + 1))
+                    if row_number >= min_row:
+                        values = [None] * width
+                        position = 0
+                        for cell in element.iter(MAIN_NS + "c"):
+                            reference = cell.get("r")
+                            if reference:
+                                position = column_index(CELL_REFERENCE.match(reference).group(1))
+                            if position < width:
+                                values[position] = _cell_value(cell, shared_strings)
+                            position += 1
+                        yield tuple(values)
+                    element.clear()
+            except (ET.ParseError, ValueError, IndexError, AttributeError) as e:
+                raise XlsxFormatError(f"Unreadable worksheet: {e}") from e